@@ -0,0 +1,78 @@
+"""Keyset page fetches for GET /v1/bots/{bot_id}/events on a large event log.
+
+Seeds one bot with ``events`` rows (default one million) and times page fetches
+at the head, middle and tail of the log, with and without an ``event_type``
+filter. Keyset cursors keep each fetch constant-time regardless of position.
+
+Usage: python -m benchmarks.bot_events_pagination [events] [page_size]
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from service.storage.bot_events_repo import BotEventsRepository
+from service.storage.bots_repo import BotsRepository
+from service.storage.clients_repo import ClientsRepository
+from service.storage.db import SQLiteDB, utc_now_iso
+
+EVENT_TYPES = ["HEARTBEAT", "HEARTBEAT", "HEARTBEAT", "REVIEW_PROPOSAL"]
+
+
+def _seed(db: SQLiteDB, bot_id: str, owner: str, events: int) -> None:
+    created_at = utc_now_iso()
+    chunk = 50_000
+    for start in range(0, events, chunk):
+        rows = [
+            (f"evt-{idx}", bot_id, owner, EVENT_TYPES[idx % len(EVENT_TYPES)], "beat", created_at, "{}")
+            for idx in range(start, min(start + chunk, events))
+        ]
+        with db.connect() as conn:
+            conn.executemany(
+                "INSERT INTO bot_events (event_id, bot_id, owner_client_id, event_type, message, created_at, payload_json) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+
+def _time(label: str, fetch, repeat: int = 200) -> None:
+    fetch()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fetch()
+    elapsed = (time.perf_counter() - started) / repeat
+    print(f"{label:<40} {elapsed * 1000:8.3f} ms/page")
+
+
+def main(events: int = 1_000_000, page_size: int = 100) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        db = SQLiteDB(str(Path(tmp) / "bench.db"))
+        owner = ClientsRepository(db).create_client("bench")["client_id"]
+        bot_id = BotsRepository(db).create_bot(owner, "heartbeat", {})["bot_id"]
+        repo = BotEventsRepository(db)
+
+        started = time.perf_counter()
+        _seed(db, bot_id, owner, events)
+        print(f"seeded {events} events in {time.perf_counter() - started:.1f}s")
+
+        with db.connect() as conn:
+            first_seq, last_seq = conn.execute("SELECT MIN(seq), MAX(seq) FROM bot_events").fetchone()
+        middle_seq = (first_seq + last_seq) // 2
+
+        _time("newest page", lambda: repo.list_events(bot_id, limit=page_size))
+        _time("after cursor at head", lambda: repo.list_events(bot_id, limit=page_size, after=first_seq))
+        _time("after cursor at middle", lambda: repo.list_events(bot_id, limit=page_size, after=middle_seq))
+        _time("before cursor at middle", lambda: repo.list_events(bot_id, limit=page_size, before=middle_seq))
+        _time("before cursor near tail", lambda: repo.list_events(bot_id, limit=page_size, before=first_seq + page_size))
+        _time(
+            "event_type filter, after cursor at middle",
+            lambda: repo.list_events(bot_id, limit=page_size, after=middle_seq, event_type="REVIEW_PROPOSAL"),
+        )
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 100,
+    )
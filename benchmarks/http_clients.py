@@ -0,0 +1,83 @@
+"""Upstream call latency: a new ``httpx.AsyncClient`` per call vs. one shared client.
+
+Starts a local stand-in for the Ollama ``/api/chat`` endpoint (HTTP/1.1 with
+keep-alive), then issues ``calls`` sequential requests both ways and reports
+the mean latency. The per-call variant reflects the old provider code, which
+built (and tore down) a client and its connection for every request; most of
+that cost is constructing the client itself (loading the default TLS context),
+which is paid even for plain-HTTP upstreams like Ollama.
+
+Usage: python -m benchmarks.http_clients [calls]
+"""
+
+import asyncio
+import json
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from service.http_clients import UpstreamClients
+
+REPLY = json.dumps({"message": {"role": "assistant", "content": "ok"}}).encode()
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self) -> None:
+        super().setup()
+        # Headers and body go out as separate writes; avoid Nagle/delayed-ACK stalls.
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_POST(self) -> None:  # noqa: N802
+        self.rfile.read(int(self.headers.get("Content-Length", "0")))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(REPLY)))
+        self.end_headers()
+        self.wfile.write(REPLY)
+
+    def log_message(self, *_args) -> None:
+        pass
+
+
+async def _per_call(url: str, calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        async with httpx.AsyncClient(timeout=30) as client:
+            (await client.post(url, json={"messages": []})).raise_for_status()
+    return (time.perf_counter() - started) / calls
+
+
+async def _shared(url: str, calls: int) -> float:
+    clients = UpstreamClients()
+    started = time.perf_counter()
+    for _ in range(calls):
+        (await clients.get("ollama").post(url, json={"messages": []})).raise_for_status()
+    elapsed = (time.perf_counter() - started) / calls
+    await clients.aclose()
+    return elapsed
+
+
+def main(calls: int = 300) -> None:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/api/chat"
+    try:
+        per_call = asyncio.run(_per_call(url, calls))
+        shared = asyncio.run(_shared(url, calls))
+    finally:
+        server.shutdown()
+
+    print(f"calls: {calls}")
+    print(f"client per call: {per_call * 1000:.3f} ms/call")
+    print(f"shared client:   {shared * 1000:.3f} ms/call")
+    print(f"speedup:         {per_call / shared:.2f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
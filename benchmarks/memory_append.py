@@ -0,0 +1,52 @@
+"""Chat-turn persistence throughput: two single-row commits vs. one ``append_turn``.
+
+Writes ``turns`` user/assistant exchanges with each strategy against a fresh
+database and reports turns per second. Pass ``--full-sync`` to run with
+``PRAGMA synchronous = FULL`` so every commit pays an fsync.
+
+Usage: python -m benchmarks.memory_append [turns] [--full-sync]
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from service.memory import MemoryStore
+
+
+def _run(store: MemoryStore, turns: int, batched: bool) -> float:
+    started = time.perf_counter()
+    for index in range(turns):
+        conversation_id = f"conv-{index % 50}"
+        if batched:
+            store.append_turn(conversation_id, "bench", [
+                {"role": "user", "content": f"question {index}"},
+                {"role": "assistant", "content": f"answer {index}"},
+            ])
+        else:
+            store.append_message(conversation_id, "user", f"question {index}", client_id="bench")
+            store.append_message(conversation_id, "assistant", f"answer {index}", client_id="bench")
+    return turns / (time.perf_counter() - started)
+
+
+def main(turns: int = 2000, full_sync: bool = False) -> None:
+    results = {}
+    for label, batched in (("two append_message", False), ("append_turn", True)):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = MemoryStore(str(Path(tmp) / "bench.db"))
+            if full_sync:
+                with store.db.connect() as conn:
+                    conn.execute("PRAGMA synchronous = FULL")
+            results[label] = _run(store, turns, batched)
+            store.db.pool.close()
+
+    print(f"turns: {turns} (synchronous={'FULL' if full_sync else 'NORMAL'})")
+    for label, rate in results.items():
+        print(f"{label:<20} {rate:>10.0f} turns/s")
+    print(f"speedup: {results['append_turn'] / results['two append_message']:.2f}x")
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    main(int(args[0]) if args else 2000, full_sync="--full-sync" in sys.argv)
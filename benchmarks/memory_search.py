@@ -0,0 +1,63 @@
+"""Full-text search latency over conversation memory.
+
+Seeds ``messages`` rows (default two million) spread across ``clients`` clients
+with a synthetic vocabulary, then times ``MemoryStore.search`` for rare,
+common and multi-term queries scoped to one client.
+
+Usage: python -m benchmarks.memory_search [messages] [clients]
+"""
+
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from service.memory import MemoryStore
+
+VOCABULARY = [f"term{idx}" for idx in range(5000)]
+COMMON_WORDS = ["sqlite", "bot", "deploy", "memory", "review", "ollama", "token", "android"]
+
+
+def _seed(store: MemoryStore, messages: int, clients: int) -> None:
+    rng = random.Random(7)
+    chunk = 20_000
+    for start in range(0, messages, chunk):
+        rows = []
+        for idx in range(start, min(start + chunk, messages)):
+            words = rng.choices(VOCABULARY, k=12) + rng.choices(COMMON_WORDS, k=2)
+            rows.append((f"client-{idx % clients}", f"conv-{idx % 5000}", "user", " ".join(words)))
+        with store.db.connect() as conn:
+            conn.executemany(
+                "INSERT INTO messages (client_id, conversation_id, role, content) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+
+
+def _time(label: str, search, repeat: int = 50) -> None:
+    search()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        results = search()
+    elapsed = (time.perf_counter() - started) / repeat
+    print(f"{label:<32} {elapsed * 1000:9.3f} ms/query ({len(results)} results)")
+
+
+def main(messages: int = 2_000_000, clients: int = 50) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        store = MemoryStore(str(Path(tmp) / "bench.db"))
+        started = time.perf_counter()
+        _seed(store, messages, clients)
+        print(f"seeded {messages} messages for {clients} clients in {time.perf_counter() - started:.1f}s")
+
+        _time("rare term", lambda: store.search("client-3", "term4242"))
+        _time("two rare terms", lambda: store.search("client-3", "term4242 term17"))
+        _time("common term", lambda: store.search("client-3", "ollama"))
+        _time("common + rare term", lambda: store.search("client-3", "deploy term99"))
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 50,
+    )
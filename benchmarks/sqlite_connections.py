@@ -0,0 +1,83 @@
+"""Per-request SQLite connection overhead: connect-per-call vs. the shared pool.
+
+Simulates the storage work of one authenticated ``/chat`` request (token check,
+client lookup, history read and two message inserts) and reports the mean
+time per request for both strategies.
+
+Usage: python -m benchmarks.sqlite_connections [requests]
+"""
+
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from service.memory import MemoryStore
+from service.storage.clients_repo import ClientsRepository
+from service.storage.db import SQLiteDB
+
+
+def _legacy_connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=5)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+
+def _legacy_request(db_path: str, client_id: str, token_hash: str) -> None:
+    statements = [
+        ("SELECT token_hash FROM clients WHERE client_id = ?", (client_id,)),
+        ("SELECT * FROM clients WHERE client_id = ?", (client_id,)),
+        ("SELECT role, content FROM messages WHERE conversation_id = ? ORDER BY id DESC LIMIT 10", ("bench",)),
+        ("INSERT INTO messages (client_id, conversation_id, role, content) VALUES (?, 'bench', 'user', 'hi')", (client_id,)),
+        ("INSERT INTO messages (client_id, conversation_id, role, content) VALUES (?, 'bench', 'assistant', 'yo')", (client_id,)),
+    ]
+    for sql, params in statements:
+        conn = _legacy_connect(db_path)
+        try:
+            with conn:
+                conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+
+def _pooled_request(clients: ClientsRepository, memory: MemoryStore, client_id: str, token: str) -> None:
+    clients.verify_client_token(client_id, token)
+    clients.get_client(client_id)
+    memory.get_recent_messages("bench", client_id=client_id)
+    memory.append_message("bench", "user", "hi", client_id=client_id)
+    memory.append_message("bench", "assistant", "yo", client_id=client_id)
+
+
+def main(requests: int = 500) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "bench.db")
+        db = SQLiteDB(db_path)
+        clients = ClientsRepository(db)
+        memory = MemoryStore(db_path)
+        created = clients.create_client("bench")
+        client_id, token = created["client_id"], created["client_token"]
+        token_hash = ClientsRepository.hash_token(token)
+
+        started = time.perf_counter()
+        for _ in range(requests):
+            _legacy_request(db_path, client_id, token_hash)
+        legacy = (time.perf_counter() - started) / requests
+
+        opened_before = db.pool.connections_opened
+        started = time.perf_counter()
+        for _ in range(requests):
+            _pooled_request(clients, memory, client_id, token)
+        pooled = (time.perf_counter() - started) / requests
+
+        print(f"requests: {requests}")
+        print(f"connect-per-call: {legacy * 1000:.3f} ms/request (5 connections per request)")
+        print(f"pooled:           {pooled * 1000:.3f} ms/request "
+              f"({db.pool.connections_opened - opened_before} connections opened in total)")
+        print(f"speedup:          {legacy / pooled:.2f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from service.config import settings
+
+# Lower values are admitted first.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+
+class ProviderOverloaded(Exception):
+    def __init__(self, provider: str, retry_after: int):
+        super().__init__(f"LLM provider '{provider}' is overloaded. Retry in {retry_after}s.")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class AdmissionPriority:
+    # A priority shared by every wait made on its behalf (one coalesced generation and
+    # its hedges); raising it reorders waits that are already queued.
+    def __init__(self, value: int):
+        self.value = value
+        self._waits: list[tuple[ConcurrencyLimiter, asyncio.Future]] = []
+
+    def raise_to(self, value: int) -> None:
+        if value >= self.value:
+            return
+        self.value = value
+        for limiter, future in self._waits:
+            limiter.reprioritize(future, value)
+
+
+class ConcurrencyLimiter:
+    # At most `max_concurrency` calls run at once; up to `max_queue` more wait in
+    # priority order (FIFO within a priority). A full queue sheds its newest,
+    # lowest-priority waiter when a more urgent call arrives, else the newcomer.
+    def __init__(self, name: str, max_concurrency: int, max_queue: int):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.active = 0
+        self._queue: list[tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self.service_seconds = 0.0
+        self.admitted = 0
+        self.shed = 0
+        self.wait_seconds_total = 0.0
+
+    def retry_after(self) -> int:
+        # Time for the current queue to drain at the observed service rate.
+        backlog = len(self._queue) + 1
+        return max(1, math.ceil(backlog * self.service_seconds / self.max_concurrency))
+
+    def _drop_finished(self) -> None:
+        # Waiters cancelled before their task ran its cleanup still sit in the queue.
+        live = [entry for entry in self._queue if not entry[2].done()]
+        if len(live) != len(self._queue):
+            self._queue = live
+            heapq.heapify(self._queue)
+
+    def would_shed(self, priority: int) -> bool:
+        self._drop_finished()
+        if self.active < self.max_concurrency or len(self._queue) < self.max_queue:
+            return False
+        return not self._queue or max(self._queue)[0] <= priority
+
+    async def acquire(self, priority: int | AdmissionPriority) -> float:
+        shared = priority if isinstance(priority, AdmissionPriority) else None
+        if shared is not None:
+            priority = shared.value
+        if self.active < self.max_concurrency and not self._queue:
+            self.active += 1
+            self.admitted += 1
+            return 0.0
+
+        if len(self._queue) >= self.max_queue:
+            self._drop_finished()
+        if len(self._queue) >= self.max_queue:
+            worst = max(self._queue) if self._queue else None
+            if worst is None or worst[0] <= priority:
+                self.shed += 1
+                raise ProviderOverloaded(self.name, self.retry_after())
+            self._queue.remove(worst)
+            heapq.heapify(self._queue)
+            self.shed += 1
+            worst[2].set_exception(ProviderOverloaded(self.name, self.retry_after()))
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._sequence), future)
+        heapq.heappush(self._queue, entry)
+        if shared is not None:
+            shared._waits.append((self, future))
+        started = time.monotonic()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # The slot was handed over just before the waiter went away.
+                self._hand_over()
+            elif any(queued is future for _, _, queued in self._queue):
+                # Matched by future: a raised priority replaces the queued entry.
+                self._queue = [queued for queued in self._queue if queued[2] is not future]
+                heapq.heapify(self._queue)
+            raise
+        finally:
+            if shared is not None:
+                shared._waits.remove((self, future))
+        waited = time.monotonic() - started
+        self.admitted += 1
+        self.wait_seconds_total += waited
+        return waited
+
+    def reprioritize(self, future: asyncio.Future, priority: int) -> None:
+        for index, (current, sequence, queued) in enumerate(self._queue):
+            if queued is future:
+                if priority < current:
+                    self._queue[index] = (priority, sequence, queued)
+                    heapq.heapify(self._queue)
+                return
+
+    def release(self, held_seconds: float) -> None:
+        self.service_seconds = held_seconds if not self.service_seconds else 0.8 * self.service_seconds + 0.2 * held_seconds
+        self._hand_over()
+
+    def _hand_over(self) -> None:
+        while self._queue:
+            _, _, future = heapq.heappop(self._queue)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": len(self._queue),
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "avg_queue_wait_ms": round(1000 * self.wait_seconds_total / self.admitted, 2) if self.admitted else 0.0,
+            "avg_service_seconds": round(self.service_seconds, 3),
+        }
+
+
+class AdmissionControl:
+    def __init__(self, limits: dict[str, int] | None = None, default_limit: int = 8, max_queue: int = 32):
+        self.limits = {name.lower(): limit for name, limit in (limits or {}).items()}
+        self.default_limit = default_limit
+        self.max_queue = max_queue
+        self._limiters: dict[str, ConcurrencyLimiter] = {}
+
+    @classmethod
+    def from_settings(cls) -> "AdmissionControl":
+        return cls(
+            json.loads(settings.LLM_CONCURRENCY_LIMITS_JSON or "{}"),
+            default_limit=settings.LLM_MAX_CONCURRENCY,
+            max_queue=settings.LLM_MAX_QUEUE_DEPTH,
+        )
+
+    def limiter(self, provider: str) -> ConcurrencyLimiter:
+        limiter = self._limiters.get(provider)
+        if limiter is None:
+            limit = self.limits.get(provider, self.default_limit)
+            limiter = self._limiters[provider] = ConcurrencyLimiter(provider, limit, self.max_queue)
+        return limiter
+
+    def check(self, provider: str, priority: int = PRIORITY_INTERACTIVE) -> None:
+        limiter = self.limiter(provider)
+        if limiter.would_shed(priority):
+            raise ProviderOverloaded(provider, limiter.retry_after())
+
+    @asynccontextmanager
+    async def slot(self, provider: str, priority: int | AdmissionPriority = PRIORITY_INTERACTIVE) -> AsyncIterator[float]:
+        limiter = self.limiter(provider)
+        waited = await limiter.acquire(priority)
+        started = time.monotonic()
+        try:
+            yield waited
+        finally:
+            limiter.release(time.monotonic() - started)
+
+    def stats(self) -> dict:
+        return {name: limiter.stats() for name, limiter in sorted(self._limiters.items())}
@@ -1,32 +1,164 @@
 from __future__ import annotations
 
-from collections.abc import Awaitable, Callable
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import ContextVar
 from datetime import datetime, timezone
 import base64
 import inspect
+import json
+import math
+import os
 from pathlib import Path
 import re
+import tarfile
+import threading
+import time
+from urllib.parse import quote
 
 import httpx
 
+from service.admission import PRIORITY_INTERACTIVE, AdmissionControl, AdmissionPriority, ProviderOverloaded
 from service.config import settings
+from service.file_reader import read_text, resolve_fs_read_target, split_range
+from service.github_cache import GitHubCache, GitHubRateLimit
+from service.github_snapshots import RepoSnapshotCache, SnapshotUnavailable
+from service.http_clients import UpstreamClients
+from service.provider_chain import (
+    CONFIGURATION_ERROR_PREFIXES,
+    ChainEntry,
+    ProviderHealth,
+    is_provider_error,
+    parse_provider_chain,
+)
+from service.response_cache import ResponseCache, is_cacheable_reply, response_cache_key
 
 GenerateFn = Callable[[str, list[dict[str, str]]], Awaitable[str]]
+StreamFn = Callable[[str, list[dict[str, str]]], AsyncIterator[str]]
 ToolResult = str | Awaitable[str]
 ToolFn = Callable[[str], ToolResult]
 ToolFn = Callable[[str], str]
 TOOL_INPUT_MAX_LENGTH = 2000
 REPO_PATTERN = re.compile(r"^[A-Za-z0-9_.-]+/[A-Za-z0-9_.-]+$")
+SHA_PATTERN = re.compile(r"^[0-9a-f]{40}$")
+GH_TREE_MAX_ENTRIES = 1000
+# Matches the contents API, which stops returning inline content past 1 MiB.
+GH_FILE_MAX_BYTES = 1024 * 1024
+
+# Model chosen by the provider chain for the attempt running in this task.
+_chain_model: ContextVar[str | None] = ContextVar("_chain_model", default=None)
+_END = object()
+
+
+class _Attempt:
+    def __init__(self, provider: str, model: str | None, priority: int | AdmissionPriority):
+        self.provider = provider
+        self.model = model
+        self.priority = priority
+        self.queue_wait = 0.0
+        # Breakers and latency samples are kept per provider/model pair.
+        self.label = f"{provider}:{model}" if model else provider
+        self.started = time.monotonic()
+        self.chunks: asyncio.Queue = asyncio.Queue()
+        self.task: asyncio.Task | None = None
+
+
+class _Flight:
+    # One shared generation: chunks are kept so late joiners replay from the start.
+    # It runs at the most urgent priority of the callers waiting on it.
+    def __init__(self, priority: int):
+        self.priority = AdmissionPriority(priority)
+        self.chunks: list[str] = []
+        self.meta: dict = {}
+        self.done = False
+        self.error: Exception | None = None
+        self.waiters = 0
+        self.changed = asyncio.Event()
+        self.task: asyncio.Task | None = None
+
+    def publish(self) -> None:
+        event, self.changed = self.changed, asyncio.Event()
+        event.set()
+
+
+class _Tool:
+    # A registered tool: blocking tools run on the tool thread pool, async ones on the loop.
+    def __init__(self, fn: ToolFn, blocking: bool, timeout: float | None):
+        self.fn = fn
+        self.blocking = blocking
+        self.timeout = timeout
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        # Timed-out calls whose pool thread is still running: Python cannot interrupt
+        # it, so it holds a pool slot until the blocking call returns by itself.
+        self.abandoned = 0
+        self._abandoned_lock = threading.Lock()
+
+    def abandon(self, future: Future) -> None:
+        with self._abandoned_lock:
+            self.abandoned += 1
+        future.add_done_callback(self._reclaim)
+
+    def _reclaim(self, _: Future) -> None:
+        with self._abandoned_lock:
+            self.abandoned -= 1
+
+    def record(self, elapsed: float) -> None:
+        self.calls += 1
+        self.total_seconds += elapsed
+        self.max_seconds = max(self.max_seconds, elapsed)
+
+    def stats(self, timeout: float | None) -> dict:
+        return {
+            "blocking": self.blocking,
+            "timeout_seconds": timeout,
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "abandoned_threads": self.abandoned,
+            "avg_ms": round(1000 * self.total_seconds / self.calls, 2) if self.calls else 0.0,
+            "max_ms": round(1000 * self.max_seconds, 2),
+        }
 
 
 class AIService:
-    def __init__(self):
+    def __init__(
+        self,
+        response_cache: ResponseCache | None = None,
+        github_cache: GitHubCache | None = None,
+        github_snapshots: RepoSnapshotCache | None = None,
+    ):
+        self.response_cache = response_cache
+        self.github_cache = github_cache
+        self.github_snapshots = github_snapshots
+        self.github_rate_limit = GitHubRateLimit()
+        self.health = ProviderHealth.from_settings()
+        self.admission = AdmissionControl.from_settings()
+        self._flights: dict[str, _Flight] = {}
+        self.coalesced = 0
         self.system_prompt = "You are Orty, a concise and intelligent on-device assistant."
+        self.http = UpstreamClients({
+            "openai": settings.OPENAI_READ_TIMEOUT_SECONDS,
+            "ollama": settings.OLLAMA_READ_TIMEOUT_SECONDS,
+            "github": settings.GITHUB_READ_TIMEOUT_SECONDS,
+        })
         self._providers: dict[str, GenerateFn] = {
             "openai": self._generate_openai,
             "ollama": self._generate_ollama,
         }
-        self._tools: dict[str, ToolFn] = {
+        self._stream_providers: dict[str, StreamFn] = {
+            "openai": self._stream_openai,
+            "ollama": self._stream_ollama,
+        }
+        self._tool_timeouts: dict[str, float] = json.loads(settings.TOOL_TIMEOUTS_JSON or "{}")
+        self._tool_pool: ThreadPoolExecutor | None = None
+        self._tools: dict[str, _Tool] = {}
+        # Synchronous tools (the filesystem ones) are treated as blocking.
+        for name, tool in {
             "echo": self._tool_echo,
             "utc_time": self._tool_utc_time,
             "fs_pwd": self._tool_fs_pwd,
@@ -35,28 +167,369 @@ class AIService:
             "gh_repo": self._tool_gh_repo,
             "gh_tree": self._tool_gh_tree,
             "gh_file": self._tool_gh_file,
-        }
+        }.items():
+            self.register_tool(name, tool)
+
+    async def aclose(self) -> None:
+        await self.http.aclose()
+        if self._tool_pool is not None:
+            # Threads stuck past their timeout are abandoned rather than joined.
+            self._tool_pool.shutdown(wait=False, cancel_futures=True)
+            self._tool_pool = None
+
+    def register_provider(self, name: str, generator: GenerateFn | StreamFn) -> None:
+        name = name.lower()
+        if inspect.isasyncgenfunction(generator):
+            self._stream_providers[name] = generator
+            self._providers[name] = self._collect_stream(generator)
+        else:
+            self._providers[name] = generator
+            self._stream_providers.pop(name, None)
+
+    @staticmethod
+    def _collect_stream(stream: StreamFn) -> GenerateFn:
+        async def generate(message: str, history: list[dict[str, str]]) -> str:
+            return "".join([chunk async for chunk in stream(message, history)])
+
+        return generate
+
+    def register_tool(
+        self,
+        name: str,
+        tool: ToolFn,
+        *,
+        blocking: bool | None = None,
+        timeout: float | None = None,
+    ) -> None:
+        if blocking is None:
+            blocking = not inspect.iscoroutinefunction(tool)
+        self._tools[name.lower()] = _Tool(tool, blocking, timeout)
+
+    def _tool_timeout(self, name: str, tool: _Tool) -> float | None:
+        timeout = tool.timeout if tool.timeout is not None else self._tool_timeouts.get(name, settings.TOOL_TIMEOUT_SECONDS)
+        return timeout if timeout and timeout > 0 else None
+
+    def _tool_executor(self) -> ThreadPoolExecutor:
+        if self._tool_pool is None:
+            self._tool_pool = ThreadPoolExecutor(
+                max_workers=max(1, settings.TOOL_MAX_THREADS),
+                thread_name_prefix="orty-tool",
+            )
+        return self._tool_pool
 
-    def register_provider(self, name: str, generator: GenerateFn) -> None:
-        self._providers[name.lower()] = generator
+    def tool_stats(self) -> dict:
+        return {name: tool.stats(self._tool_timeout(name, tool)) for name, tool in sorted(self._tools.items())}
 
-    def register_tool(self, name: str, tool: ToolFn) -> None:
-        self._tools[name.lower()] = tool
+    @staticmethod
+    def _default_models() -> dict[str, str]:
+        return {"openai": settings.OPENAI_MODEL, "ollama": settings.OLLAMA_MODEL}
 
-    async def generate(self, message: str, history: list[dict[str, str]] | None = None) -> str:
+    def active_model(self) -> tuple[str, str | None]:
         provider = settings.LLM_PROVIDER.lower()
-        history = history or []
-
+        return provider, self._default_models().get(provider)
+
+    def provider_chain(self) -> list[ChainEntry]:
+        return parse_provider_chain(settings.LLM_PROVIDER, settings.LLM_FALLBACK_PROVIDERS, self._default_models())
+
+    def check_admission(self, priority: int = PRIORITY_INTERACTIVE) -> None:
+        # Early, cheap rejection before any work is done for the request: only when
+        # every provider in the chain would shed it.
+        chain = [entry for entry in self.provider_chain() if entry[0] in self._providers]
+        overloaded = None
+        for provider, _ in chain:
+            try:
+                self.admission.check(provider, priority)
+                return
+            except ProviderOverloaded as exc:
+                overloaded = overloaded or exc
+        if overloaded is not None:
+            raise overloaded
+
+    def _cache_key(self, message: str, history: list[dict[str, str]]) -> str | None:
+        if self.response_cache is None:
+            return None
+        provider, model = self.active_model()
+        return response_cache_key(provider, model, self.system_prompt, history, message)
+
+    async def _store_reply(self, key: str | None, reply: str) -> None:
+        if key is None or not is_cacheable_reply(reply):
+            return
+        provider, model = self.active_model()
+        await self.response_cache.aput(key, provider, model, reply)
+
+    async def generate(
+        self,
+        message: str,
+        history: list[dict[str, str]] | None = None,
+        use_cache: bool = True,
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> str:
+        return (await self.generate_reply(message, history, use_cache, priority))["reply"]
+
+    async def generate_reply(
+        self,
+        message: str,
+        history: list[dict[str, str]] | None = None,
+        use_cache: bool = True,
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> dict:
+        meta: dict = {}
+        chunks = [chunk async for chunk in self._answer(message, history or [], use_cache, False, meta, priority)]
+        return {"reply": "".join(chunks), **meta}
+
+    def generate_stream(
+        self,
+        message: str,
+        history: list[dict[str, str]] | None = None,
+        use_cache: bool = True,
+        meta: dict | None = None,
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> AsyncIterator[str]:
+        # `meta` is filled with provider, model, cached and queue_wait_ms as soon as they are known.
+        return self._answer(message, history or [], use_cache, True, {} if meta is None else meta, priority)
+
+    async def _answer(
+        self,
+        message: str,
+        history: list[dict[str, str]],
+        use_cache: bool,
+        streaming: bool,
+        meta: dict,
+        priority: int,
+    ) -> AsyncIterator[str]:
         tool_result = await self._maybe_execute_tool(message)
         if tool_result is not None:
-            return tool_result
-
-        generator = self._providers.get(provider)
-        if generator is None:
+            meta.update(provider="tool", model=None, cached=False, queue_wait_ms=0.0)
+            yield tool_result
+            return
+
+        chain = self.provider_chain()
+        provider, model = chain[0]
+        meta.update(provider=provider, model=model, cached=False, queue_wait_ms=0.0)
+        if provider not in self._providers:
             available = ", ".join(sorted(self._providers.keys()))
-            return f"Unsupported LLM_PROVIDER '{provider}'. Available providers: {available}."
+            yield f"Unsupported LLM_PROVIDER '{provider}'. Available providers: {available}."
+            return
+
+        key = self._cache_key(message, history) if use_cache else None
+        if key is not None:
+            cached = await self.response_cache.aget(key)
+            if cached is not None:
+                meta["cached"] = True
+                yield cached
+                return
+
+        if not settings.LLM_SINGLE_FLIGHT_ENABLED:
+            chunks: list[str] = []
+            async for chunk in self._race(chain, message, history, streaming, meta, priority):
+                chunks.append(chunk)
+                yield chunk
+            # Only replies from the primary are cached: the key names the primary's model.
+            if (meta["provider"], meta["model"]) == (provider, model):
+                await self._store_reply(key, "".join(chunks))
+            return
+
+        # Concurrent identical requests share one upstream generation, streamed or not:
+        # it runs in the first caller's mode and every waiter replays its chunks, so a
+        # streaming joiner of a non-streamed generation gets the reply as one chunk.
+        flight_key = response_cache_key(provider, model, self.system_prompt, history, message)
+        flight = self._flights.get(flight_key)
+        if flight is None:
+            flight = self._flights[flight_key] = _Flight(priority)
+            flight.meta.update(meta)
+            flight.task = asyncio.create_task(self._fly(flight, flight_key, chain, message, history, streaming, key))
+        else:
+            self.coalesced += 1
+            flight.priority.raise_to(priority)
+
+        flight.waiters += 1
+        index = 0
+        try:
+            while True:
+                while index < len(flight.chunks):
+                    meta.update(flight.meta)
+                    yield flight.chunks[index]
+                    index += 1
+                if flight.done:
+                    break
+                await flight.changed.wait()
+            meta.update(flight.meta)
+            if flight.error is not None:
+                raise flight.error
+        finally:
+            flight.waiters -= 1
+            # The last waiter to leave an unfinished generation takes it down with it.
+            if not flight.waiters and not flight.done:
+                if self._flights.get(flight_key) is flight:
+                    del self._flights[flight_key]
+                flight.task.cancel()
+
+    async def _fly(
+        self,
+        flight: _Flight,
+        flight_key: str,
+        chain: list[ChainEntry],
+        message: str,
+        history: list[dict[str, str]],
+        streaming: bool,
+        cache_key: str | None,
+    ) -> None:
+        try:
+            async for chunk in self._race(chain, message, history, streaming, flight.meta, flight.priority):
+                flight.chunks.append(chunk)
+                flight.publish()
+        except Exception as exc:
+            flight.error = exc
+        finally:
+            flight.done = True
+            if self._flights.get(flight_key) is flight:
+                del self._flights[flight_key]
+            flight.publish()
+        if flight.error is None and (flight.meta["provider"], flight.meta["model"]) == chain[0]:
+            await self._store_reply(cache_key, "".join(flight.chunks))
+
+    def single_flight_stats(self) -> dict:
+        return {"in_flight": len(self._flights), "coalesced": self.coalesced}
+
+    async def _race(
+        self,
+        chain: list[ChainEntry],
+        message: str,
+        history: list[dict[str, str]],
+        streaming: bool,
+        meta: dict,
+        priority: int | AdmissionPriority,
+    ) -> AsyncIterator[str]:
+        # Walk the chain in order, skipping providers whose breaker is open. A provider
+        # that fails (raises or answers with an error string) hands over to the next one;
+        # one that has not produced a first token within its hedge delay gets the next
+        # one started alongside it, and whichever answers first wins.
+        remaining = [entry for entry in chain if entry[0] in self._providers]
+        firsts: asyncio.Queue = asyncio.Queue()
+        attempts: list[_Attempt] = []
+        failures: list[tuple[int, _Attempt, str | Exception]] = []
+        skipped: list[str] = []
+        winner: _Attempt | None = None
+
+        def launch() -> bool:
+            while remaining:
+                provider, model = remaining.pop(0)
+                attempt = _Attempt(provider, model, priority)
+                if not self.health.breaker(attempt.label).allow():
+                    skipped.append(attempt.label)
+                    continue
+                attempt.task = asyncio.create_task(self._run_attempt(attempt, message, history, streaming, firsts))
+                attempts.append(attempt)
+                return True
+            return False
 
-        return await generator(message, history)
+        try:
+            in_flight = int(launch())
+            first = None
+            while in_flight:
+                delay = self.health.hedge_delay(attempts[-1].label) if remaining else None
+                try:
+                    attempt, item = await asyncio.wait_for(firsts.get(), delay)
+                except asyncio.TimeoutError:
+                    if launch():
+                        in_flight += 1
+                        self.health.hedges += 1
+                    continue
+                in_flight -= 1
+                if isinstance(item, Exception) or (isinstance(item, str) and is_provider_error(item)):
+                    if isinstance(item, ProviderOverloaded) or (
+                        isinstance(item, str) and item.startswith(CONFIGURATION_ERROR_PREFIXES)
+                    ):
+                        self.health.breaker(attempt.label).release()
+                    else:
+                        self.health.breaker(attempt.label).record_failure()
+                    failures.append((attempts.index(attempt), attempt, item))
+                    if not in_flight and launch():
+                        in_flight += 1
+                        self.health.fallbacks += 1
+                    continue
+                self.health.breaker(attempt.label).record_success()
+                self.health.latencies(attempt.label).observe(time.monotonic() - attempt.started)
+                winner, first = attempt, item
+                break
+
+            if winner is None:
+                if not failures:
+                    retry_after = min(self.health.breaker(label).retry_after() for label in skipped)
+                    yield (
+                        f"LLM providers unavailable: circuit open for {', '.join(skipped)}. "
+                        f"Retry in {math.ceil(retry_after)}s."
+                    )
+                    return
+                # Report the failure of the earliest provider in the chain, as a lone provider would.
+                _, attempt, error = min(failures, key=lambda failure: failure[0])
+                meta.update(provider=attempt.provider, model=attempt.model)
+                if isinstance(error, Exception):
+                    raise error
+                yield error
+                return
+
+            meta.update(provider=winner.provider, model=winner.model, queue_wait_ms=round(winner.queue_wait * 1000, 2))
+            item = first
+            while item is not _END:
+                if isinstance(item, Exception):
+                    raise item
+                if item:
+                    yield item
+                item = await winner.chunks.get()
+        finally:
+            for attempt in attempts:
+                if attempt.task.done():
+                    continue
+                attempt.task.cancel()
+                if attempt is not winner:
+                    self.health.breaker(attempt.label).release()
+
+    async def _run_attempt(
+        self,
+        attempt: _Attempt,
+        message: str,
+        history: list[dict[str, str]],
+        streaming: bool,
+        firsts: asyncio.Queue,
+    ) -> None:
+        _chain_model.set(attempt.model)
+        started = False
+
+        def emit(item) -> None:
+            nonlocal started
+            if started:
+                attempt.chunks.put_nowait(item)
+            else:
+                started = True
+                firsts.put_nowait((attempt, item))
+
+        try:
+            async with self.admission.slot(attempt.provider, attempt.priority) as waited:
+                # First-token latency is measured from admission so queueing does not skew hedge delays.
+                attempt.queue_wait = waited
+                attempt.started = time.monotonic()
+                stream = self._stream_providers.get(attempt.provider) if streaming else None
+                if stream is None:
+                    emit(await self._providers[attempt.provider](message, history))
+                else:
+                    async for chunk in stream(message, history):
+                        if chunk:
+                            emit(chunk)
+                emit(_END)
+        except Exception as exc:
+            emit(exc)
+
+    def _chat_payload(self, model: str, message: str, history: list[dict[str, str]], **extra) -> dict:
+        return {
+            "model": model,
+            **extra,
+            "messages": [
+                {"role": "system", "content": self.system_prompt},
+                *history,
+                {"role": "user", "content": message},
+            ],
+        }
 
     async def _generate_openai(self, message: str, history: list[dict[str, str]]) -> str:
         if not settings.OPENAI_API_KEY:
@@ -67,21 +540,13 @@ class AIService:
             "Content-Type": "application/json",
         }
 
-        payload = {
-            "model": settings.OPENAI_MODEL,
-            "messages": [
-                {"role": "system", "content": self.system_prompt},
-                *history,
-                {"role": "user", "content": message},
-            ],
-        }
+        payload = self._chat_payload(_chain_model.get() or settings.OPENAI_MODEL, message, history)
 
-        async with httpx.AsyncClient(timeout=30) as client:
-            response = await client.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers=headers,
-                json=payload,
-            )
+        response = await self.http.get("openai").post(
+            "https://api.openai.com/v1/chat/completions",
+            headers=headers,
+            json=payload,
+        )
 
         if response.status_code != 200:
             return f"OpenAI error: {response.text}"
@@ -90,28 +555,15 @@ class AIService:
         return data["choices"][0]["message"]["content"]
 
     async def _generate_ollama(self, message: str, history: list[dict[str, str]]) -> str:
-        payload = {
-            "model": settings.OLLAMA_MODEL,
-            "stream": False,
-            "messages": [
-                {"role": "system", "content": self.system_prompt},
-                *history,
-                {"role": "user", "content": message},
-            ],
-        }
+        payload = self._chat_payload(_chain_model.get() or settings.OLLAMA_MODEL, message, history, stream=False)
 
         try:
-            async with httpx.AsyncClient(timeout=180) as client:
-                response = await client.post(
-                    f"{settings.OLLAMA_BASE_URL}/api/chat",
-                    json=payload,
-                )
-        except httpx.RequestError:
-            return (
-                "Ollama is not reachable. "
-                f"Expected server at {settings.OLLAMA_BASE_URL}. "
-                "Start Ollama locally or set LLM_PROVIDER=openai with OPENAI_API_KEY configured."
+            response = await self.http.get("ollama").post(
+                f"{settings.OLLAMA_BASE_URL}/api/chat",
+                json=payload,
             )
+        except httpx.RequestError:
+            return self._ollama_unreachable_message()
 
         if response.status_code != 200:
             return f"Ollama error: {response.text}"
@@ -119,6 +571,73 @@ class AIService:
         data = response.json()
         return data["message"]["content"]
 
+    @staticmethod
+    def _ollama_unreachable_message() -> str:
+        return (
+            "Ollama is not reachable. "
+            f"Expected server at {settings.OLLAMA_BASE_URL}. "
+            "Start Ollama locally or set LLM_PROVIDER=openai with OPENAI_API_KEY configured."
+        )
+
+    async def _stream_openai(self, message: str, history: list[dict[str, str]]) -> AsyncIterator[str]:
+        if not settings.OPENAI_API_KEY:
+            yield "OPENAI_API_KEY not configured."
+            return
+
+        headers = {
+            "Authorization": f"Bearer {settings.OPENAI_API_KEY}",
+            "Content-Type": "application/json",
+        }
+        payload = self._chat_payload(_chain_model.get() or settings.OPENAI_MODEL, message, history, stream=True)
+
+        async with self.http.get("openai").stream(
+            "POST",
+            "https://api.openai.com/v1/chat/completions",
+            headers=headers,
+            json=payload,
+        ) as response:
+            if response.status_code != 200:
+                yield f"OpenAI error: {(await response.aread()).decode(errors='replace')}"
+                return
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    return
+                choices = json.loads(data).get("choices") or [{}]
+                content = (choices[0].get("delta") or {}).get("content")
+                if content:
+                    yield content
+
+    async def _stream_ollama(self, message: str, history: list[dict[str, str]]) -> AsyncIterator[str]:
+        payload = self._chat_payload(_chain_model.get() or settings.OLLAMA_MODEL, message, history, stream=True)
+
+        received = False
+        try:
+            async with self.http.get("ollama").stream(
+                "POST",
+                f"{settings.OLLAMA_BASE_URL}/api/chat",
+                json=payload,
+            ) as response:
+                if response.status_code != 200:
+                    yield f"Ollama error: {(await response.aread()).decode(errors='replace')}"
+                    return
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    data = json.loads(line)
+                    content = (data.get("message") or {}).get("content")
+                    if content:
+                        received = True
+                        yield content
+                    if data.get("done"):
+                        return
+        except httpx.RequestError:
+            if received:
+                raise
+            yield self._ollama_unreachable_message()
+
     async def _maybe_execute_tool(self, message: str) -> str | None:
         match = re.match(r"^\s*/tool\s+([a-zA-Z0-9_-]+)(?:\s+(.*))?$", message)
         if not match:
@@ -137,10 +656,39 @@ class AIService:
             available = ", ".join(sorted(self._tools.keys()))
             return f"Tool '{tool_name}' is not available. Available tools: {available}."
 
-        output = tool(tool_input)
-        if inspect.isawaitable(output):
-            return await output
-        return output
+        return await self._run_tool(tool_name, tool, tool_input)
+
+    async def _run_tool(self, name: str, tool: _Tool, tool_input: str) -> str:
+        submitted: Future | None = None
+
+        async def call() -> str:
+            nonlocal submitted
+            if tool.blocking:
+                submitted = self._tool_executor().submit(tool.fn, tool_input)
+                output = await asyncio.wrap_future(submitted)
+            else:
+                output = tool.fn(tool_input)
+            if inspect.isawaitable(output):
+                output = await output
+            return output
+
+        # Time spent waiting for a free pool thread counts against the timeout.
+        timeout = self._tool_timeout(name, tool)
+        started = time.monotonic()
+        try:
+            return await asyncio.wait_for(call(), timeout)
+        except asyncio.TimeoutError:
+            tool.timeouts += 1
+            # A call still queued for a thread was cancelled with the wait; one already
+            # running keeps its thread.
+            if submitted is not None and not submitted.done():
+                tool.abandon(submitted)
+            return f"Tool '{name}' timed out after {timeout:g}s."
+        except Exception as exc:
+            tool.errors += 1
+            return f"Tool '{name}' failed: {exc}"
+        finally:
+            tool.record(time.monotonic() - started)
 
     async def _tool_echo(self, tool_input: str) -> str:
         if not tool_input:
@@ -150,10 +698,10 @@ class AIService:
     async def _tool_utc_time(self, _: str) -> str:
         return datetime.now(timezone.utc).replace(microsecond=0).isoformat()
 
-    async def _tool_fs_pwd(self, _: str) -> str:
+    def _tool_fs_pwd(self, _: str) -> str:
         return str(Path.cwd())
 
-    async def _tool_fs_list(self, tool_input: str) -> str:
+    def _tool_fs_list(self, tool_input: str) -> str:
         target = Path(tool_input or ".")
 
         try:
@@ -173,29 +721,12 @@ class AIService:
             return f"(empty directory) {target.resolve()}"
         return "\n".join(items)
 
-    def _resolve_fs_read_target(self, raw_path: str) -> tuple[Path | None, str | None]:
-        fs_read_root = Path(settings.FS_READ_ROOT).expanduser().resolve()
-
-        expanded_input = Path(raw_path).expanduser()
-        if expanded_input.is_absolute():
-            candidate = expanded_input.resolve()
-        else:
-            candidate = (fs_read_root / expanded_input).resolve()
-
-        try:
-            candidate.relative_to(fs_read_root)
-        except ValueError:
-            return None, (
-                f"Access denied: path must stay within FS_READ_ROOT ({fs_read_root})."
-            )
-
-        return candidate, None
+    def _tool_fs_read(self, tool_input: str) -> str:
+        raw_path, range_spec = split_range(tool_input)
+        if not raw_path:
+            return "Usage: /tool fs_read <path> [start:end | bytes=start:end]"
 
-    async def _tool_fs_read(self, tool_input: str) -> str:
-        if not tool_input:
-            return "Usage: /tool fs_read <path>"
-
-        target, error = self._resolve_fs_read_target(tool_input)
+        target, error = resolve_fs_read_target(raw_path)
         if error is not None or target is None:
             return error or "Access denied."
 
@@ -204,29 +735,88 @@ class AIService:
                 return f"Path not found: {target}"
             if target.is_dir():
                 return f"Path is a directory: {target}"
-
-            return target.read_text(encoding="utf-8")
+            # FIFOs and device files could block a pool thread forever on open or read.
+            if not target.is_file():
+                return f"Path is not a regular file: {target}"
+
+            return read_text(
+                target,
+                range_spec,
+                max_bytes=settings.FS_READ_MAX_BYTES,
+                mmap_min_bytes=settings.FS_READ_MMAP_MIN_BYTES,
+            )
         except UnicodeDecodeError:
             return f"File is not UTF-8 text: {target}"
         except OSError as exc:
             return f"Filesystem error: {exc}"
 
-    async def _github_get_json(self, endpoint: str) -> dict | list | None:
-        url = f"https://api.github.com{endpoint}"
+    @staticmethod
+    def _github_headers() -> dict[str, str]:
         headers = {
             "Accept": "application/vnd.github+json",
             "User-Agent": "Orty-AIService",
         }
+        if settings.GITHUB_TOKEN:
+            headers["Authorization"] = f"Bearer {settings.GITHUB_TOKEN}"
+        return headers
+
+    async def _github_get_json(self, endpoint: str) -> dict | list | None:
+        url = f"{settings.GITHUB_API_BASE_URL}{endpoint}"
+        headers = self._github_headers()
+
+        cache = self.github_cache
+        cached = await cache.aget(url) if cache is not None else None
+        if cached is not None:
+            if cache.is_fresh(cached):
+                cache.count("fresh_hits")
+                return json.loads(cached["body"])
+            if self.github_rate_limit.exhausted():
+                cache.count("stale_served")
+                return json.loads(cached["body"])
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+        elif self.github_rate_limit.exhausted():
+            return {"error": self._github_rate_limit_message()}
+
         try:
-            async with httpx.AsyncClient(timeout=15) as client:
-                response = await client.get(url, headers=headers)
+            response = await self.http.get("github").get(url, headers=headers)
         except httpx.RequestError as exc:
+            if cached is not None:
+                cache.count("stale_served")
+                return json.loads(cached["body"])
             return {"error": f"GitHub request failed: {exc}"}
 
+        self.github_rate_limit.update(response.headers)
+        if response.status_code == 304 and cached is not None:
+            cache.count("revalidated")
+            await cache.atouch(url)
+            return json.loads(cached["body"])
+        if response.status_code in {403, 429} and self.github_rate_limit.exhausted():
+            if cached is not None:
+                cache.count("stale_served")
+                return json.loads(cached["body"])
+            return {"error": self._github_rate_limit_message()}
+
         if response.status_code != 200:
             return {"error": f"GitHub API error ({response.status_code}): {response.text}"}
 
-        return response.json()
+        data = response.json()
+        if cache is not None:
+            cache.count("misses")
+            await cache.aput(
+                url,
+                json.dumps(data),
+                response.headers.get("etag"),
+                response.headers.get("last-modified"),
+            )
+        return data
+
+    def _github_rate_limit_message(self) -> str:
+        reset = datetime.fromtimestamp(self.github_rate_limit.reset_at, timezone.utc).replace(microsecond=0)
+        hint = "" if settings.GITHUB_TOKEN else " Set GITHUB_TOKEN for a higher limit."
+        return f"GitHub API rate limit exhausted until {reset.isoformat()}.{hint}"
 
     async def _tool_gh_repo(self, tool_input: str) -> str:
         repo = tool_input.strip()
@@ -251,19 +841,108 @@ class AIService:
             ]
         )
 
-    async def _tool_gh_tree(self, tool_input: str) -> str:
-        if not tool_input.strip():
-            return "Usage: /tool gh_tree <owner/repo> [path]"
+    async def _github_snapshot(self, repo: str, ref: str) -> tuple[Path | None, str | None]:
+        # Returns (snapshot root, None), (None, error to report) or (None, None) when the
+        # caller should fall back to per-path API requests.
+        if self.github_snapshots is None:
+            return None, None
+        if not SHA_PATTERN.fullmatch(ref):
+            requested = ref
+            ref = self.github_snapshots.resolved_ref(repo, requested) or ""
+            if not ref:
+                # Resolved refs are remembered briefly so back-to-back tool calls skip both lookups.
+                branch = requested
+                if not branch:
+                    data = await self._github_get_json(f"/repos/{repo}")
+                    if isinstance(data, dict) and data.get("error"):
+                        return None, data["error"]
+                    branch = data.get("default_branch", "") if isinstance(data, dict) else ""
+                data = await self._github_get_json(f"/repos/{repo}/commits/{quote(branch, safe='')}")
+                if isinstance(data, dict) and data.get("error"):
+                    return None, data["error"]
+                ref = data.get("sha", "") if isinstance(data, dict) else ""
+                if not SHA_PATTERN.fullmatch(ref):
+                    return None, None
+                self.github_snapshots.remember_ref(repo, requested, ref)
+
+        url = f"{settings.GITHUB_API_BASE_URL}/repos/{repo}/tarball/{ref}"
+        try:
+            root = await self.github_snapshots.snapshot(self.http.get("github"), url, self._github_headers(), repo, ref)
+        except (httpx.HTTPError, SnapshotUnavailable, tarfile.TarError, OSError):
+            return None, None
+        return root, None
+
+    @staticmethod
+    def _snapshot_path(root: Path, subpath: str) -> Path | None:
+        target = (root / subpath.strip("/")).resolve()
+        try:
+            target.relative_to(root.resolve())
+        except ValueError:
+            return None
+        return target
+
+    @staticmethod
+    def _format_tree(entries: list[str]) -> str:
+        if not entries:
+            return "(empty)"
+        if len(entries) > GH_TREE_MAX_ENTRIES:
+            hidden = len(entries) - GH_TREE_MAX_ENTRIES
+            entries = [*entries[:GH_TREE_MAX_ENTRIES], f"... ({hidden} more entries)"]
+        return "\n".join(entries)
+
+    def _snapshot_tree(self, root: Path, subpath: str, recursive: bool) -> str:
+        target = self._snapshot_path(root, subpath)
+        if target is None or not target.exists():
+            return f"Path not found: {subpath}"
+        if target.is_file():
+            return f"{target.name} (file)"
+        if not recursive:
+            entries = sorted(target.iterdir(), key=lambda entry: entry.name.lower())
+            return self._format_tree([f"{entry.name}/" if entry.is_dir() else entry.name for entry in entries])
+
+        entries = []
+        for directory, dirnames, filenames in os.walk(target):
+            relative = Path(directory).relative_to(target)
+            entries += [f"{(relative / name).as_posix()}/" for name in dirnames]
+            entries += [(relative / name).as_posix() for name in filenames]
+        return self._format_tree(sorted(entries, key=str.lower))
 
-        parts = tool_input.split(maxsplit=1)
-        repo = parts[0]
-        subpath = parts[1].strip() if len(parts) > 1 else ""
-        if not REPO_PATTERN.fullmatch(repo):
-            return "Usage: /tool gh_tree <owner/repo> [path]"
+    async def _tool_gh_tree(self, tool_input: str) -> str:
+        usage = "Usage: /tool gh_tree <owner/repo> [path] [--recursive] [--ref=<ref>]"
+        tokens = tool_input.split()
+        recursive = any(token in {"-r", "--recursive"} for token in tokens)
+        ref = next((token.split("=", 1)[1] for token in tokens if token.startswith("--ref=")), "")
+        positional = [token for token in tokens if not token.startswith("-")]
+        if not positional or not REPO_PATTERN.fullmatch(positional[0]):
+            return usage
+        repo = positional[0]
+        subpath = " ".join(positional[1:]).strip("/")
+
+        root, error = await self._github_snapshot(repo, ref)
+        if error is not None:
+            return error
+        if root is not None:
+            return await asyncio.to_thread(self._snapshot_tree, root, subpath, recursive)
+
+        if recursive:
+            data = await self._github_get_json(f"/repos/{repo}/git/trees/{quote(ref or 'HEAD', safe='')}?recursive=1")
+            if isinstance(data, dict) and data.get("error"):
+                return data["error"]
+            if not isinstance(data, dict) or not isinstance(data.get("tree"), list):
+                return "Unexpected GitHub API response."
+            prefix = f"{subpath}/" if subpath else ""
+            entries = [
+                item["path"][len(prefix):] + ("/" if item.get("type") == "tree" else "")
+                for item in data["tree"]
+                if item.get("path", "").startswith(prefix)
+            ]
+            return self._format_tree(entries)
 
         endpoint = f"/repos/{repo}/contents"
         if subpath:
             endpoint += f"/{subpath}"
+        if ref:
+            endpoint += f"?ref={ref}"
 
         data = await self._github_get_json(endpoint)
         if isinstance(data, dict) and data.get("error"):
@@ -278,6 +957,27 @@ class AIService:
         items = [f"{item.get('name', '?')}/" if item.get("type") == "dir" else item.get("name", "?") for item in data]
         return "\n".join(items) if items else "(empty)"
 
+    def _snapshot_file(self, root: Path, file_path: str) -> str:
+        target = self._snapshot_path(root, file_path)
+        if target is None or not target.exists():
+            return f"Path not found: {file_path}"
+        if not target.is_file():
+            return f"Path is not a file: {file_path}"
+        size = target.stat().st_size
+        with target.open("rb") as handle:
+            data = handle.read(GH_FILE_MAX_BYTES)
+        truncated = size > len(data)
+        try:
+            text = data.decode("utf-8")
+        except UnicodeDecodeError as exc:
+            # The cut may split a multi-byte character at the end.
+            if not truncated or exc.start < len(data) - 3 or exc.reason != "unexpected end of data":
+                return "GitHub file is not valid UTF-8 text."
+            text = data[: exc.start].decode("utf-8")
+        if truncated:
+            text += f"\n[... truncated: {file_path} is {size} bytes, showing the first {GH_FILE_MAX_BYTES} ...]"
+        return text
+
     async def _tool_gh_file(self, tool_input: str) -> str:
         parts = tool_input.split(maxsplit=2)
         if len(parts) < 2 or not REPO_PATTERN.fullmatch(parts[0]):
@@ -287,6 +987,12 @@ class AIService:
         file_path = parts[1]
         ref = parts[2].strip() if len(parts) == 3 else ""
 
+        root, error = await self._github_snapshot(repo, ref)
+        if error is not None:
+            return error
+        if root is not None:
+            return await asyncio.to_thread(self._snapshot_file, root, file_path)
+
         endpoint = f"/repos/{repo}/contents/{file_path}"
         if ref:
             endpoint = f"{endpoint}?ref={ref}"
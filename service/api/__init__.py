@@ -1,17 +1,60 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
+from service.api.deps import (
+    ai_service,
+    async_memory_store,
+    conversation_summarizer,
+    db_executor,
+    event_writer,
+    last_seen_buffer,
+    resolve_primary_client,
+    storage_maintenance,
+)
 from service.api.routes.chat import router as chat_router
 from service.api.routes.health import router as health_router
 from service.api.routes.ui import root_router as ui_root_router
 from service.api.routes.ui import router as ui_router
 from service.api.routes.v1_bots import router as v1_bots_router
 from service.api.routes.v1_clients import router as v1_clients_router
+from service.api.routes.v1_files import router as v1_files_router
+from service.api.routes.v1_memory import router as v1_memory_router
+from service.api.routes.v1_metrics import router as v1_metrics_router
+from service.config import settings
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    await resolve_primary_client()
+    ai_service.http.open("openai", "ollama", "github")
+    maintenance_task = None
+    if storage_maintenance.policy.is_enabled():
+        maintenance_task = asyncio.create_task(
+            storage_maintenance.run_forever(settings.RETENTION_INTERVAL_SECONDS),
+            name="storage-maintenance",
+        )
+    yield
+    if maintenance_task is not None:
+        maintenance_task.cancel()
+        await asyncio.gather(maintenance_task, return_exceptions=True)
+    await conversation_summarizer.close()
+    await async_memory_store.close()
+    await ai_service.aclose()
+    event_writer.close()
+    last_seen_buffer.close()
+    db_executor.shutdown()
+
 
-app = FastAPI(title='Orty AI Assistant')
+app = FastAPI(title='Orty AI Assistant', lifespan=lifespan)
 app.include_router(health_router)
 app.include_router(chat_router)
 app.include_router(v1_clients_router)
 app.include_router(v1_bots_router)
+app.include_router(v1_memory_router)
+app.include_router(v1_files_router)
+app.include_router(v1_metrics_router)
 
 app.include_router(ui_root_router)
 app.include_router(ui_router)
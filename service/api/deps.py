@@ -1,23 +1,58 @@
+import atexit
+
 from fastapi import Header, HTTPException
 
+from service.admission import PRIORITY_BACKGROUND
+from service.ai import AIService
 from service.config import settings
+from service.github_cache import GitHubCache
+from service.github_snapshots import RepoSnapshotCache
 from service.memory import MemoryStore
+from service.storage.async_repos import (
+    AsyncBotEventsRepository,
+    AsyncClientsRepository,
+    AsyncMemoryStore,
+)
 from service.storage.bot_events_repo import BotEventsRepository
 from service.storage.bots_repo import BotsRepository
+from service.storage.client_auth import LastSeenBuffer
 from service.storage.clients_repo import ClientsRepository
 from service.storage.db import SQLiteDB
+from service.storage.executor import DBExecutor
+from service.storage.maintenance import StorageMaintenance
+from service.response_cache import ResponseCache
+from service.summaries import ConversationSummarizer
 from service.supervisor.bot_registry import BotRegistry
 from service.supervisor.bot_runner import BotRunner
+from service.supervisor.event_bus import BotEventBus
 from service.supervisor.events import BotEventWriter
 
 _db = SQLiteDB()
 clients_repo = ClientsRepository(_db)
+last_seen_buffer = LastSeenBuffer(clients_repo, settings.CLIENT_LAST_SEEN_FLUSH_SECONDS)
+atexit.register(last_seen_buffer.close)
 bots_repo = BotsRepository(_db)
 bot_events_repo = BotEventsRepository(_db)
-event_writer = BotEventWriter(bot_events_repo)
+event_bus = BotEventBus(settings.BOT_EVENT_STREAM_BUFFER)
+event_writer = BotEventWriter(bot_events_repo, bus=event_bus)
+atexit.register(event_writer.close)
 bot_registry = BotRegistry(bots_repo, event_writer)
 memory_store = MemoryStore(_db.db_path)
-bot_runner = BotRunner(bot_registry, bots_repo, event_writer, memory_store)
+db_executor = DBExecutor(settings.SQLITE_READER_THREADS)
+bot_runner = BotRunner(bot_registry, bots_repo, event_writer, memory_store, db_executor)
+async_clients_repo = AsyncClientsRepository(clients_repo, db_executor)
+async_bot_events_repo = AsyncBotEventsRepository(bot_events_repo, db_executor)
+async_memory_store = AsyncMemoryStore(memory_store, db_executor)
+storage_maintenance = StorageMaintenance.from_settings(_db, on_messages_pruned=memory_store.history_cache.clear)
+
+response_cache = ResponseCache.from_settings(_db, db_executor) if settings.RESPONSE_CACHE_ENABLED else None
+github_cache = GitHubCache.from_settings(_db, db_executor) if settings.GITHUB_CACHE_ENABLED else None
+github_snapshots = RepoSnapshotCache.from_settings() if settings.GITHUB_SNAPSHOT_ENABLED else None
+ai_service = AIService(response_cache=response_cache, github_cache=github_cache, github_snapshots=github_snapshots)
+conversation_summarizer = ConversationSummarizer.from_settings(
+    async_memory_store,
+    lambda prompt: ai_service.generate(prompt, history=[], use_cache=False, priority=PRIORITY_BACKGROUND),
+)
 
 
 def ensure_primary_client() -> dict:
@@ -32,26 +67,32 @@ def ensure_primary_client() -> dict:
     return clients_repo.get_client(created["client_id"]) or created
 
 
-def require_client_auth(
+async def resolve_primary_client() -> dict:
+    # Served from the repository's process cache; only the first call (or one right
+    # after the primary changed) reaches the database.
+    return clients_repo.cached_primary_client() or await db_executor.write(ensure_primary_client)
+
+
+async def require_client_auth(
     x_orty_client_id: str = Header(...),
     x_orty_client_token: str = Header(...),
 ) -> str:
-    if not clients_repo.verify_client_token(x_orty_client_id, x_orty_client_token):
+    if await async_clients_repo.authenticate_client(x_orty_client_id, x_orty_client_token) is None:
         raise HTTPException(status_code=401, detail="Unauthorized")
     return x_orty_client_id
 
 
-def get_request_auth(
+async def get_request_auth(
     x_orty_secret: str | None = Header(default=None),
     x_orty_client_id: str | None = Header(default=None),
     x_orty_client_token: str | None = Header(default=None),
 ) -> dict:
     if x_orty_secret and x_orty_secret == settings.ORTY_SHARED_SECRET:
-        primary = ensure_primary_client()
+        primary = await resolve_primary_client()
         return {"is_admin": True, "client_id": primary["client_id"], "client": primary}
     if x_orty_client_id and x_orty_client_token:
-        if clients_repo.verify_client_token(x_orty_client_id, x_orty_client_token):
-            client = clients_repo.get_client(x_orty_client_id)
+        client = await async_clients_repo.authenticate_client(x_orty_client_id, x_orty_client_token)
+        if client is not None:
             return {"is_admin": False, "client_id": x_orty_client_id, "client": client}
     raise HTTPException(status_code=401, detail="Unauthorized")
 
@@ -1,30 +1,176 @@
-from fastapi import APIRouter, Depends
+import asyncio
+import json
+from collections.abc import AsyncIterator
 
-from service.ai import AIService
-from service.api.deps import get_request_auth
-from service.memory import MemoryStore
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+
+from service.admission import ProviderOverloaded
+from service.api.deps import ai_service, conversation_summarizer, get_request_auth
+from service.api.deps import async_memory_store as memory_store
+from service.config import settings
+from service.memory import estimate_tokens, recall_history_message, resolve_history_token_budget
 from service.models.schemas import ChatRequest, ChatResponse
+from service.summaries import summary_history_message
 
 router = APIRouter()
-ai_service = AIService()
-memory_store = MemoryStore()
 
 
-@router.post('/chat', response_model=ChatResponse)
-async def chat(request: ChatRequest, auth: dict = Depends(get_request_auth)):
+async def load_history(request: ChatRequest, conversation_id: str, client_id: str | None) -> list[dict[str, str]]:
+    prefix: list[dict[str, str]] = []
+    after_id = None
+    if request.recall_k:
+        recalled = await memory_store.recall(
+            client_id,
+            request.message,
+            k=request.recall_k,
+            exclude_conversation_id=conversation_id,
+        )
+        if recalled:
+            prefix.append(recall_history_message(recalled))
+
+    # With summaries on, older turns are replaced by the stored summary and only
+    # messages past its high-water mark are sent verbatim.
+    if conversation_summarizer.enabled:
+        summary = await memory_store.get_summary(conversation_id, client_id=client_id)
+        if summary:
+            prefix.append(summary_history_message(summary["summary"]))
+            after_id = summary["high_water_message_id"]
+
+    if request.history_token_budget is None:
+        tail = await memory_store.get_recent_messages(
+            conversation_id,
+            limit=request.history_limit,
+            client_id=client_id,
+            after_id=after_id,
+        )
+        return prefix + tail
+
+    provider, model = ai_service.active_model()
+    budget = resolve_history_token_budget(provider, model, request.history_token_budget)
+    budget = max(1, budget - sum(estimate_tokens(message["content"]) for message in prefix))
+    # An explicit history_limit still caps the window; otherwise allow the full 50.
+    max_messages = request.history_limit if "history_limit" in request.model_fields_set else 50
+    tail = await memory_store.get_messages_within_token_budget(
+        conversation_id,
+        budget,
+        client_id=client_id,
+        max_messages=max_messages,
+        max_message_tokens=settings.HISTORY_MAX_MESSAGE_TOKENS or max(1, budget // 2),
+        after_id=after_id,
+    )
+    return prefix + tail
+
+
+async def prepare_chat(request: ChatRequest, client_id: str | None) -> tuple[str, list[dict[str, str]]]:
     incoming_conversation_id = None if request.reset_conversation else request.conversation_id
     conversation_id = memory_store.ensure_conversation_id(incoming_conversation_id)
-    client_id = auth.get("client_id")
+    if request.reset_conversation and request.conversation_id:
+        memory_store.invalidate_conversation(request.conversation_id, client_id)
+    history = await load_history(request, conversation_id, client_id)
+    return conversation_id, history
+
+
+async def persist_turn(conversation_id: str, client_id: str | None, message: str, reply: str) -> None:
+    await memory_store.append_turn(
+        conversation_id,
+        client_id,
+        [{'role': 'user', 'content': message}, {'role': 'assistant', 'content': reply}],
+    )
+    conversation_summarizer.schedule(conversation_id, client_id)
+
+
+# Persists started while a stream is being torn down run detached; keep them referenced.
+_detached_persists: set[asyncio.Task] = set()
+
+
+def overloaded_error(exc: ProviderOverloaded) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": str(exc.retry_after)})
+
 
-    history = memory_store.get_recent_messages(conversation_id, limit=request.history_limit, client_id=client_id)
-    reply = await ai_service.generate(request.message, history=history)
+def admit_chat() -> None:
+    try:
+        ai_service.check_admission()
+    except ProviderOverloaded as exc:
+        raise overloaded_error(exc) from exc
+
+
+async def generate_chat_reply(request: ChatRequest, history: list[dict[str, str]]) -> dict:
+    try:
+        return await ai_service.generate_reply(request.message, history=history, use_cache=request.cache)
+    except ProviderOverloaded as exc:
+        raise overloaded_error(exc) from exc
+
+
+def _sse(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+async def stream_chat_reply(
+    request: ChatRequest,
+    conversation_id: str,
+    client_id: str | None,
+    history: list[dict[str, str]],
+) -> AsyncIterator[str]:
+    chunks: list[str] = []
+    meta: dict = {}
+    persisted = not request.persist
+    try:
+        yield _sse("start", {"conversation_id": conversation_id, "used_history": len(history)})
+        try:
+            async for chunk in ai_service.generate_stream(
+                request.message, history=history, use_cache=request.cache, meta=meta
+            ):
+                chunks.append(chunk)
+                yield _sse("token", {"delta": chunk})
+        except ProviderOverloaded as exc:
+            # Headers are already sent, so shedding after admission is reported in-band.
+            yield _sse("error", {"detail": str(exc), "retry_after": exc.retry_after})
+            return
+        reply = "".join(chunks)
+        if not persisted:
+            persisted = True
+            await persist_turn(conversation_id, client_id, request.message, reply)
+        yield _sse(
+            "done",
+            {"reply": reply, "conversation_id": conversation_id, "used_history": len(history), **meta},
+        )
+    finally:
+        # Client disconnected mid-stream: keep whatever was generated so far.
+        if not persisted and chunks:
+            task = asyncio.create_task(persist_turn(conversation_id, client_id, request.message, "".join(chunks)))
+            _detached_persists.add(task)
+            task.add_done_callback(_detached_persists.discard)
+
+
+def sse_response(stream: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        stream,
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+@router.post('/chat', response_model=ChatResponse)
+async def chat(request: ChatRequest, auth: dict = Depends(get_request_auth)):
+    admit_chat()
+    client_id = auth.get("client_id")
+    conversation_id, history = await prepare_chat(request, client_id)
+    result = await generate_chat_reply(request, history)
 
     if request.persist:
-        memory_store.append_message(conversation_id, 'user', request.message, client_id=client_id)
-        memory_store.append_message(conversation_id, 'assistant', reply, client_id=client_id)
+        await persist_turn(conversation_id, client_id, request.message, result["reply"])
 
     return ChatResponse(
-        reply=reply,
+        **result,
         conversation_id=conversation_id,
         used_history=len(history),
     )
+
+
+@router.post('/chat/stream')
+async def chat_stream(request: ChatRequest, auth: dict = Depends(get_request_auth)):
+    admit_chat()
+    client_id = auth.get("client_id")
+    conversation_id, history = await prepare_chat(request, client_id)
+    return sse_response(stream_chat_reply(request, conversation_id, client_id, history))
@@ -1,15 +1,19 @@
 from fastapi import APIRouter
 from fastapi.responses import HTMLResponse, RedirectResponse
 
-from service.ai import AIService
-from service.api.deps import ensure_primary_client
-from service.memory import MemoryStore
+from service.api.deps import resolve_primary_client
+from service.api.routes.chat import (
+    admit_chat,
+    generate_chat_reply,
+    persist_turn,
+    prepare_chat,
+    sse_response,
+    stream_chat_reply,
+)
 from service.models.schemas import ChatRequest, ChatResponse
 
 router = APIRouter(prefix='/ui', tags=['ui'], redirect_slashes=False)
 root_router = APIRouter(tags=['ui'])
-ai_service = AIService()
-memory_store = MemoryStore()
 
 
 @root_router.get('/', include_in_schema=False)
@@ -19,22 +23,23 @@ async def root_to_ui() -> RedirectResponse:
 
 @router.post('/chat', response_model=ChatResponse)
 async def ui_chat(request: ChatRequest):
-    primary = ensure_primary_client()
-    incoming_conversation_id = None if request.reset_conversation else request.conversation_id
-    conversation_id = memory_store.ensure_conversation_id(incoming_conversation_id)
-
-    history = memory_store.get_recent_messages(
-        conversation_id,
-        limit=request.history_limit,
-        client_id=primary['client_id'],
-    )
-    reply = await ai_service.generate(request.message, history=history)
+    admit_chat()
+    primary = await resolve_primary_client()
+    conversation_id, history = await prepare_chat(request, primary['client_id'])
+    result = await generate_chat_reply(request, history)
 
     if request.persist:
-        memory_store.append_message(conversation_id, 'user', request.message, client_id=primary['client_id'])
-        memory_store.append_message(conversation_id, 'assistant', reply, client_id=primary['client_id'])
+        await persist_turn(conversation_id, primary['client_id'], request.message, result["reply"])
+
+    return ChatResponse(**result, conversation_id=conversation_id, used_history=len(history))
 
-    return ChatResponse(reply=reply, conversation_id=conversation_id, used_history=len(history))
+
+@router.post('/chat/stream')
+async def ui_chat_stream(request: ChatRequest):
+    admit_chat()
+    primary = await resolve_primary_client()
+    conversation_id, history = await prepare_chat(request, primary['client_id'])
+    return sse_response(stream_chat_reply(request, conversation_id, primary['client_id'], history))
 
 
 @router.get('', response_class=HTMLResponse)
@@ -101,9 +106,11 @@ async def ui_home() -> str:
       const label = document.createElement('strong');
       label.textContent = role === 'user' ? 'You:' : 'Orty:';
       div.appendChild(label);
-      div.appendChild(document.createTextNode(` ${text}`));
+      const body = document.createTextNode(` ${text}`);
+      div.appendChild(body);
       chatLog.appendChild(div);
       chatLog.scrollTop = chatLog.scrollHeight;
+      return body;
     }
 
     clearButton.addEventListener('click', () => {
@@ -127,7 +134,7 @@ async def ui_home() -> str:
         const payload = { message };
         if (conversation_id) payload.conversation_id = conversation_id;
 
-        const response = await fetch('/ui/chat', {
+        const response = await fetch('/ui/chat/stream', {
           method: 'POST',
           headers: {
             'Content-Type': 'application/json',
@@ -135,18 +142,39 @@ async def ui_home() -> str:
           body: JSON.stringify(payload),
         });
 
-        const body = await response.json();
         if (!response.ok) {
+          const body = await response.json();
           appendMessage('assistant', `Error: ${body.detail || response.status}`);
           statusEl.textContent = `Request failed (${response.status}).`;
           return;
         }
 
-        appendMessage('assistant', body.reply);
-
-        if (body.conversation_id) {
-          conversationInput.value = body.conversation_id;
-          localStorage.setItem('orty.conversation_id', body.conversation_id);
+        const replyText = appendMessage('assistant', '');
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffered = '';
+        statusEl.textContent = 'Receiving...';
+
+        while (true) {
+          const { value, done } = await reader.read();
+          if (done) break;
+          buffered += decoder.decode(value, { stream: true });
+          let boundary;
+          while ((boundary = buffered.indexOf('\\n\\n')) !== -1) {
+            const frame = buffered.slice(0, boundary);
+            buffered = buffered.slice(boundary + 2);
+            const eventName = (frame.match(/^event: (.*)$/m) || [])[1];
+            const data = (frame.match(/^data: (.*)$/m) || [])[1];
+            if (!data) continue;
+            const body = JSON.parse(data);
+            if (eventName === 'token') {
+              replyText.appendData(body.delta);
+              chatLog.scrollTop = chatLog.scrollHeight;
+            } else if (eventName === 'start' && body.conversation_id) {
+              conversationInput.value = body.conversation_id;
+              localStorage.setItem('orty.conversation_id', body.conversation_id);
+            }
+          }
         }
 
         statusEl.textContent = 'Reply received.';
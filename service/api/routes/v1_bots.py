@@ -1,17 +1,69 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+import asyncio
+import json
+from collections.abc import AsyncIterator
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
 
 from service.api.deps import (
-    bot_events_repo,
+    async_bot_events_repo,
     bot_registry,
     bot_runner,
+    db_executor,
     ensure_bot_owned_or_admin,
+    event_bus,
     get_request_auth,
 )
+from service.config import settings
 from service.models.schemas import BotCreateRequest, BotCreateResponse, BotEventResponse, BotStatusResponse
 
 router = APIRouter(prefix='/v1/bots', tags=['v1-bots'])
 
 
+def _utc_iso(value: datetime | None) -> str | None:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat()
+
+
+def _sse_event(event: dict) -> str:
+    return f"id: {event['seq']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def stream_bot_events(bot_id: str, last_event_id: int | None = None) -> AsyncIterator[str]:
+    # Subscribe before replaying so nothing committed in between is missed.
+    subscription = event_bus.subscribe(bot_id)
+    cursor = last_event_id
+    try:
+        if cursor is not None:
+            while True:
+                backlog = await async_bot_events_repo.list_events(bot_id, limit=1000, after=cursor)
+                for event in backlog:
+                    cursor = event["seq"]
+                    yield _sse_event(event)
+                if len(backlog) < 1000:
+                    break
+
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), timeout=settings.BOT_EVENT_STREAM_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event is None:
+                yield f"event: dropped\ndata: {json.dumps({'last_event_id': cursor})}\n\n"
+                return
+            if cursor is not None and event["seq"] <= cursor:
+                continue
+            cursor = event["seq"]
+            yield _sse_event(event)
+    finally:
+        event_bus.unsubscribe(subscription)
+
+
 @router.post('', response_model=BotCreateResponse)
 async def create_bot(request: BotCreateRequest, auth: dict = Depends(get_request_auth)):
     if auth["is_admin"]:
@@ -22,43 +74,73 @@ async def create_bot(request: BotCreateRequest, auth: dict = Depends(get_request
         owner_client_id = auth["client_id"]
         if request.owner_client_id and request.owner_client_id != owner_client_id:
             raise HTTPException(status_code=403, detail='Forbidden')
-    return bot_registry.create_bot(owner_client_id, request.bot_type, request.config)
+    return await db_executor.write(bot_registry.create_bot, owner_client_id, request.bot_type, request.config)
 
 
 @router.post('/{bot_id}/start', response_model=BotStatusResponse)
 async def start_bot(bot_id: str, auth: dict = Depends(get_request_auth)):
-    bot = bot_registry.get_bot(bot_id)
+    bot = await db_executor.read(bot_registry.get_bot, bot_id)
     ensure_bot_owned_or_admin(bot, auth["client_id"], auth["is_admin"])
     return await bot_runner.start_bot(bot_id)
 
 
 @router.post('/{bot_id}/stop', response_model=BotStatusResponse)
 async def stop_bot(bot_id: str, auth: dict = Depends(get_request_auth)):
-    bot = bot_registry.get_bot(bot_id)
+    bot = await db_executor.read(bot_registry.get_bot, bot_id)
     ensure_bot_owned_or_admin(bot, auth["client_id"], auth["is_admin"])
     return await bot_runner.stop_bot(bot_id, paused=False)
 
 
 @router.post('/{bot_id}/pause', response_model=BotStatusResponse)
 async def pause_bot(bot_id: str, auth: dict = Depends(get_request_auth)):
-    bot = bot_registry.get_bot(bot_id)
+    bot = await db_executor.read(bot_registry.get_bot, bot_id)
     ensure_bot_owned_or_admin(bot, auth["client_id"], auth["is_admin"])
     return await bot_runner.stop_bot(bot_id, paused=True)
 
 
 @router.get('/{bot_id}', response_model=BotStatusResponse)
 async def get_bot_status(bot_id: str, auth: dict = Depends(get_request_auth)):
-    bot = bot_registry.get_bot(bot_id)
+    bot = await db_executor.read(bot_registry.get_bot, bot_id)
     ensure_bot_owned_or_admin(bot, auth["client_id"], auth["is_admin"])
     return bot
 
 
+@router.get('/{bot_id}/events/stream')
+async def stream_bot_events_sse(
+    bot_id: str,
+    last_event_id: int | None = Query(default=None, ge=0),
+    last_event_id_header: int | None = Header(default=None, alias='Last-Event-ID', ge=0),
+    auth: dict = Depends(get_request_auth),
+):
+    bot = await db_executor.read(bot_registry.get_bot, bot_id)
+    ensure_bot_owned_or_admin(bot, auth["client_id"], auth["is_admin"])
+    resume_from = last_event_id_header if last_event_id_header is not None else last_event_id
+    return StreamingResponse(
+        stream_bot_events(bot_id, resume_from),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
 @router.get('/{bot_id}/events', response_model=list[BotEventResponse])
 async def get_bot_events(
     bot_id: str,
-    limit: int = Query(default=100, le=1000),
+    limit: int = Query(default=100, ge=1, le=1000),
+    after: int | None = Query(default=None, ge=0),
+    before: int | None = Query(default=None, ge=1),
+    event_type: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
     auth: dict = Depends(get_request_auth),
 ):
-    bot = bot_registry.get_bot(bot_id)
+    bot = await db_executor.read(bot_registry.get_bot, bot_id)
     ensure_bot_owned_or_admin(bot, auth["client_id"], auth["is_admin"])
-    return bot_events_repo.list_events(bot_id, limit=limit)
+    return await async_bot_events_repo.list_events(
+        bot_id,
+        limit=limit,
+        after=after,
+        before=before,
+        event_type=event_type,
+        since=_utc_iso(since),
+        until=_utc_iso(until),
+    )
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 
-from service.api.deps import clients_repo, ensure_primary_client, get_request_auth
+from service.api.deps import async_clients_repo as clients_repo
+from service.api.deps import get_request_auth, resolve_primary_client
 from service.models.schemas import (
     ClientCreateRequest,
     ClientCreateResponse,
@@ -14,13 +15,13 @@ router = APIRouter(prefix='/v1/clients', tags=['v1-clients'])
 
 @router.post('', response_model=ClientCreateResponse)
 async def create_client(request: ClientCreateRequest, _: str = Depends(verify_secret)):
-    return clients_repo.create_client(name=request.name, preferences=request.preferences)
+    return await clients_repo.create_client(name=request.name, preferences=request.preferences)
 
 
 @router.get('', response_model=list[ClientSummaryResponse])
 async def list_clients(_: str = Depends(verify_secret)):
-    ensure_primary_client()
-    return clients_repo.list_clients()
+    await resolve_primary_client()
+    return await clients_repo.list_clients()
 
 
 @router.get('/me', response_model=ClientSummaryResponse)
@@ -34,7 +35,7 @@ async def get_me(auth: dict = Depends(get_request_auth)):
 @router.patch('/me/preferences', response_model=ClientSummaryResponse)
 async def update_my_preferences(request: ClientPreferencesUpdateRequest, auth: dict = Depends(get_request_auth)):
     client_id = auth["client_id"]
-    updated = clients_repo.update_preferences(client_id, request.preferences)
+    updated = await clients_repo.update_preferences(client_id, request.preferences)
     if not updated:
         raise HTTPException(status_code=404, detail="Client not found")
     return updated
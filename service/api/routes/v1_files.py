@@ -0,0 +1,44 @@
+import asyncio
+from pathlib import Path
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+
+from service.config import settings
+from service.file_reader import resolve_fs_read_target
+from service.security import verify_secret
+
+router = APIRouter(prefix='/v1/files', tags=['v1-files'])
+
+SQLITE_SIDECAR_SUFFIXES = ("-wal", "-shm", "-journal")
+
+
+def resolve_download_target(raw_path: str) -> Path:
+    # Runs in a worker thread: resolve() and stat() may touch slow filesystems.
+    target, error = resolve_fs_read_target(raw_path)
+    if error is not None or target is None:
+        raise HTTPException(status_code=403, detail=error or "Access denied.")
+    root = Path(settings.FS_READ_ROOT).expanduser().resolve()
+    database_dir = Path(settings.SQLITE_PATH).expanduser().resolve().parent
+    # The database holds every client's conversations and token hashes; dotfiles hold
+    # secrets such as .env. Neither is ever served, whatever FS_READ_ROOT covers.
+    if (
+        any(part.startswith(".") for part in target.relative_to(root).parts)
+        or target.name.endswith(SQLITE_SIDECAR_SUFFIXES)
+        or target == database_dir
+        or database_dir in target.parents
+    ):
+        raise HTTPException(status_code=403, detail="Access denied.")
+    if not target.is_file():
+        raise HTTPException(status_code=404, detail="File not found")
+    return target
+
+
+@router.get('')
+async def download_file(
+    path: str = Query(min_length=1, max_length=2000),
+    _: str = Depends(verify_secret),
+):
+    target = await asyncio.to_thread(resolve_download_target, path)
+    # Streamed from disk in chunks (with Range support), never read into memory whole.
+    return FileResponse(target, filename=target.name)
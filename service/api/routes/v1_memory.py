@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Depends, Query
+
+from service.api.deps import async_memory_store as memory_store
+from service.api.deps import get_request_auth
+from service.models.schemas import MemorySearchResult
+
+router = APIRouter(prefix='/v1/memory', tags=['v1-memory'])
+
+
+@router.get('/search', response_model=list[MemorySearchResult])
+async def search_memory(
+    q: str = Query(min_length=1, max_length=500),
+    limit: int = Query(default=20, ge=1, le=100),
+    auth: dict = Depends(get_request_auth),
+):
+    return await memory_store.search(auth["client_id"], q, limit=limit)
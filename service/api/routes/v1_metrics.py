@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends
+
+from service.api.deps import ai_service, clients_repo, memory_store, response_cache
+from service.security import verify_secret
+
+router = APIRouter(prefix='/v1/metrics', tags=['v1-metrics'])
+
+
+@router.get('')
+async def get_metrics(_: str = Depends(verify_secret)):
+    return {
+        "history_cache": memory_store.history_cache.stats(),
+        "client_auth_cache": clients_repo.auth_cache.stats(),
+        "response_cache": response_cache.stats() if response_cache is not None else None,
+        "llm_providers": ai_service.health.stats(),
+        "single_flight": ai_service.single_flight_stats(),
+        "llm_admission": ai_service.admission.stats(),
+        "tools": ai_service.tool_stats(),
+        "github": {
+            "cache": ai_service.github_cache.stats() if ai_service.github_cache is not None else None,
+            "rate_limit": ai_service.github_rate_limit.stats(),
+            "snapshots": ai_service.github_snapshots.stats() if ai_service.github_snapshots is not None else None,
+        },
+    }
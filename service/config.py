@@ -1,3 +1,4 @@
+import json
 import os
 from pathlib import Path
 
@@ -11,25 +12,130 @@ ROOT_ENV_FILE = Path(os.getenv("ORTY_ENV_FILE", str(DEFAULT_ROOT_ENV_FILE))).exp
 load_dotenv(dotenv_path=ROOT_ENV_FILE, override=False)
 
 
+def parse_token_budgets(name: str, raw: str) -> dict[str, int]:
+    # Parsed once at startup so a malformed value stops the service instead of failing requests.
+    try:
+        budgets = json.loads(raw or "{}")
+    except ValueError as exc:
+        raise ValueError(f"{name} is not valid JSON: {exc}") from exc
+    if not isinstance(budgets, dict) or not all(
+        isinstance(value, int) and not isinstance(value, bool) and value > 0 for value in budgets.values()
+    ):
+        raise ValueError(f"{name} must be a JSON object mapping provider or provider:model to a positive integer")
+    return budgets
+
+
 class Settings:
     def __init__(self) -> None:
         self.ORTY_SHARED_SECRET: str = os.getenv("ORTY_SHARED_SECRET", "dev-secret")
+        self.CLIENT_AUTH_CACHE_TTL_SECONDS: float = float(os.getenv("CLIENT_AUTH_CACHE_TTL_SECONDS", "30"))
+        self.CLIENT_LAST_SEEN_FLUSH_SECONDS: float = float(os.getenv("CLIENT_LAST_SEEN_FLUSH_SECONDS", "5"))
 
         self.LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "ollama").lower()
+        self.LLM_FALLBACK_PROVIDERS: str = os.getenv("LLM_FALLBACK_PROVIDERS", "")
+        self.LLM_CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "3"))
+        self.LLM_CIRCUIT_RESET_SECONDS: float = float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "30"))
+        self.LLM_HEDGE_PERCENTILE: float = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+        self.LLM_HEDGE_DELAY_SECONDS: float = float(os.getenv("LLM_HEDGE_DELAY_SECONDS", "10"))
+        self.LLM_HEDGE_MIN_SAMPLES: int = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+        self.LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+        self.LLM_CONCURRENCY_LIMITS_JSON: str = os.getenv("LLM_CONCURRENCY_LIMITS_JSON", '{"ollama": 2}')
+        self.LLM_MAX_QUEUE_DEPTH: int = int(os.getenv("LLM_MAX_QUEUE_DEPTH", "32"))
+        self.LLM_SINGLE_FLIGHT_ENABLED: bool = os.getenv("LLM_SINGLE_FLIGHT_ENABLED", "true").lower() in {"1", "true", "yes"}
 
         self.OPENAI_API_KEY: str | None = os.getenv("OPENAI_API_KEY")
         self.OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 
         self.OLLAMA_BASE_URL: str = os.getenv("OLLAMA_BASE_URL", "http://127.0.0.1:11434")
         self.OLLAMA_MODEL: str = os.getenv("OLLAMA_MODEL", "qwen3:4b")
+        self.OLLAMA_EMBED_MODEL: str = os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+
+        self.HTTP_CONNECT_TIMEOUT_SECONDS: float = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+        self.HTTP_READ_TIMEOUT_SECONDS: float = float(os.getenv("HTTP_READ_TIMEOUT_SECONDS", "30"))
+        self.OPENAI_READ_TIMEOUT_SECONDS: float = float(os.getenv("OPENAI_READ_TIMEOUT_SECONDS", "30"))
+        self.OLLAMA_READ_TIMEOUT_SECONDS: float = float(os.getenv("OLLAMA_READ_TIMEOUT_SECONDS", "180"))
+        self.GITHUB_READ_TIMEOUT_SECONDS: float = float(os.getenv("GITHUB_READ_TIMEOUT_SECONDS", "15"))
+        self.GITHUB_TOKEN: str | None = os.getenv("GITHUB_TOKEN")
+        self.GITHUB_API_BASE_URL: str = os.getenv("GITHUB_API_BASE_URL", "https://api.github.com").rstrip("/")
+        self.GITHUB_CACHE_ENABLED: bool = os.getenv("GITHUB_CACHE_ENABLED", "true").lower() in {"1", "true", "yes"}
+        self.GITHUB_CACHE_FRESH_SECONDS: float = float(os.getenv("GITHUB_CACHE_FRESH_SECONDS", "60"))
+        self.GITHUB_CACHE_MAX_ENTRIES: int = int(os.getenv("GITHUB_CACHE_MAX_ENTRIES", "2000"))
+        self.GITHUB_SNAPSHOT_ENABLED: bool = os.getenv("GITHUB_SNAPSHOT_ENABLED", "false").lower() in {"1", "true", "yes"}
+        self.GITHUB_SNAPSHOT_DIR: str = os.getenv("GITHUB_SNAPSHOT_DIR", "")
+        self.GITHUB_SNAPSHOT_MAX_BYTES: int = int(os.getenv("GITHUB_SNAPSHOT_MAX_BYTES", str(512 * 1024 * 1024)))
+        self.GITHUB_SNAPSHOT_MAX_TARBALL_BYTES: int = int(
+            os.getenv("GITHUB_SNAPSHOT_MAX_TARBALL_BYTES", str(100 * 1024 * 1024))
+        )
+        self.GITHUB_SNAPSHOT_MAX_UNPACKED_BYTES: int = int(
+            os.getenv("GITHUB_SNAPSHOT_MAX_UNPACKED_BYTES", str(400 * 1024 * 1024))
+        )
+        self.GITHUB_SNAPSHOT_MAX_MEMBERS: int = int(os.getenv("GITHUB_SNAPSHOT_MAX_MEMBERS", "100000"))
+        self.GITHUB_SNAPSHOT_FAILURE_TTL_SECONDS: float = float(os.getenv("GITHUB_SNAPSHOT_FAILURE_TTL_SECONDS", "300"))
+        self.GITHUB_SNAPSHOT_REF_TTL_SECONDS: float = float(os.getenv("GITHUB_SNAPSHOT_REF_TTL_SECONDS", "30"))
+        self.HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+        self.HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+        self.HTTP_KEEPALIVE_EXPIRY_SECONDS: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30"))
+        self.HTTP2_ENABLED: bool = os.getenv("HTTP2_ENABLED", "true").lower() in {"1", "true", "yes"}
 
         self.SQLITE_PATH: str = os.getenv("SQLITE_PATH", "data/orty.db")
         self.SQLITE_TIMEOUT_SECONDS: float = float(os.getenv("SQLITE_TIMEOUT_SECONDS", "5"))
+        self.SQLITE_POOL_SIZE: int = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+        self.SQLITE_STATEMENT_CACHE_SIZE: int = int(os.getenv("SQLITE_STATEMENT_CACHE_SIZE", "256"))
+        self.SQLITE_MMAP_SIZE_BYTES: int = int(os.getenv("SQLITE_MMAP_SIZE_BYTES", str(64 * 1024 * 1024)))
+        self.SQLITE_CACHE_SIZE_KIB: int = int(os.getenv("SQLITE_CACHE_SIZE_KIB", "16384"))
+        self.SQLITE_READER_THREADS: int = int(os.getenv("SQLITE_READER_THREADS", "4"))
+
+        self.HISTORY_TOKEN_BUDGET: int = int(os.getenv("HISTORY_TOKEN_BUDGET", "4096"))
+        self.HISTORY_TOKEN_BUDGETS_JSON: str = os.getenv("HISTORY_TOKEN_BUDGETS_JSON", "")
+        self.HISTORY_TOKEN_BUDGETS: dict[str, int] = parse_token_budgets(
+            "HISTORY_TOKEN_BUDGETS_JSON", self.HISTORY_TOKEN_BUDGETS_JSON
+        )
+        self.HISTORY_MAX_MESSAGE_TOKENS: int = int(os.getenv("HISTORY_MAX_MESSAGE_TOKENS", "0"))
+        self.HISTORY_CACHE_MAX_BYTES: int = int(os.getenv("HISTORY_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+        self.HISTORY_CACHE_WINDOW_MESSAGES: int = int(os.getenv("HISTORY_CACHE_WINDOW_MESSAGES", "50"))
+
+        self.MEMORY_EMBEDDER: str = os.getenv("MEMORY_EMBEDDER", "hashing").lower()
+        self.MEMORY_EMBEDDING_DIMENSIONS: int = int(os.getenv("MEMORY_EMBEDDING_DIMENSIONS", "256"))
+        self.MEMORY_VECTOR_DIR: str = os.getenv("MEMORY_VECTOR_DIR", "")
+        self.MEMORY_RECALL_MIN_SCORE: float = float(os.getenv("MEMORY_RECALL_MIN_SCORE", "0.2"))
+
+        self.SUMMARY_ENABLED: bool = os.getenv("SUMMARY_ENABLED", "false").lower() in {"1", "true", "yes"}
+        self.SUMMARY_TRIGGER_MESSAGES: int = int(os.getenv("SUMMARY_TRIGGER_MESSAGES", "24"))
+        self.SUMMARY_KEEP_RECENT_MESSAGES: int = int(os.getenv("SUMMARY_KEEP_RECENT_MESSAGES", "8"))
+        self.SUMMARY_MAX_INPUT_CHARS: int = int(os.getenv("SUMMARY_MAX_INPUT_CHARS", "12000"))
+
+        self.RESPONSE_CACHE_ENABLED: bool = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() in {"1", "true", "yes"}
+        self.RESPONSE_CACHE_TTL_SECONDS: float = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+        self.RESPONSE_CACHE_MEMORY_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MEMORY_ENTRIES", "256"))
+        self.RESPONSE_CACHE_MAX_ROWS: int = int(os.getenv("RESPONSE_CACHE_MAX_ROWS", "10000"))
+        self.RESPONSE_CACHE_MAX_BYTES: int = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+        self.RETENTION_MESSAGES_MAX_AGE_DAYS: float = float(os.getenv("RETENTION_MESSAGES_MAX_AGE_DAYS", "0"))
+        self.RETENTION_MESSAGES_MAX_ROWS_PER_CLIENT: int = int(os.getenv("RETENTION_MESSAGES_MAX_ROWS_PER_CLIENT", "0"))
+        self.RETENTION_BOT_EVENTS_MAX_AGE_DAYS: float = float(os.getenv("RETENTION_BOT_EVENTS_MAX_AGE_DAYS", "0"))
+        self.RETENTION_BOT_EVENTS_MAX_ROWS_PER_BOT: int = int(os.getenv("RETENTION_BOT_EVENTS_MAX_ROWS_PER_BOT", "0"))
+        self.RETENTION_OVERRIDES_JSON: str = os.getenv("RETENTION_OVERRIDES_JSON", "")
+        self.RETENTION_INTERVAL_SECONDS: float = float(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+        self.RETENTION_BATCH_SIZE: int = int(os.getenv("RETENTION_BATCH_SIZE", "500"))
+        self.RETENTION_BATCH_PAUSE_MS: int = int(os.getenv("RETENTION_BATCH_PAUSE_MS", "10"))
+        self.RETENTION_ARCHIVE_DIR: str = os.getenv("RETENTION_ARCHIVE_DIR", "")
+        self.RETENTION_VACUUM_PAGES: int = int(os.getenv("RETENTION_VACUUM_PAGES", "2000"))
 
         self.FS_READ_ROOT: str = os.getenv("FS_READ_ROOT", ".")
+        self.FS_READ_MAX_BYTES: int = int(os.getenv("FS_READ_MAX_BYTES", str(64 * 1024)))
+        self.FS_READ_MMAP_MIN_BYTES: int = int(os.getenv("FS_READ_MMAP_MIN_BYTES", str(1024 * 1024)))
+
+        self.TOOL_TIMEOUT_SECONDS: float = float(os.getenv("TOOL_TIMEOUT_SECONDS", "30"))
+        self.TOOL_TIMEOUTS_JSON: str = os.getenv("TOOL_TIMEOUTS_JSON", "")
+        self.TOOL_MAX_THREADS: int = int(os.getenv("TOOL_MAX_THREADS", "4"))
 
         self.BOT_HEARTBEAT_DEFAULT_SECONDS: int = int(os.getenv("BOT_HEARTBEAT_DEFAULT_SECONDS", "10"))
         self.BOT_RUNNER_MAX_BOTS: int = int(os.getenv("BOT_RUNNER_MAX_BOTS", "25"))
+        self.BOT_EVENT_BUFFER_MAX_PENDING: int = int(os.getenv("BOT_EVENT_BUFFER_MAX_PENDING", "10000"))
+        self.BOT_EVENT_FLUSH_BATCH_SIZE: int = int(os.getenv("BOT_EVENT_FLUSH_BATCH_SIZE", "256"))
+        self.BOT_EVENT_FLUSH_INTERVAL_MS: int = int(os.getenv("BOT_EVENT_FLUSH_INTERVAL_MS", "200"))
+        self.BOT_EVENT_STREAM_BUFFER: int = int(os.getenv("BOT_EVENT_STREAM_BUFFER", "256"))
+        self.BOT_EVENT_STREAM_KEEPALIVE_SECONDS: float = float(os.getenv("BOT_EVENT_STREAM_KEEPALIVE_SECONDS", "15"))
 
 
 settings = Settings()
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import hashlib
+import re
+
+import httpx
+import numpy as np
+
+from service.config import settings
+
+EMBED_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class Embedder:
+    name = "base"
+    dimensions = 0
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    def ensure_dimensions(self) -> int:
+        return self.dimensions
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+class HashingEmbedder(Embedder):
+    # Feature hashing over words and word bigrams: deterministic, offline, no model download.
+    name = "hashing"
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+
+    def _features(self, text: str) -> list[str]:
+        words = [word.lower() for word in EMBED_TOKEN_PATTERN.findall(text)]
+        return words + [f"{left} {right}" for left, right in zip(words, words[1:])]
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+                sign = 1.0 if digest & 1 else -1.0
+                matrix[row, (digest >> 1) % self.dimensions] += sign
+        return _normalize(matrix)
+
+
+class OllamaEmbedder(Embedder):
+    name = "ollama"
+
+    def __init__(self, model: str, base_url: str, timeout: float = 60):
+        self.model = model
+        self.base_url = base_url
+        self.timeout = timeout
+        self.name = f"ollama-{re.sub(r'[^A-Za-z0-9_.-]', '_', model)}"
+        # Unknown until the model answers once; see ensure_dimensions().
+        self.dimensions = 0
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        response = httpx.post(
+            f"{self.base_url}/api/embed",
+            json={"model": self.model, "input": texts},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        matrix = np.asarray(response.json()["embeddings"], dtype=np.float32)
+        if matrix.ndim != 2 or len(matrix) != len(texts):
+            raise ValueError("Ollama returned an unexpected embeddings payload.")
+        if self.dimensions and matrix.shape[1] != self.dimensions:
+            raise ValueError(f"Expected {self.dimensions}-dimensional embeddings, got {matrix.shape[1]}.")
+        self.dimensions = matrix.shape[1]
+        return _normalize(matrix)
+
+    def ensure_dimensions(self) -> int:
+        if not self.dimensions:
+            self.embed(["dimension probe"])
+        return self.dimensions
+
+
+def embedder_from_settings() -> Embedder:
+    if settings.MEMORY_EMBEDDER == "ollama":
+        return OllamaEmbedder(settings.OLLAMA_EMBED_MODEL, settings.OLLAMA_BASE_URL)
+    return HashingEmbedder(settings.MEMORY_EMBEDDING_DIMENSIONS)
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import mmap
+import os
+import re
+import stat
+from pathlib import Path
+
+from service.config import settings
+
+# `start:end` selects 1-based lines (inclusive), `bytes=start:end` a 0-based byte slice.
+RANGE_PATTERN = re.compile(r"^(?P<unit>bytes=)?(?P<start>\d*):(?P<end>\d*)$")
+BINARY_SNIFF_BYTES = 8192
+
+
+def resolve_fs_read_target(raw_path: str) -> tuple[Path | None, str | None]:
+    fs_read_root = Path(settings.FS_READ_ROOT).expanduser().resolve()
+
+    expanded_input = Path(raw_path).expanduser()
+    if expanded_input.is_absolute():
+        candidate = expanded_input.resolve()
+    else:
+        candidate = (fs_read_root / expanded_input).resolve()
+
+    try:
+        candidate.relative_to(fs_read_root)
+    except ValueError:
+        return None, (
+            f"Access denied: path must stay within FS_READ_ROOT ({fs_read_root})."
+        )
+
+    return candidate, None
+
+
+def split_range(tool_input: str) -> tuple[str, str | None]:
+    parts = tool_input.rsplit(maxsplit=1)
+    if len(parts) == 2 and RANGE_PATTERN.match(parts[1]):
+        return parts[0], parts[1]
+    return tool_input, None
+
+
+def _skip_lines(view, position: int, count: int) -> int:
+    for _ in range(count):
+        newline = view.find(b"\n", position)
+        if newline < 0:
+            return len(view)
+        position = newline + 1
+    return position
+
+
+def _decode(data: bytes, cut_start: bool, cut_end: bool) -> str:
+    # Slices cut mid-file may split a multi-byte character at either edge.
+    if cut_start:
+        skip = 0
+        while skip < min(3, len(data)) and 0x80 <= data[skip] <= 0xBF:
+            skip += 1
+        data = data[skip:]
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError as exc:
+        if cut_end and exc.start >= len(data) - 3 and exc.reason == "unexpected end of data":
+            return data[: exc.start].decode("utf-8")
+        raise
+
+
+def _span(view, range_spec: str | None) -> tuple[int, int] | str:
+    size = len(view)
+    if range_spec is None:
+        return 0, size
+    match = RANGE_PATTERN.match(range_spec)
+    first = int(match["start"]) if match["start"] else None
+    last = int(match["end"]) if match["end"] else None
+    if first is not None and last is not None and last < first:
+        return f"Invalid range: {range_spec} (end before start)."
+    if match["unit"]:
+        return min(first or 0, size), min(size if last is None else last, size)
+    first = max(1, first or 1)
+    start = _skip_lines(view, 0, first - 1)
+    end = size if last is None else _skip_lines(view, start, last - first + 1)
+    return start, end
+
+
+def read_text(target: Path, range_spec: str | None, *, max_bytes: int, mmap_min_bytes: int) -> str:
+    # Raises OSError and UnicodeDecodeError like Path.read_text. The non-blocking open
+    # and fstat check refuse a path swapped for a FIFO or device after the caller's check.
+    fd = os.open(target, os.O_RDONLY | getattr(os, "O_NONBLOCK", 0))
+    if not stat.S_ISREG(os.fstat(fd).st_mode):
+        os.close(fd)
+        return f"Path is not a regular file: {target}"
+    with os.fdopen(fd, "rb") as handle:
+        size = handle.seek(0, 2)
+        handle.seek(0)
+        # Large files are memory-mapped so range scans and excerpts only page in what they touch.
+        if size and size >= mmap_min_bytes:
+            view = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            view = handle.read()
+        try:
+            if b"\0" in view[:BINARY_SNIFF_BYTES]:
+                return f"File appears to be binary ({size} bytes): {target}"
+            span = _span(view, range_spec)
+            if isinstance(span, str):
+                return span
+            start, end = span
+            if start >= end:
+                return f"(empty range {range_spec}) {target}" if range_spec else ""
+            if end - start <= max_bytes:
+                return _decode(view[start:end], start > 0, end < size)
+
+            half = max(1, max_bytes // 2)
+            head = view[start : start + half]
+            tail = view[end - half : end]
+            # Prefer whole lines at the cut points when there are any.
+            if b"\n" in head:
+                head = head[: head.rfind(b"\n") + 1]
+            if b"\n" in tail[:-1]:
+                tail = tail[tail.find(b"\n") + 1 :]
+            omitted = (end - start) - len(head) - len(tail)
+            return (
+                _decode(head, start > 0, True)
+                + f"\n[... {omitted} bytes omitted; read a line range with `/tool fs_read <path> start:end`"
+                + " or download the whole file from GET /v1/files ...]\n"
+                + _decode(tail, True, end < size)
+            )
+        finally:
+            if isinstance(view, mmap.mmap):
+                view.close()
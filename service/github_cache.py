@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from service.config import settings
+from service.storage.db import SQLiteDB
+from service.storage.executor import DBExecutor
+
+
+class GitHubRateLimit:
+    # Last X-RateLimit-* values seen from the API; shared by every GitHub call.
+    def __init__(self):
+        self.limit: int | None = None
+        self.remaining: int | None = None
+        self.reset_at = 0.0
+
+    def update(self, headers) -> None:
+        remaining = headers.get("x-ratelimit-remaining")
+        reset = headers.get("x-ratelimit-reset")
+        if remaining is None or reset is None:
+            return
+        try:
+            self.remaining = int(remaining)
+            self.reset_at = float(reset)
+            self.limit = int(headers.get("x-ratelimit-limit", self.limit or 0)) or None
+        except ValueError:
+            return
+
+    def exhausted(self) -> bool:
+        if self.remaining is None or self.remaining > 0:
+            return False
+        if time.time() >= self.reset_at:
+            self.remaining = None
+            return False
+        return True
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "remaining": self.remaining, "reset_at": self.reset_at or None}
+
+
+class GitHubCache:
+    # Persistent conditional-request cache for GitHub API GETs. Entries validated
+    # within `fresh_seconds` are served without a request; older ones are revalidated
+    # with If-None-Match/If-Modified-Since, and 304 answers do not count against quota.
+    def __init__(
+        self,
+        db: SQLiteDB,
+        *,
+        executor: DBExecutor | None = None,
+        fresh_seconds: float = 60,
+        max_entries: int = 2000,
+    ):
+        self.db = db
+        self.executor = executor
+        self.fresh_seconds = fresh_seconds
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self.fresh_hits = 0
+        self.revalidated = 0
+        self.stale_served = 0
+        self.misses = 0
+
+    @classmethod
+    def from_settings(cls, db: SQLiteDB, executor: DBExecutor | None = None) -> "GitHubCache":
+        return cls(
+            db,
+            executor=executor,
+            fresh_seconds=settings.GITHUB_CACHE_FRESH_SECONDS,
+            max_entries=settings.GITHUB_CACHE_MAX_ENTRIES,
+        )
+
+    def count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def is_fresh(self, entry: dict) -> bool:
+        return time.time() - entry["validated_at"] < self.fresh_seconds
+
+    def get(self, url: str) -> dict | None:
+        with self.db.connect() as conn:
+            row = conn.execute(
+                "SELECT url, etag, last_modified, body, validated_at FROM github_cache WHERE url = ?",
+                (url,),
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    def put(self, url: str, body: str, etag: str | None, last_modified: str | None) -> None:
+        with self.db.connect() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO github_cache (url, etag, last_modified, body, validated_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (url, etag, last_modified, body, time.time()),
+            )
+            (rows,) = conn.execute("SELECT COUNT(*) FROM github_cache").fetchone()
+            if rows > self.max_entries:
+                conn.execute(
+                    """
+                    DELETE FROM github_cache WHERE url IN (
+                        SELECT url FROM github_cache ORDER BY validated_at LIMIT ?
+                    )
+                    """,
+                    (rows - self.max_entries,),
+                )
+
+    def touch(self, url: str) -> None:
+        with self.db.connect() as conn:
+            conn.execute("UPDATE github_cache SET validated_at = ? WHERE url = ?", (time.time(), url))
+
+    async def _run(self, write: bool, fn, *args):
+        if self.executor is None:
+            return fn(*args)
+        return await (self.executor.write if write else self.executor.read)(fn, *args)
+
+    async def aget(self, url: str) -> dict | None:
+        return await self._run(False, self.get, url)
+
+    async def aput(self, url: str, body: str, etag: str | None, last_modified: str | None) -> None:
+        await self._run(True, self.put, url, body, etag, last_modified)
+
+    async def atouch(self, url: str) -> None:
+        await self._run(True, self.touch, url)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "fresh_hits": self.fresh_hits,
+                "revalidated": self.revalidated,
+                "stale_served": self.stale_served,
+                "misses": self.misses,
+            }
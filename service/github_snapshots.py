@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+from pathlib import Path, PurePosixPath
+
+import httpx
+
+from service.config import settings
+
+
+class SnapshotUnavailable(Exception):
+    pass
+
+
+class SnapshotTooLarge(SnapshotUnavailable):
+    pass
+
+
+class RepoSnapshotCache:
+    # Unpacked repository tarballs keyed by commit SHA (`<dir>/<sha>/`), each with a
+    # `<sha>.json` sidecar whose mtime records the last access. Snapshots are evicted
+    # least recently used first once their total size exceeds `max_bytes`.
+    def __init__(
+        self,
+        directory: str | Path,
+        *,
+        max_bytes: int,
+        max_tarball_bytes: int,
+        max_unpacked_bytes: int = 400 * 1024 * 1024,
+        max_members: int = 100_000,
+        failure_ttl_seconds: float = 300.0,
+        ref_ttl_seconds: float = 30.0,
+    ):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_tarball_bytes = max_tarball_bytes
+        self.max_unpacked_bytes = max_unpacked_bytes
+        self.max_members = max_members
+        self.failure_ttl_seconds = failure_ttl_seconds
+        self.ref_ttl_seconds = ref_ttl_seconds
+        # (repo, sha) -> (expires_at, reason) for tarballs that were too large or failed,
+        # and (repo, ref) -> (expires_at, sha) for recently resolved refs.
+        self._failures: dict[tuple[str, str], tuple[float, str]] = {}
+        self._refs: dict[tuple[str, str], tuple[float, str]] = {}
+        self._pending: dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.downloads = 0
+        self.evictions = 0
+        self.negative_hits = 0
+
+    @classmethod
+    def from_settings(cls) -> "RepoSnapshotCache":
+        directory = settings.GITHUB_SNAPSHOT_DIR or Path(settings.SQLITE_PATH).parent / "github-snapshots"
+        return cls(
+            directory,
+            max_bytes=settings.GITHUB_SNAPSHOT_MAX_BYTES,
+            max_tarball_bytes=settings.GITHUB_SNAPSHOT_MAX_TARBALL_BYTES,
+            max_unpacked_bytes=settings.GITHUB_SNAPSHOT_MAX_UNPACKED_BYTES,
+            max_members=settings.GITHUB_SNAPSHOT_MAX_MEMBERS,
+            failure_ttl_seconds=settings.GITHUB_SNAPSHOT_FAILURE_TTL_SECONDS,
+            ref_ttl_seconds=settings.GITHUB_SNAPSHOT_REF_TTL_SECONDS,
+        )
+
+    def _root(self, sha: str) -> Path:
+        return self.directory / sha
+
+    def _meta(self, sha: str) -> Path:
+        return self.directory / f"{sha}.json"
+
+    def cached(self, sha: str) -> Path | None:
+        root, meta = self._root(sha), self._meta(sha)
+        if not meta.exists() or not root.is_dir():
+            return None
+        os.utime(meta)
+        with self._lock:
+            self.hits += 1
+        return root
+
+    @staticmethod
+    def _remember(entries: dict, key: tuple[str, str], ttl: float, value: str) -> None:
+        now = time.monotonic()
+        if len(entries) >= 1024:
+            for stale in [item for item, (expires_at, _) in entries.items() if expires_at <= now]:
+                del entries[stale]
+            if len(entries) >= 1024:
+                entries.pop(next(iter(entries)))
+        entries[key] = (now + ttl, value)
+
+    @staticmethod
+    def _recall(entries: dict, key: tuple[str, str]) -> str | None:
+        entry = entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            entries.pop(key, None)
+            return None
+        return entry[1]
+
+    def resolved_ref(self, repo: str, ref: str) -> str | None:
+        with self._lock:
+            return self._recall(self._refs, (repo, ref))
+
+    def remember_ref(self, repo: str, ref: str, sha: str) -> None:
+        if self.ref_ttl_seconds > 0:
+            with self._lock:
+                self._remember(self._refs, (repo, ref), self.ref_ttl_seconds, sha)
+
+    async def snapshot(self, client: httpx.AsyncClient, url: str, headers: dict[str, str], repo: str, sha: str) -> Path:
+        root = self.cached(sha)
+        if root is not None:
+            return root
+        with self._lock:
+            reason = self._recall(self._failures, (repo, sha))
+            if reason is not None:
+                self.negative_hits += 1
+        if reason is not None:
+            raise SnapshotUnavailable(reason)
+        # Concurrent requests for the same commit share one download.
+        pending = self._pending.get(sha)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        future = self._pending[sha] = asyncio.get_running_loop().create_future()
+        try:
+            root = await self._download(client, url, headers, repo, sha)
+            future.set_result(root)
+            return root
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            # Oversized or broken tarballs are not retried on every tool call.
+            if self.failure_ttl_seconds > 0 and isinstance(exc, (SnapshotUnavailable, httpx.HTTPError, tarfile.TarError, OSError)):
+                with self._lock:
+                    self._remember(self._failures, (repo, sha), self.failure_ttl_seconds, str(exc) or type(exc).__name__)
+            future.set_exception(exc)
+            # Nobody else may be waiting; mark the exception as retrieved.
+            future.exception()
+            raise
+        finally:
+            del self._pending[sha]
+
+    async def _download(self, client: httpx.AsyncClient, url: str, headers: dict[str, str], repo: str, sha: str) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tarball = tempfile.mkstemp(dir=self.directory, suffix=".tar.gz.part")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                async with client.stream("GET", url, headers=headers, follow_redirects=True) as response:
+                    if response.status_code != 200:
+                        body = (await response.aread()).decode(errors="replace")
+                        raise httpx.HTTPStatusError(
+                            f"GitHub tarball error ({response.status_code}): {body}",
+                            request=response.request,
+                            response=response,
+                        )
+                    received = 0
+                    async for chunk in response.aiter_bytes():
+                        received += len(chunk)
+                        if received > self.max_tarball_bytes:
+                            raise SnapshotTooLarge(f"Repository tarball exceeds {self.max_tarball_bytes} bytes.")
+                        handle.write(chunk)
+            root = await asyncio.to_thread(self._unpack, tarball, repo, sha)
+        finally:
+            Path(tarball).unlink(missing_ok=True)
+        with self._lock:
+            self.downloads += 1
+        await asyncio.to_thread(self.evict, sha)
+        return root
+
+    def _unpack(self, tarball: str, repo: str, sha: str) -> Path:
+        staging = Path(tempfile.mkdtemp(dir=self.directory, prefix=".unpack-"))
+        size = 0
+        try:
+            with tarfile.open(tarball, "r:*") as archive:
+                # A small tarball can still expand enormously; the partial tree is
+                # removed below once either cap is crossed.
+                for count, member in enumerate(archive, start=1):
+                    if count > self.max_members:
+                        raise SnapshotTooLarge(f"Repository tarball has more than {self.max_members} entries.")
+                    # GitHub wraps everything in one `<owner>-<repo>-<sha>/` directory.
+                    parts = PurePosixPath(member.name).parts[1:]
+                    if not parts or ".." in parts or PurePosixPath(member.name).is_absolute():
+                        continue
+                    target = staging.joinpath(*parts)
+                    if member.isdir():
+                        target.mkdir(parents=True, exist_ok=True)
+                    elif member.isfile():
+                        if size + member.size > self.max_unpacked_bytes:
+                            raise SnapshotTooLarge(f"Repository unpacks to more than {self.max_unpacked_bytes} bytes.")
+                        target.parent.mkdir(parents=True, exist_ok=True)
+                        with archive.extractfile(member) as source, open(target, "wb") as dest:
+                            shutil.copyfileobj(source, dest)
+                        size += member.size
+                    # Links and special files are skipped so nothing can point outside the snapshot.
+            root = self._root(sha)
+            try:
+                staging.rename(root)
+            except OSError:
+                if not root.is_dir():
+                    raise
+                # Another process unpacked the same commit first.
+                shutil.rmtree(staging, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        self._meta(sha).write_text(json.dumps({"repo": repo, "sha": sha, "bytes": size}), encoding="utf-8")
+        return root
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        entries = []
+        for meta in self.directory.glob("*.json"):
+            try:
+                size = json.loads(meta.read_text(encoding="utf-8"))["bytes"]
+                entries.append((meta.stat().st_mtime, size, meta.stem))
+            except (OSError, ValueError, KeyError):
+                continue
+        return entries
+
+    def evict(self, keep: str | None = None) -> None:
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, sha in entries:
+            if total <= self.max_bytes:
+                break
+            if sha == keep:
+                continue
+            self._meta(sha).unlink(missing_ok=True)
+            shutil.rmtree(self._root(sha), ignore_errors=True)
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        entries = self._entries() if self.directory.exists() else []
+        with self._lock:
+            return {
+                "snapshots": len(entries),
+                "bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "downloads": self.downloads,
+                "evictions": self.evictions,
+                "negative_hits": self.negative_hits,
+            }
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+
+import httpx
+
+from service.config import settings
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class UpstreamClients:
+    # One long-lived httpx.AsyncClient per upstream so keep-alive connections (and
+    # TLS sessions) are reused across requests. httpx clients are bound to the event
+    # loop they first ran on, so a different running loop gets a fresh set.
+    def __init__(self, read_timeouts: dict[str, float] | None = None):
+        self.read_timeouts = read_timeouts or {}
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _build(self, name: str) -> httpx.AsyncClient:
+        read_timeout = self.read_timeouts.get(name, settings.HTTP_READ_TIMEOUT_SECONDS)
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+            http2=settings.HTTP2_ENABLED and HTTP2_AVAILABLE,
+        )
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Clients from a previous loop cannot be closed from here; drop them.
+            self._clients = {}
+            self._loop = loop
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = self._build(name)
+        return client
+
+    def open(self, *names: str) -> None:
+        for name in names:
+            self.get(name)
+
+    async def aclose(self) -> None:
+        clients, self._clients = self._clients, {}
+        loop, self._loop = self._loop, None
+        if loop is not asyncio.get_running_loop():
+            return
+        await asyncio.gather(*(client.aclose() for client in clients.values()), return_exceptions=True)
@@ -1,12 +1,72 @@
+import re
+from pathlib import Path
 from typing import List
 from uuid import uuid4
 
-from service.storage.db import SQLiteDB
+import numpy as np
+
+from service.config import settings
+from service.embeddings import Embedder, embedder_from_settings
+from service.storage.db import SQLiteDB, utc_now_iso
+from service.storage.history_cache import HistoryWindowCache
+from service.storage.vector_index import VectorIndex
+
+
+SEARCH_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def build_fts_query(text: str) -> str:
+    # Quote every term so user input can never be parsed as FTS5 query syntax.
+    return " ".join(f'"{token}"' for token in SEARCH_TOKEN_PATTERN.findall(text))
+
+
+def fts_client_scope(client_id: str | None) -> str:
+    # Mirrors the client_scope expression in the messages_fts_source view.
+    return "c" + (client_id or "").replace("-", "")
+
+
+CHARS_PER_TOKEN = 4
+TRUNCATION_MARKER = "\n...[truncated {omitted} tokens]"
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN)
+
+
+def resolve_history_token_budget(provider: str, model: str | None, requested: int | None = None) -> int:
+    budgets = settings.HISTORY_TOKEN_BUDGETS
+    configured = budgets.get(f"{provider}:{model}", budgets.get(provider, settings.HISTORY_TOKEN_BUDGET))
+    return min(requested, configured) if requested else configured
+
+
+RECALL_INDEX_BATCH_SIZE = 256
+# Messages embedded inside a recall request; a longer backlog is backfilled in the background.
+RECALL_INLINE_INDEX_MESSAGES = 32
+RECALL_SNIPPET_CHARS = 500
+
+
+def recall_history_message(recalled: list[dict]) -> dict[str, str]:
+    lines = [
+        f"- {item['role']} ({item['created_at']}): {item['content'][:RECALL_SNIPPET_CHARS]}"
+        for item in recalled
+    ]
+    return {"role": "system", "content": "Possibly relevant messages from earlier conversations:\n" + "\n".join(lines)}
 
 
 class MemoryStore:
-    def __init__(self, db_path: str | None = None):
+    def __init__(
+        self,
+        db_path: str | None = None,
+        embedder: Embedder | None = None,
+        history_cache: HistoryWindowCache | None = None,
+    ):
         self.db = SQLiteDB(db_path)
+        self._embedder = embedder
+        self._vector_index: VectorIndex | None = None
+        self.history_cache = history_cache or HistoryWindowCache(
+            settings.HISTORY_CACHE_MAX_BYTES,
+            settings.HISTORY_CACHE_WINDOW_MESSAGES,
+        )
 
     def _connect(self):
         return self.db.connect()
@@ -17,40 +77,309 @@ class MemoryStore:
         return str(uuid4())
 
     def append_message(self, conversation_id: str, role: str, content: str, client_id: str | None = None) -> None:
+        self.append_messages([
+            {"conversation_id": conversation_id, "role": role, "content": content, "client_id": client_id},
+        ])
+
+    def append_messages(self, messages: list[dict]) -> None:
+        # One executemany inside one transaction: a single commit for the whole batch.
+        if not messages:
+            return
         with self._connect() as conn:
-            conn.execute(
-                'INSERT INTO messages (client_id, conversation_id, role, content) VALUES (?, ?, ?, ?)',
-                (client_id, conversation_id, role, content),
+            conn.executemany(
+                'INSERT INTO messages (client_id, conversation_id, role, content, token_estimate) VALUES (?, ?, ?, ?, ?)',
+                [
+                    (
+                        message.get("client_id"),
+                        message["conversation_id"],
+                        message["role"],
+                        message["content"],
+                        estimate_tokens(message["content"]),
+                    )
+                    for message in messages
+                ],
             )
+            # The batch holds the write lock, so AUTOINCREMENT ids are contiguous.
+            last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+
+        if self.history_cache.enabled:
+            first_id = last_id - len(messages) + 1
+            appended: dict[tuple[str, str], list[tuple[int, str, str]]] = {}
+            for offset, message in enumerate(messages):
+                if message.get("client_id") is not None:
+                    key = (message["client_id"], message["conversation_id"])
+                    appended.setdefault(key, []).append((first_id + offset, message["role"], message["content"]))
+            for key, rows in appended.items():
+                self.history_cache.append(key, rows)
+
+    def append_turn(self, conversation_id: str, client_id: str | None, messages: list[dict[str, str]]) -> None:
+        self.append_messages([
+            {"conversation_id": conversation_id, "client_id": client_id, "role": message["role"], "content": message["content"]}
+            for message in messages
+        ])
 
     def get_recent_messages(
         self,
         conversation_id: str,
         limit: int = 10,
         client_id: str | None = None,
+        after_id: int | None = None,
+    ) -> List[dict[str, str]]:
+        cache = self.history_cache
+        if client_id is None or not cache.enabled or limit > cache.window:
+            rows = self._select_recent(conversation_id, limit, client_id, after_id)
+            return [{"role": row[1], "content": row[2]} for row in rows]
+
+        key = (client_id, conversation_id)
+        cached = cache.get(key, limit, after_id)
+        if cached is None:
+            generation = cache.generation()
+            window = self._select_recent(conversation_id, cache.window, client_id)
+            cache.put(key, window, len(window) < cache.window, generation)
+            cached = [row for row in window if after_id is None or row[0] > after_id][-limit:]
+        return [{"role": role, "content": content} for _, role, content in cached]
+
+    def _select_recent(
+        self,
+        conversation_id: str,
+        limit: int,
+        client_id: str | None = None,
+        after_id: int | None = None,
+    ) -> list[tuple[int, str, str]]:
+        conditions = ["conversation_id = ?"]
+        params: list = [conversation_id]
+        if client_id is not None:
+            conditions.append("client_id = ?")
+            params.append(client_id)
+        if after_id is not None:
+            conditions.append("id > ?")
+            params.append(after_id)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f'''
+                SELECT id, role, content
+                FROM messages
+                WHERE {" AND ".join(conditions)}
+                ORDER BY id DESC
+                LIMIT ?
+                ''',
+                (*params, limit),
+            ).fetchall()
+        return [(row[0], row[1], row[2]) for row in reversed(rows)]
+
+    def invalidate_conversation(self, conversation_id: str, client_id: str | None = None) -> None:
+        if client_id is None:
+            self.history_cache.clear()
+        else:
+            self.history_cache.invalidate((client_id, conversation_id))
+
+    def get_messages_within_token_budget(
+        self,
+        conversation_id: str,
+        token_budget: int,
+        client_id: str | None = None,
+        max_messages: int = 50,
+        max_message_tokens: int | None = None,
+        after_id: int | None = None,
     ) -> List[dict[str, str]]:
+        # Oversized messages are cut in SQL so a huge tool output is never fully loaded.
+        per_message_cap = max(1, min(max_message_tokens or token_budget, token_budget))
+        cap_chars = per_message_cap * CHARS_PER_TOKEN
+        conditions = ["conversation_id = ?"]
+        params: list = [conversation_id]
+        if client_id is not None:
+            conditions.append("client_id = ?")
+            params.append(client_id)
+        if after_id is not None:
+            conditions.append("id > ?")
+            params.append(after_id)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f'''
+                SELECT
+                    role,
+                    CASE WHEN token_estimate > ? THEN substr(content, 1, ?) ELSE content END AS content,
+                    token_estimate
+                FROM messages
+                WHERE {" AND ".join(conditions)}
+                ORDER BY id DESC
+                LIMIT ?
+                ''',
+                (per_message_cap, cap_chars, *params, max_messages),
+            ).fetchall()
+
+        selected: list[dict[str, str]] = []
+        used = 0
+        for role, content, token_estimate in rows:
+            tokens = token_estimate or estimate_tokens(content)
+            if tokens > per_message_cap:
+                content = content + TRUNCATION_MARKER.format(omitted=tokens - per_message_cap)
+                tokens = per_message_cap
+            if used + tokens > token_budget:
+                break
+            used += tokens
+            selected.append({"role": role, "content": content})
+        selected.reverse()
+        return selected
+
+    def get_unsummarized_messages(
+        self,
+        conversation_id: str,
+        client_id: str | None = None,
+        after_id: int = 0,
+        limit: int = 500,
+    ) -> list[dict]:
+        client_filter = "" if client_id is None else "AND client_id = ?"
+        client_params = () if client_id is None else (client_id,)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f'''
+                SELECT id, role, content
+                FROM messages
+                WHERE conversation_id = ? {client_filter} AND id > ?
+                ORDER BY id
+                LIMIT ?
+                ''',
+                (conversation_id, *client_params, after_id, limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_summary(self, conversation_id: str, client_id: str | None = None) -> dict | None:
+        with self._connect() as conn:
+            row = conn.execute(
+                '''
+                SELECT summary, high_water_message_id, updated_at
+                FROM conversation_summaries
+                WHERE client_id = ? AND conversation_id = ?
+                ''',
+                (client_id or "", conversation_id),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def save_summary(self, conversation_id: str, summary: str, high_water_message_id: int, client_id: str | None = None) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                '''
+                INSERT INTO conversation_summaries (client_id, conversation_id, summary, high_water_message_id, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (client_id, conversation_id) DO UPDATE SET
+                    summary = excluded.summary,
+                    high_water_message_id = excluded.high_water_message_id,
+                    updated_at = excluded.updated_at
+                WHERE excluded.high_water_message_id > conversation_summaries.high_water_message_id
+                ''',
+                (client_id or "", conversation_id, summary, high_water_message_id, utc_now_iso()),
+            )
+
+    def search(self, client_id: str | None, query: str, limit: int = 20) -> list[dict]:
+        terms = build_fts_query(query)
+        if not terms:
+            return []
+        scope = fts_client_scope(client_id).replace('"', '""')
+        match = f'content : ({terms}) AND client_scope : "{scope}"'
+        with self._connect() as conn:
+            rows = conn.execute(
+                """
+                SELECT
+                    m.id AS message_id,
+                    m.conversation_id,
+                    m.role,
+                    m.created_at,
+                    snippet(messages_fts, 0, '[', ']', '...', 16) AS snippet,
+                    bm25(messages_fts, 1.0, 0.0) AS rank
+                FROM messages_fts
+                JOIN messages AS m ON m.id = messages_fts.rowid
+                WHERE messages_fts MATCH ? AND m.client_id IS ?
+                ORDER BY rank
+                LIMIT ?
+                """,
+                (match, client_id, limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    @property
+    def vector_index(self) -> VectorIndex:
+        if self._vector_index is None:
+            directory = settings.MEMORY_VECTOR_DIR or Path(self.db.db_path).parent / "vectors"
+            self._vector_index = VectorIndex(directory, self._embedder or embedder_from_settings())
+        return self._vector_index
+
+    def embed_query(self, query: str) -> np.ndarray:
+        # May call out to an embedding model; async callers run it off the DB pools.
+        return self.vector_index.embedder.embed([query])[0]
+
+    def index_pending_messages(self, client_id: str | None, max_messages: int | None = None) -> int:
+        # Vectors are built lazily: everything past the per-client high-water mark, or
+        # at most `max_messages` of it. The client lock keeps concurrent indexers from
+        # embedding and appending the same rows twice.
+        index = self.vector_index
+        with index.client_lock(client_id):
+            high_water = index.high_water(client_id)
+            indexed = 0
+            while max_messages is None or indexed < max_messages:
+                batch = RECALL_INDEX_BATCH_SIZE if max_messages is None else min(RECALL_INDEX_BATCH_SIZE, max_messages - indexed)
+                with self._connect() as conn:
+                    rows = conn.execute(
+                        '''
+                        SELECT id, content
+                        FROM messages
+                        WHERE client_id IS ? AND id > ?
+                        ORDER BY id
+                        LIMIT ?
+                        ''',
+                        (client_id, high_water, batch),
+                    ).fetchall()
+                if not rows:
+                    break
+                index.add(client_id, [row[0] for row in rows], [row[1] for row in rows])
+                indexed += len(rows)
+                high_water = rows[-1][0]
+            return indexed
+
+    def recall(
+        self,
+        client_id: str | None,
+        query: str,
+        k: int = 5,
+        exclude_conversation_id: str | None = None,
+        min_score: float | None = None,
+        index_pending: bool = True,
+        query_vector: np.ndarray | None = None,
+    ) -> list[dict]:
+        if k <= 0 or not query.strip():
+            return []
+        if index_pending:
+            self.index_pending_messages(client_id)
+        if query_vector is None:
+            query_vector = self.embed_query(query)
+        min_score = settings.MEMORY_RECALL_MIN_SCORE if min_score is None else min_score
+        # Over-fetch: hits from the current conversation or pruned rows are dropped below.
+        hits = [
+            (message_id, score)
+            for message_id, score in self.vector_index.search(client_id, query_vector, k * 4)
+            if score >= min_score
+        ]
+        if not hits:
+            return []
+        placeholders = ", ".join("?" for _ in hits)
         with self._connect() as conn:
-            if client_id is None:
-                rows = conn.execute(
-                    '''
-                    SELECT role, content
-                    FROM messages
-                    WHERE conversation_id = ?
-                    ORDER BY id DESC
-                    LIMIT ?
-                    ''',
-                    (conversation_id, limit),
-                ).fetchall()
-            else:
-                rows = conn.execute(
-                    '''
-                    SELECT role, content
-                    FROM messages
-                    WHERE conversation_id = ? AND client_id = ?
-                    ORDER BY id DESC
-                    LIMIT ?
-                    ''',
-                    (conversation_id, client_id, limit),
-                ).fetchall()
-
-        return [{"role": row[0], "content": row[1]} for row in reversed(rows)]
+            rows = conn.execute(
+                f'''
+                SELECT id AS message_id, conversation_id, role, content, created_at
+                FROM messages
+                WHERE id IN ({placeholders}) AND client_id IS ?
+                ''',
+                (*[message_id for message_id, _ in hits], client_id),
+            ).fetchall()
+        by_id = {row["message_id"]: dict(row) for row in rows}
+        results = []
+        seen = set()
+        for message_id, score in hits:
+            row = by_id.get(message_id)
+            if row is None or message_id in seen or row["conversation_id"] == exclude_conversation_id:
+                continue
+            seen.add(message_id)
+            results.append({**row, "score": round(score, 4)})
+            if len(results) == k:
+                break
+        return results
@@ -5,14 +5,21 @@ class ChatRequest(BaseModel):
     message: str
     conversation_id: str | None = None
     history_limit: int = Field(default=10, ge=1, le=50)
+    history_token_budget: int | None = Field(default=None, ge=1, le=200000)
+    recall_k: int = Field(default=0, ge=0, le=20)
     reset_conversation: bool = False
     persist: bool = True
+    cache: bool = True
 
 
 class ChatResponse(BaseModel):
     reply: str
     conversation_id: str
     used_history: int = 0
+    provider: str | None = None
+    model: str | None = None
+    cached: bool = False
+    queue_wait_ms: float = 0.0
 
 
 class ClientCreateRequest(BaseModel):
@@ -63,6 +70,7 @@ class BotStatusResponse(BotCreateResponse):
 
 
 class BotEventResponse(BaseModel):
+    seq: int | None = None
     event_id: str
     bot_id: str
     owner_client_id: str
@@ -70,3 +78,12 @@ class BotEventResponse(BaseModel):
     message: str | None = None
     created_at: str
     payload: dict = Field(default_factory=dict)
+
+
+class MemorySearchResult(BaseModel):
+    message_id: int
+    conversation_id: str
+    role: str
+    snippet: str
+    rank: float
+    created_at: str | None = None
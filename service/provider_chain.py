@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import deque
+
+from service.config import settings
+
+ChainEntry = tuple[str, str | None]
+
+# Providers report failures as reply text rather than raising.
+PROVIDER_ERROR_PREFIXES = (
+    "OPENAI_API_KEY not configured.",
+    "OpenAI error:",
+    "Ollama error:",
+    "Ollama is not reachable.",
+    "Unsupported LLM_PROVIDER",
+    "LLM providers unavailable",
+)
+
+
+# Configuration errors fail instantly, so they fall through the chain without
+# counting against the provider's circuit breaker.
+CONFIGURATION_ERROR_PREFIXES = ("OPENAI_API_KEY not configured.",)
+
+
+def is_provider_error(reply: str) -> bool:
+    return reply.startswith(PROVIDER_ERROR_PREFIXES)
+
+
+def parse_provider_chain(primary: str, fallbacks: str, default_models: dict[str, str]) -> list[ChainEntry]:
+    # Entries are "provider" or "provider:model"; a bare provider uses its configured model.
+    chain: list[ChainEntry] = []
+    for raw in [primary, *fallbacks.split(",")]:
+        name, _, model = raw.strip().partition(":")
+        name = name.strip().lower()
+        if not name:
+            continue
+        entry = (name, model.strip() or default_models.get(name))
+        if entry not in chain:
+            chain.append(entry)
+    return chain
+
+
+class CircuitBreaker:
+    # closed -> open after `failure_threshold` consecutive failures; once `reset_seconds`
+    # have passed a single trial call is let through (half-open) and decides the next state.
+    def __init__(self, failure_threshold: int = 3, reset_seconds: float = 30):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.total_failures = 0
+        self.total_successes = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                return True
+            return False
+
+    def retry_after(self) -> float:
+        with self._lock:
+            if self.state != "open":
+                return 0.0
+            return max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self.total_successes += 1
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            self.total_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        # A half-open trial that was cancelled (e.g. lost a hedge race) proves nothing.
+        with self._lock:
+            if self.state == "half_open":
+                self.state = "open"
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failures": self.total_failures,
+                "successes": self.total_successes,
+            }
+
+
+class LatencyTracker:
+    def __init__(self, max_samples: int = 200):
+        self._samples: deque[float] = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, percentile: float) -> float | None:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        rank = max(0, min(len(samples) - 1, math.ceil(percentile / 100 * len(samples)) - 1))
+        return samples[rank]
+
+
+class ProviderHealth:
+    # Per-provider circuit breakers and first-token latencies used to pick hedge delays.
+    def __init__(
+        self,
+        *,
+        failure_threshold: int = 3,
+        reset_seconds: float = 30,
+        hedge_percentile: float = 95,
+        hedge_delay_seconds: float = 10,
+        hedge_min_samples: int = 20,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay_seconds = hedge_delay_seconds
+        self.hedge_min_samples = hedge_min_samples
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._latencies: dict[str, LatencyTracker] = {}
+        self.hedges = 0
+        self.fallbacks = 0
+
+    @classmethod
+    def from_settings(cls) -> "ProviderHealth":
+        return cls(
+            failure_threshold=settings.LLM_CIRCUIT_FAILURE_THRESHOLD,
+            reset_seconds=settings.LLM_CIRCUIT_RESET_SECONDS,
+            hedge_percentile=settings.LLM_HEDGE_PERCENTILE,
+            hedge_delay_seconds=settings.LLM_HEDGE_DELAY_SECONDS,
+            hedge_min_samples=settings.LLM_HEDGE_MIN_SAMPLES,
+        )
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        breaker = self._breakers.get(provider)
+        if breaker is None:
+            breaker = self._breakers.setdefault(provider, CircuitBreaker(self.failure_threshold, self.reset_seconds))
+        return breaker
+
+    def latencies(self, provider: str) -> LatencyTracker:
+        tracker = self._latencies.get(provider)
+        if tracker is None:
+            tracker = self._latencies.setdefault(provider, LatencyTracker())
+        return tracker
+
+    def hedge_delay(self, provider: str) -> float | None:
+        if self.hedge_percentile <= 0:
+            return None
+        tracker = self.latencies(provider)
+        if len(tracker) < self.hedge_min_samples:
+            return self.hedge_delay_seconds
+        return tracker.percentile(self.hedge_percentile)
+
+    def stats(self) -> dict:
+        providers = {}
+        for provider in sorted(set(self._breakers) | set(self._latencies)):
+            tracker = self.latencies(provider)
+            providers[provider] = {
+                **self.breaker(provider).stats(),
+                "first_token_p50_seconds": tracker.percentile(50),
+                "first_token_p95_seconds": tracker.percentile(95),
+                "hedge_delay_seconds": self.hedge_delay(provider),
+            }
+        return {"hedges": self.hedges, "fallbacks": self.fallbacks, "providers": providers}
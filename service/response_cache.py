@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from service.config import settings
+from service.provider_chain import is_provider_error
+from service.storage.db import SQLiteDB
+from service.storage.executor import DBExecutor
+
+
+def response_cache_key(
+    provider: str,
+    model: str | None,
+    system_prompt: str,
+    history: list[dict[str, str]],
+    message: str,
+) -> str:
+    material = json.dumps([provider, model, system_prompt, history, message], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def is_cacheable_reply(reply: str) -> bool:
+    return bool(reply) and not is_provider_error(reply)
+
+
+class ResponseCache:
+    # Two tiers: an in-process LRU in front of the `response_cache` table. Both honour
+    # the same TTL; the table is additionally capped by row count and total bytes.
+    def __init__(
+        self,
+        db: SQLiteDB,
+        *,
+        executor: DBExecutor | None = None,
+        ttl_seconds: float = 3600,
+        memory_entries: int = 256,
+        max_rows: int = 10000,
+        max_bytes: int = 32 * 1024 * 1024,
+    ):
+        self.db = db
+        self.executor = executor
+        self.ttl_seconds = ttl_seconds
+        self.memory_entries = max(0, memory_entries)
+        self.max_rows = max(1, max_rows)
+        self.max_bytes = max(1, max_bytes)
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._pending_hits: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    @classmethod
+    def from_settings(cls, db: SQLiteDB, executor: DBExecutor | None = None) -> "ResponseCache":
+        return cls(
+            db,
+            executor=executor,
+            ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+            memory_entries=settings.RESPONSE_CACHE_MEMORY_ENTRIES,
+            max_rows=settings.RESPONSE_CACHE_MAX_ROWS,
+            max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+        )
+
+    def _remember(self, key: str, expires_at: float, reply: str) -> None:
+        if not self.memory_entries:
+            return
+        with self._lock:
+            self._memory[key] = (expires_at, reply)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _memory_get(self, key: str, now: float) -> str | None:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            self._pending_hits[key] = now
+            return entry[1]
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        reply = self._memory_get(key, now)
+        if reply is not None:
+            return reply
+        with self.db.connect() as conn:
+            row = conn.execute(
+                "SELECT reply, expires_at FROM response_cache WHERE cache_key = ? AND expires_at > ?",
+                (key, now),
+            ).fetchone()
+        # Lookups stay read-only (they run on the reader pool); hit times are buffered
+        # and written on the writer thread before the next eviction pass.
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            if len(self._pending_hits) < self.max_rows:
+                self._pending_hits[key] = now
+        self._remember(key, row["expires_at"], row["reply"])
+        return row["reply"]
+
+    def put(self, key: str, provider: str, model: str | None, reply: str) -> None:
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        size_bytes = len(reply.encode("utf-8"))
+        self._remember(key, expires_at, reply)
+        with self.db.connect() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO response_cache
+                    (cache_key, provider, model, reply, size_bytes, created_at, expires_at, last_hit_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (key, provider, model, reply, size_bytes, now, expires_at, now),
+            )
+            self._flush_hits(conn)
+            self._enforce_caps(conn, now)
+        with self._lock:
+            self.stores += 1
+
+    def _flush_hits(self, conn) -> None:
+        with self._lock:
+            hits, self._pending_hits = self._pending_hits, {}
+        if hits:
+            conn.executemany(
+                "UPDATE response_cache SET last_hit_at = ? WHERE cache_key = ?",
+                [(hit_at, key) for key, hit_at in hits.items()],
+            )
+
+    def _enforce_caps(self, conn, now: float) -> None:
+        conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+        rows, total_bytes = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM response_cache"
+        ).fetchone()
+        if rows <= self.max_rows and total_bytes <= self.max_bytes:
+            return
+        # Evict least recently used rows until both caps hold again.
+        evict_rows = max(0, rows - self.max_rows)
+        excess_bytes = total_bytes - self.max_bytes
+        freed = 0
+        victims = []
+        for key, size in conn.execute("SELECT cache_key, size_bytes FROM response_cache ORDER BY last_hit_at"):
+            if len(victims) >= evict_rows and freed >= excess_bytes:
+                break
+            victims.append((key,))
+            freed += size
+        conn.executemany("DELETE FROM response_cache WHERE cache_key = ?", victims)
+
+    async def aget(self, key: str) -> str | None:
+        reply = self._memory_get(key, time.time())
+        if reply is not None:
+            return reply
+        if self.executor is None:
+            return self.get(key)
+        return await self.executor.read(self.get, key)
+
+    async def aput(self, key: str, provider: str, model: str | None, reply: str) -> None:
+        if self.executor is None:
+            self.put(key, provider, model, reply)
+        else:
+            await self.executor.write(self.put, key, provider, model, reply)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._pending_hits.clear()
+        with self.db.connect() as conn:
+            conn.execute("DELETE FROM response_cache")
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_entries": len(self._memory),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            }
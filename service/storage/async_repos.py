@@ -0,0 +1,214 @@
+import asyncio
+import logging
+from functools import partial
+
+from service.memory import RECALL_INLINE_INDEX_MESSAGES, MemoryStore
+from service.storage.bot_events_repo import BotEventsRepository
+from service.storage.clients_repo import ClientsRepository
+from service.storage.executor import DBExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncMemoryStore:
+    def __init__(self, store: MemoryStore, executor: DBExecutor):
+        self.store = store
+        self.executor = executor
+        self._backfills: dict[str | None, asyncio.Task] = {}
+
+    def ensure_conversation_id(self, conversation_id: str | None) -> str:
+        return self.store.ensure_conversation_id(conversation_id)
+
+    async def append_message(self, conversation_id: str, role: str, content: str, client_id: str | None = None) -> None:
+        await self.executor.write(self.store.append_message, conversation_id, role, content, client_id=client_id)
+
+    def invalidate_conversation(self, conversation_id: str, client_id: str | None = None) -> None:
+        self.store.invalidate_conversation(conversation_id, client_id=client_id)
+
+    async def append_messages(self, messages: list[dict]) -> None:
+        await self.executor.write(self.store.append_messages, messages)
+
+    async def append_turn(self, conversation_id: str, client_id: str | None, messages: list[dict[str, str]]) -> None:
+        await self.executor.write(self.store.append_turn, conversation_id, client_id, messages)
+
+    async def get_recent_messages(
+        self,
+        conversation_id: str,
+        limit: int = 10,
+        client_id: str | None = None,
+        after_id: int | None = None,
+    ) -> list[dict[str, str]]:
+        return await self.executor.read(
+            self.store.get_recent_messages,
+            conversation_id,
+            limit=limit,
+            client_id=client_id,
+            after_id=after_id,
+        )
+
+    async def get_messages_within_token_budget(
+        self,
+        conversation_id: str,
+        token_budget: int,
+        client_id: str | None = None,
+        max_messages: int = 50,
+        max_message_tokens: int | None = None,
+        after_id: int | None = None,
+    ) -> list[dict[str, str]]:
+        return await self.executor.read(
+            self.store.get_messages_within_token_budget,
+            conversation_id,
+            token_budget,
+            client_id=client_id,
+            max_messages=max_messages,
+            max_message_tokens=max_message_tokens,
+            after_id=after_id,
+        )
+
+    async def get_unsummarized_messages(
+        self,
+        conversation_id: str,
+        client_id: str | None = None,
+        after_id: int = 0,
+        limit: int = 500,
+    ) -> list[dict]:
+        return await self.executor.read(
+            self.store.get_unsummarized_messages,
+            conversation_id,
+            client_id=client_id,
+            after_id=after_id,
+            limit=limit,
+        )
+
+    async def get_summary(self, conversation_id: str, client_id: str | None = None) -> dict | None:
+        return await self.executor.read(self.store.get_summary, conversation_id, client_id=client_id)
+
+    async def save_summary(self, conversation_id: str, summary: str, high_water_message_id: int, client_id: str | None = None) -> None:
+        await self.executor.write(self.store.save_summary, conversation_id, summary, high_water_message_id, client_id=client_id)
+
+    async def search(self, client_id: str | None, query: str, limit: int = 20) -> list[dict]:
+        return await self.executor.read(self.store.search, client_id, query, limit=limit)
+
+    async def recall(
+        self,
+        client_id: str | None,
+        query: str,
+        k: int = 5,
+        exclude_conversation_id: str | None = None,
+    ) -> list[dict]:
+        if k <= 0 or not query.strip():
+            return []
+        # Embedding (possibly an HTTP call to Ollama) runs in worker threads, never on
+        # the DB reader pool: only the vector search and row lookup go there. Only a
+        # few pending messages are indexed inline; a longer backlog (a first recall over
+        # an old history) is backfilled in the background and recall searches what is
+        # indexed so far.
+        query_vector = await asyncio.to_thread(self.store.embed_query, query)
+        if client_id not in self._backfills:
+            indexed = await asyncio.to_thread(self.store.index_pending_messages, client_id, RECALL_INLINE_INDEX_MESSAGES)
+            if indexed >= RECALL_INLINE_INDEX_MESSAGES:
+                self.schedule_backfill(client_id)
+        return await self.executor.read(
+            self.store.recall,
+            client_id,
+            query,
+            k=k,
+            exclude_conversation_id=exclude_conversation_id,
+            index_pending=False,
+            query_vector=query_vector,
+        )
+
+    def schedule_backfill(self, client_id: str | None) -> asyncio.Task:
+        running = self._backfills.get(client_id)
+        if running is not None and not running.done():
+            return running
+        task = asyncio.create_task(self._backfill(client_id), name=f"recall-backfill-{client_id}")
+        self._backfills[client_id] = task
+        task.add_done_callback(partial(self._forget_backfill, client_id))
+        return task
+
+    def _forget_backfill(self, client_id: str | None, task: asyncio.Task) -> None:
+        if self._backfills.get(client_id) is task:
+            del self._backfills[client_id]
+
+    async def _backfill(self, client_id: str | None) -> None:
+        try:
+            await asyncio.to_thread(self.store.index_pending_messages, client_id)
+        except Exception:
+            logger.exception("Indexing messages for recall failed (client %s)", client_id)
+
+    async def close(self) -> None:
+        tasks = list(self._backfills.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._backfills.clear()
+
+
+class AsyncClientsRepository:
+    def __init__(self, repo: ClientsRepository, executor: DBExecutor):
+        self.repo = repo
+        self.executor = executor
+
+    async def create_client(self, name: str | None = None, *, preferences: dict | None = None, is_primary: bool = False) -> dict:
+        return await self.executor.write(self.repo.create_client, name, preferences=preferences, is_primary=is_primary)
+
+    async def list_clients(self) -> list[dict]:
+        return await self.executor.read(self.repo.list_clients)
+
+    async def authenticate_client(self, client_id: str, token: str) -> dict | None:
+        # Cache hits are answered on the loop; last_seen_at is buffered, so a miss is a read.
+        record = self.repo.authenticate_cached(client_id, token)
+        if record is not None:
+            return record
+        return await self.executor.read(self.repo.authenticate_from_db, client_id, token)
+
+    async def verify_client_token(self, client_id: str, token: str) -> bool:
+        return await self.authenticate_client(client_id, token) is not None
+
+    async def get_client(self, client_id: str) -> dict | None:
+        return await self.executor.read(self.repo.get_client, client_id)
+
+    async def get_primary_client(self) -> dict | None:
+        return await self.executor.read(self.repo.get_primary_client)
+
+    async def update_preferences(self, client_id: str, preferences: dict) -> dict | None:
+        return await self.executor.write(self.repo.update_preferences, client_id, preferences)
+
+
+class AsyncBotEventsRepository:
+    def __init__(self, repo: BotEventsRepository, executor: DBExecutor):
+        self.repo = repo
+        self.executor = executor
+
+    async def add_event(
+        self,
+        bot_id: str,
+        owner_client_id: str,
+        event_type: str,
+        message: str | None = None,
+        payload: dict | None = None,
+    ) -> dict:
+        return await self.executor.write(self.repo.add_event, bot_id, owner_client_id, event_type, message, payload)
+
+    async def list_events(
+        self,
+        bot_id: str,
+        limit: int = 100,
+        *,
+        after: int | None = None,
+        before: int | None = None,
+        event_type: str | None = None,
+        since: str | None = None,
+        until: str | None = None,
+    ) -> list[dict]:
+        return await self.executor.read(
+            self.repo.list_events,
+            bot_id,
+            limit=limit,
+            after=after,
+            before=before,
+            event_type=event_type,
+            since=since,
+            until=until,
+        )
@@ -7,6 +7,25 @@ from service.storage.db import SQLiteDB, utc_now_iso
 class BotEventsRepository:
     def __init__(self, db: SQLiteDB):
         self.db = db
+        self.write_buffer = None
+
+    @staticmethod
+    def new_event(
+        bot_id: str,
+        owner_client_id: str,
+        event_type: str,
+        message: str | None = None,
+        payload: dict | None = None,
+    ) -> dict:
+        return {
+            "event_id": str(uuid4()),
+            "bot_id": bot_id,
+            "owner_client_id": owner_client_id,
+            "event_type": event_type,
+            "message": message,
+            "created_at": utc_now_iso(),
+            "payload": payload or {},
+        }
 
     def add_event(
         self,
@@ -16,41 +35,86 @@ class BotEventsRepository:
         message: str | None = None,
         payload: dict | None = None,
     ) -> dict:
-        event_id = str(uuid4())
-        created_at = utc_now_iso()
-        payload_json = json.dumps(payload or {})
+        event = self.new_event(bot_id, owner_client_id, event_type, message, payload)
+        self.add_events([event])
+        return event
+
+    def add_events(self, events: list[dict]) -> None:
+        if not events:
+            return
         with self.db.connect() as conn:
-            conn.execute(
+            conn.executemany(
                 """
                 INSERT INTO bot_events (event_id, bot_id, owner_client_id, event_type, message, created_at, payload_json)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
                 """,
-                (event_id, bot_id, owner_client_id, event_type, message, created_at, payload_json),
+                [
+                    (
+                        event["event_id"],
+                        event["bot_id"],
+                        event["owner_client_id"],
+                        event["event_type"],
+                        event["message"],
+                        event["created_at"],
+                        json.dumps(event["payload"]),
+                    )
+                    for event in events
+                ],
             )
-        return {
-            "event_id": event_id,
-            "bot_id": bot_id,
-            "owner_client_id": owner_client_id,
-            "event_type": event_type,
-            "message": message,
-            "created_at": created_at,
-            "payload": payload or {},
-        }
+            # The batch holds the write lock, so AUTOINCREMENT hands out a contiguous range.
+            last_seq = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        for offset, event in enumerate(events, start=last_seq - len(events) + 1):
+            event["seq"] = offset
+
+    def list_events(
+        self,
+        bot_id: str,
+        limit: int = 100,
+        *,
+        after: int | None = None,
+        before: int | None = None,
+        event_type: str | None = None,
+        since: str | None = None,
+        until: str | None = None,
+    ) -> list[dict]:
+        if self.write_buffer is not None:
+            self.write_buffer.flush()
+
+        conditions = ["bot_id = ?"]
+        params: list = [bot_id]
+        if event_type is not None:
+            conditions.append("event_type = ?")
+            params.append(event_type)
+        if since is not None:
+            conditions.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("created_at < ?")
+            params.append(until)
+        if after is not None:
+            conditions.append("seq > ?")
+            params.append(after)
+        if before is not None:
+            conditions.append("seq < ?")
+            params.append(before)
 
-    def list_events(self, bot_id: str, limit: int = 100) -> list[dict]:
+        # Paging forward from a cursor reads oldest-first; otherwise take the newest page.
+        order = "ASC" if after is not None else "DESC"
         with self.db.connect() as conn:
             rows = conn.execute(
-                """
-                SELECT event_id, bot_id, owner_client_id, event_type, message, created_at, payload_json
+                f"""
+                SELECT seq, event_id, bot_id, owner_client_id, event_type, message, created_at, payload_json
                 FROM bot_events
-                WHERE bot_id = ?
-                ORDER BY created_at DESC
+                WHERE {" AND ".join(conditions)}
+                ORDER BY seq {order}
                 LIMIT ?
                 """,
-                (bot_id, limit),
+                (*params, limit),
             ).fetchall()
+        if order == "DESC":
+            rows = list(reversed(rows))
         events: list[dict] = []
-        for row in reversed(rows):
+        for row in rows:
             event = dict(row)
             event["payload"] = json.loads(event.pop("payload_json") or "{}")
             events.append(event)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class ClientAuthCache:
+    # Verified (client_id, token_hash) -> client record, expiring after `ttl_seconds`.
+    def __init__(self, ttl_seconds: float = 30.0, max_entries: int = 4096):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self._entries: OrderedDict[tuple[str, str], tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def get(self, client_id: str, token_hash: str) -> dict | None:
+        key = (client_id, token_hash)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(entry[1])
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, client_id: str, token_hash: str, record: dict) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[(client_id, token_hash)] = (time.monotonic() + self.ttl_seconds, dict(record))
+            self._entries.move_to_end((client_id, token_hash))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_client(self, client_id: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == client_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class LastSeenBuffer:
+    # Coalesces last_seen_at touches and writes them in one batched UPDATE per interval.
+    def __init__(self, clients_repo, flush_interval_seconds: float = 5.0):
+        self.clients_repo = clients_repo
+        self.flush_interval_seconds = flush_interval_seconds
+        self.flush_count = 0
+        self._pending: dict[str, str] = {}
+        self._wakeup = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._closed = False
+        clients_repo.last_seen_buffer = self
+
+    def touch(self, client_id: str, seen_at: str) -> None:
+        with self._wakeup:
+            if self._closed:
+                closed = True
+            else:
+                closed = False
+                self._pending[client_id] = seen_at
+                self._ensure_flusher()
+        if closed:
+            self.clients_repo.record_last_seen({client_id: seen_at})
+
+    def pending_count(self) -> int:
+        with self._wakeup:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._wakeup:
+                if not self._pending:
+                    return 0
+                batch = dict(self._pending)
+                self._pending.clear()
+            try:
+                self.clients_repo.record_last_seen(batch)
+            except Exception:
+                with self._wakeup:
+                    for client_id, seen_at in batch.items():
+                        self._pending.setdefault(client_id, seen_at)
+                raise
+            self.flush_count += 1
+            return len(batch)
+
+    def close(self) -> None:
+        with self._wakeup:
+            self._closed = True
+            self._wakeup.notify_all()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=max(1.0, self.flush_interval_seconds * 2))
+        self.flush()
+
+    def _ensure_flusher(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="orty-last-seen-flusher", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._wakeup:
+                if not self._closed:
+                    self._wakeup.wait(timeout=self.flush_interval_seconds)
+                closed = self._closed
+            try:
+                self.flush()
+            except Exception:  # noqa: BLE001
+                logger.exception("Failed to flush client last_seen_at updates")
+            if closed:
+                return
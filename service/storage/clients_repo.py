@@ -1,14 +1,32 @@
 import hashlib
+import hmac
 import json
 import secrets
 from uuid import uuid4
 
+from service.config import settings
+from service.storage.client_auth import ClientAuthCache
 from service.storage.db import SQLiteDB, utc_now_iso
 
+CLIENT_COLUMNS = "client_id, name, preferences_json, is_primary, created_at, last_seen_at"
+
+
+def _client_payload(row) -> dict:
+    payload = dict(row)
+    payload["preferences"] = json.loads(payload.pop("preferences_json") or "{}")
+    payload["is_primary"] = bool(payload["is_primary"])
+    return payload
+
 
 class ClientsRepository:
-    def __init__(self, db: SQLiteDB):
+    def __init__(self, db: SQLiteDB, auth_cache: ClientAuthCache | None = None):
         self.db = db
+        self.auth_cache = auth_cache or ClientAuthCache(settings.CLIENT_AUTH_CACHE_TTL_SECONDS)
+        # Set by LastSeenBuffer; without one, last_seen_at is written on every verification.
+        self.last_seen_buffer = None
+        # The primary client is read on every admin/UI request but almost never changes.
+        self._primary_client: dict | None = None
+        self._primary_generation = 0
 
     @staticmethod
     def hash_token(token: str) -> str:
@@ -24,6 +42,7 @@ class ClientsRepository:
         with self.db.connect() as conn:
             if is_primary:
                 conn.execute("UPDATE clients SET is_primary = 0 WHERE is_primary = 1")
+                self.auth_cache.clear()
             conn.execute(
                 """
                 INSERT INTO clients (client_id, name, token_hash, preferences_json, is_primary, created_at)
@@ -31,6 +50,8 @@ class ClientsRepository:
                 """,
                 (client_id, name, token_hash, preferences_json, 1 if is_primary else 0, created_at),
             )
+        if is_primary:
+            self._forget_primary_client()
 
         return {
             "client_id": client_id,
@@ -43,54 +64,78 @@ class ClientsRepository:
 
     def list_clients(self) -> list[dict]:
         with self.db.connect() as conn:
-            rows = conn.execute(
-                "SELECT client_id, name, preferences_json, is_primary, created_at, last_seen_at FROM clients ORDER BY created_at DESC"
-            ).fetchall()
-        clients: list[dict] = []
-        for row in rows:
-            payload = dict(row)
-            payload["preferences"] = json.loads(payload.pop("preferences_json") or "{}")
-            payload["is_primary"] = bool(payload["is_primary"])
-            clients.append(payload)
-        return clients
+            rows = conn.execute(f"SELECT {CLIENT_COLUMNS} FROM clients ORDER BY created_at DESC").fetchall()
+        return [_client_payload(row) for row in rows]
 
-    def verify_client_token(self, client_id: str, token: str) -> bool:
+    def authenticate_cached(self, client_id: str, token: str) -> dict | None:
+        record = self.auth_cache.get(client_id, self.hash_token(token))
+        if record is not None:
+            self._touch(client_id)
+        return record
+
+    def authenticate_client(self, client_id: str, token: str) -> dict | None:
+        return self.authenticate_cached(client_id, token) or self.authenticate_from_db(client_id, token)
+
+    def authenticate_from_db(self, client_id: str, token: str) -> dict | None:
         token_hash = self.hash_token(token)
-        now = utc_now_iso()
         with self.db.connect() as conn:
             row = conn.execute(
-                "SELECT token_hash FROM clients WHERE client_id = ?",
+                f"SELECT {CLIENT_COLUMNS}, token_hash FROM clients WHERE client_id = ?",
                 (client_id,),
             ).fetchone()
-            if not row or row["token_hash"] != token_hash:
-                return False
-            conn.execute("UPDATE clients SET last_seen_at = ? WHERE client_id = ?", (now, client_id))
-            return True
+        if not row or not hmac.compare_digest(row["token_hash"], token_hash):
+            return None
+        record = _client_payload(row)
+        record.pop("token_hash")
+        self.auth_cache.put(client_id, token_hash, record)
+        self._touch(client_id)
+        return record
+
+    def verify_client_token(self, client_id: str, token: str) -> bool:
+        return self.authenticate_client(client_id, token) is not None
+
+    def _touch(self, client_id: str) -> None:
+        if self.last_seen_buffer is not None:
+            self.last_seen_buffer.touch(client_id, utc_now_iso())
+        else:
+            self.record_last_seen({client_id: utc_now_iso()})
+
+    def record_last_seen(self, seen: dict[str, str]) -> None:
+        with self.db.connect() as conn:
+            conn.executemany(
+                "UPDATE clients SET last_seen_at = ? WHERE client_id = ?",
+                [(seen_at, client_id) for client_id, seen_at in seen.items()],
+            )
 
     def get_client(self, client_id: str) -> dict | None:
         with self.db.connect() as conn:
-            row = conn.execute(
-                "SELECT client_id, name, preferences_json, is_primary, created_at, last_seen_at FROM clients WHERE client_id = ?",
-                (client_id,),
-            ).fetchone()
-        if not row:
+            row = conn.execute(f"SELECT {CLIENT_COLUMNS} FROM clients WHERE client_id = ?", (client_id,)).fetchone()
+        return _client_payload(row) if row else None
+
+    def cached_primary_client(self) -> dict | None:
+        primary = self._primary_client
+        if primary is None:
             return None
-        payload = dict(row)
-        payload["preferences"] = json.loads(payload.pop("preferences_json") or "{}")
-        payload["is_primary"] = bool(payload["is_primary"])
-        return payload
+        return {**primary, "preferences": dict(primary["preferences"])}
 
     def get_primary_client(self) -> dict | None:
+        cached = self.cached_primary_client()
+        if cached is not None:
+            return cached
+        generation = self._primary_generation
         with self.db.connect() as conn:
-            row = conn.execute(
-                "SELECT client_id, name, preferences_json, is_primary, created_at, last_seen_at FROM clients WHERE is_primary = 1 LIMIT 1"
-            ).fetchone()
+            row = conn.execute(f"SELECT {CLIENT_COLUMNS} FROM clients WHERE is_primary = 1 LIMIT 1").fetchone()
         if not row:
             return None
-        payload = dict(row)
-        payload["preferences"] = json.loads(payload.pop("preferences_json") or "{}")
-        payload["is_primary"] = bool(payload["is_primary"])
-        return payload
+        primary = _client_payload(row)
+        # Skip caching if the primary changed while this read was in flight.
+        if generation == self._primary_generation:
+            self._primary_client = primary
+        return {**primary, "preferences": dict(primary["preferences"])}
+
+    def _forget_primary_client(self) -> None:
+        self._primary_generation += 1
+        self._primary_client = None
 
     def update_preferences(self, client_id: str, preferences: dict) -> dict | None:
         preferences_json = json.dumps(preferences, sort_keys=True)
@@ -99,4 +144,8 @@ class ClientsRepository:
                 "UPDATE clients SET preferences_json = ? WHERE client_id = ?",
                 (preferences_json, client_id),
             )
+        self.auth_cache.invalidate_client(client_id)
+        # Always bump the generation: a primary read already in flight must not cache
+        # the old preferences, even when nothing is cached yet.
+        self._forget_primary_client()
         return self.get_client(client_id)
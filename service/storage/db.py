@@ -1,7 +1,12 @@
+import os
 import sqlite3
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
 from pathlib import Path
 
 from service.config import settings
+from service.storage.migrations import migrate
 
 
 def utc_now_iso() -> str:
@@ -10,102 +15,146 @@ def utc_now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
+class SQLiteConnectionPool:
+    def __init__(
+        self,
+        db_path: str,
+        *,
+        max_connections: int,
+        timeout_seconds: float,
+        statement_cache_size: int,
+        mmap_size_bytes: int,
+        cache_size_kib: int,
+    ):
+        self.db_path = db_path
+        self.max_connections = max(1, max_connections)
+        self.timeout_seconds = timeout_seconds
+        self.statement_cache_size = statement_cache_size
+        self.mmap_size_bytes = mmap_size_bytes
+        self.cache_size_kib = cache_size_kib
+        self._idle: list[sqlite3.Connection] = []
+        self._all: set[sqlite3.Connection] = set()
+        self._available = threading.Condition()
+        self._local = threading.local()
+        self.connections_opened = 0
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout_seconds,
+            check_same_thread=False,
+            cached_statements=self.statement_cache_size,
+        )
+        conn.row_factory = sqlite3.Row
+        # Only takes effect while the file is still empty (it must precede the WAL switch),
+        # so new databases start in incremental mode; existing files keep their mode
+        # until StorageMaintenance.enable_incremental_vacuum() converts them.
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size_bytes)}")
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_size_kib)}")
+        self.connections_opened += 1
+        return conn
+
+    def _checkout(self) -> sqlite3.Connection:
+        preferred = getattr(self._local, "preferred", None)
+        with self._available:
+            while True:
+                if preferred is not None and preferred in self._idle:
+                    self._idle.remove(preferred)
+                    return preferred
+                if self._idle:
+                    conn = self._idle.pop()
+                    self._local.preferred = conn
+                    return conn
+                if len(self._all) < self.max_connections:
+                    conn = self._open()
+                    self._all.add(conn)
+                    self._local.preferred = conn
+                    return conn
+                if not self._available.wait(timeout=self.timeout_seconds):
+                    raise sqlite3.OperationalError(
+                        f"Timed out waiting for a pooled SQLite connection to {self.db_path}"
+                    )
+
+    def _checkin(self, conn: sqlite3.Connection) -> None:
+        with self._available:
+            if conn in self._all:
+                self._idle.append(conn)
+                self._available.notify()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        held = getattr(self._local, "held", None)
+        if held is not None:
+            # Nested use on the same thread joins the outer transaction.
+            yield held
+            return
+
+        conn = self._checkout()
+        self._local.held = conn
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._local.held = None
+            self._checkin(conn)
+
+    def close(self) -> None:
+        with self._available:
+            for conn in self._idle:
+                conn.close()
+            self._all.difference_update(self._idle)
+            self._idle.clear()
+
+
+_pools: dict[str, SQLiteConnectionPool] = {}
+_pools_lock = threading.Lock()
+_migrated_paths: set[str] = set()
+_migration_lock = threading.Lock()
+
+
+def get_pool(db_path: str) -> SQLiteConnectionPool:
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = SQLiteConnectionPool(
+                db_path,
+                max_connections=settings.SQLITE_POOL_SIZE,
+                timeout_seconds=settings.SQLITE_TIMEOUT_SECONDS,
+                statement_cache_size=settings.SQLITE_STATEMENT_CACHE_SIZE,
+                mmap_size_bytes=settings.SQLITE_MMAP_SIZE_BYTES,
+                cache_size_kib=settings.SQLITE_CACHE_SIZE_KIB,
+            )
+            _pools[key] = pool
+        return pool
+
+
+def ensure_schema(db_path: str, pool: SQLiteConnectionPool) -> None:
+    key = os.path.abspath(db_path)
+    if key in _migrated_paths:
+        return
+    with _migration_lock:
+        if key in _migrated_paths:
+            return
+        with pool.connection() as conn:
+            migrate(conn)
+        _migrated_paths.add(key)
+
+
 class SQLiteDB:
     def __init__(self, db_path: str | None = None):
         self.db_path = db_path or settings.SQLITE_PATH
         self.timeout_seconds = settings.SQLITE_TIMEOUT_SECONDS
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.pool = get_pool(self.db_path)
         self.initialize()
 
-    def connect(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path, timeout=self.timeout_seconds)
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA journal_mode = WAL")
-        conn.execute("PRAGMA foreign_keys = ON")
-        return conn
+    def connect(self):
+        return self.pool.connection()
 
     def initialize(self) -> None:
-        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
-        with self.connect() as conn:
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS messages (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    client_id TEXT,
-                    conversation_id TEXT NOT NULL,
-                    role TEXT NOT NULL,
-                    content TEXT NOT NULL,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-                """
-            )
-            message_columns = {
-                row["name"] for row in conn.execute("PRAGMA table_info(messages)").fetchall()
-            }
-            if "client_id" not in message_columns:
-                conn.execute("ALTER TABLE messages ADD COLUMN client_id TEXT")
-            conn.execute(
-                """
-                CREATE INDEX IF NOT EXISTS idx_messages_conversation_id_id
-                ON messages (conversation_id, id)
-                """
-            )
-            conn.execute(
-                """
-                CREATE INDEX IF NOT EXISTS idx_messages_client_conversation_id_id
-                ON messages (client_id, conversation_id, id)
-                """
-            )
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS clients (
-                    client_id TEXT PRIMARY KEY,
-                    name TEXT,
-                    token_hash TEXT NOT NULL,
-                    preferences_json TEXT NOT NULL DEFAULT '{}',
-                    is_primary INTEGER NOT NULL DEFAULT 0,
-                    created_at TEXT NOT NULL,
-                    last_seen_at TEXT
-                )
-                """
-            )
-            client_columns = {
-                row["name"] for row in conn.execute("PRAGMA table_info(clients)").fetchall()
-            }
-            if "preferences_json" not in client_columns:
-                conn.execute("ALTER TABLE clients ADD COLUMN preferences_json TEXT NOT NULL DEFAULT '{}'")
-            if "is_primary" not in client_columns:
-                conn.execute("ALTER TABLE clients ADD COLUMN is_primary INTEGER NOT NULL DEFAULT 0")
-            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_clients_is_primary ON clients(is_primary) WHERE is_primary = 1")
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS bots (
-                    bot_id TEXT PRIMARY KEY,
-                    owner_client_id TEXT NOT NULL,
-                    bot_type TEXT NOT NULL,
-                    config_json TEXT NOT NULL,
-                    status TEXT NOT NULL,
-                    created_at TEXT NOT NULL,
-                    updated_at TEXT NOT NULL,
-                    FOREIGN KEY(owner_client_id) REFERENCES clients(client_id)
-                )
-                """
-            )
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS bot_events (
-                    event_id TEXT PRIMARY KEY,
-                    bot_id TEXT NOT NULL,
-                    owner_client_id TEXT NOT NULL,
-                    event_type TEXT NOT NULL,
-                    message TEXT,
-                    created_at TEXT NOT NULL,
-                    payload_json TEXT,
-                    FOREIGN KEY(bot_id) REFERENCES bots(bot_id),
-                    FOREIGN KEY(owner_client_id) REFERENCES clients(client_id)
-                )
-                """
-            )
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_bots_owner_client_id ON bots (owner_client_id)")
-            conn.execute(
-                "CREATE INDEX IF NOT EXISTS idx_bot_events_bot_id_created_at ON bot_events (bot_id, created_at)"
-            )
+        ensure_schema(self.db_path, self.pool)
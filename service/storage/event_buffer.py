@@ -0,0 +1,151 @@
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+
+from service.storage.bot_events_repo import BotEventsRepository
+
+logger = logging.getLogger(__name__)
+
+FlushListener = Callable[[list[dict]], None]
+
+# Attempts per event once its batch has failed; constraint violations are not retried.
+ROW_WRITE_ATTEMPTS = 3
+ROW_RETRY_BACKOFF_SECONDS = 0.05
+
+
+class GroupCommitEventBuffer:
+    def __init__(
+        self,
+        events_repo: BotEventsRepository,
+        *,
+        max_pending: int = 10000,
+        batch_size: int = 256,
+        flush_interval_seconds: float = 0.2,
+    ):
+        self.events_repo = events_repo
+        self.max_pending = max(1, max_pending)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval_seconds = flush_interval_seconds
+        self.listeners: list[FlushListener] = []
+        self.flush_count = 0
+        self.flushed_events = 0
+        self.dropped_events = 0
+        self._pending: deque[dict] = deque()
+        self._wakeup = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._closed = False
+        events_repo.write_buffer = self
+
+    def add_listener(self, listener: FlushListener) -> None:
+        self.listeners.append(listener)
+
+    def pending_count(self) -> int:
+        with self._wakeup:
+            return len(self._pending)
+
+    def submit(self, event: dict) -> None:
+        with self._wakeup:
+            if self._closed:
+                closed = True
+            else:
+                closed = False
+                self._pending.append(event)
+                full = len(self._pending) >= self.max_pending
+                if len(self._pending) == 1 or len(self._pending) >= self.batch_size:
+                    self._wakeup.notify()
+                self._ensure_flusher()
+        # Never raise into the producer: rows that cannot be written are logged and dropped.
+        if closed:
+            self._write_each([event])
+        elif full:
+            # Backpressure: a producer that fills the buffer pays for the flush.
+            try:
+                self.flush()
+            except Exception:  # noqa: BLE001
+                logger.exception("Failed to flush buffered bot events")
+
+    def flush(self) -> int:
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._wakeup:
+                    if not self._pending:
+                        return written
+                    batch = list(self._pending)
+                    self._pending.clear()
+                try:
+                    self._write(batch)
+                    written += len(batch)
+                except Exception:  # noqa: BLE001
+                    # One bad row (e.g. an event for a deleted bot) must not wedge the
+                    # queue; fall back to writing the batch row by row.
+                    logger.warning("Bot event batch of %s failed; retrying row by row", len(batch), exc_info=True)
+                    written += self._write_each(batch)
+
+    def _write_each(self, batch: list[dict]) -> int:
+        written = 0
+        for event in batch:
+            for attempt in range(1, ROW_WRITE_ATTEMPTS + 1):
+                try:
+                    self._write([event])
+                    written += 1
+                    break
+                except Exception as exc:  # noqa: BLE001
+                    if isinstance(exc, sqlite3.IntegrityError) or attempt == ROW_WRITE_ATTEMPTS:
+                        self.dropped_events += 1
+                        logger.error(
+                            "Dropping bot event %s for bot %s: %s",
+                            event.get("event_id"),
+                            event.get("bot_id"),
+                            exc,
+                        )
+                        break
+                    time.sleep(ROW_RETRY_BACKOFF_SECONDS * attempt)
+        return written
+
+    def close(self) -> None:
+        with self._wakeup:
+            self._closed = True
+            self._wakeup.notify_all()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=max(1.0, self.flush_interval_seconds * 5))
+        self.flush()
+
+    def _write(self, batch: list[dict]) -> None:
+        self.events_repo.add_events(batch)
+        self.flush_count += 1
+        self.flushed_events += len(batch)
+        for listener in self.listeners:
+            try:
+                listener(batch)
+            except Exception:  # noqa: BLE001
+                logger.exception("Bot event flush listener failed")
+
+    def _ensure_flusher(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="orty-event-flusher", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._wakeup:
+                while not self._closed and not self._pending:
+                    self._wakeup.wait()
+                deadline = time.monotonic() + self.flush_interval_seconds
+                while not self._closed and len(self._pending) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._wakeup.wait(timeout=remaining)
+                closed = self._closed
+            try:
+                self.flush()
+            except Exception:  # noqa: BLE001
+                logger.exception("Failed to flush buffered bot events")
+            if closed:
+                return
@@ -0,0 +1,43 @@
+import asyncio
+import functools
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+class DBExecutor:
+    # Reads fan out over a small pool; writes are serialized on one thread so
+    # they never compete with each other for the WAL lock. The pools are created
+    # on first use, so the executor can be used again after `shutdown()`.
+    def __init__(self, reader_threads: int = 4):
+        self.reader_threads = max(1, reader_threads)
+        self._readers: ThreadPoolExecutor | None = None
+        self._writer: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def _pools(self) -> tuple[ThreadPoolExecutor, ThreadPoolExecutor]:
+        with self._lock:
+            if self._readers is None or self._writer is None:
+                self._readers = ThreadPoolExecutor(max_workers=self.reader_threads, thread_name_prefix="orty-db-read")
+                self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="orty-db-write")
+            return self._readers, self._writer
+
+    async def read(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pools()[0], functools.partial(fn, *args, **kwargs))
+
+    async def write(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pools()[1], functools.partial(fn, *args, **kwargs))
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            readers, writer = self._readers, self._writer
+            self._readers = self._writer = None
+        if readers is not None:
+            readers.shutdown(wait=wait)
+        if writer is not None:
+            writer.shutdown(wait=wait)
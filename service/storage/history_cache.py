@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+
+# Rough per-message bookkeeping cost on top of the content itself.
+MESSAGE_OVERHEAD_BYTES = 64
+
+
+class HistoryWindowCache:
+    # LRU of the most recent `window` messages per (client_id, conversation_id),
+    # bounded by an approximate total byte size. Entries are (id, role, content).
+    def __init__(self, max_bytes: int, window: int = 50):
+        self.max_bytes = max(0, max_bytes)
+        self.window = max(1, window)
+        self._entries: OrderedDict[tuple[str, str], dict] = OrderedDict()
+        self._bytes = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def _size(messages: list[tuple[int, str, str]]) -> int:
+        return sum(len(content) + MESSAGE_OVERHEAD_BYTES for _, _, content in messages)
+
+    def generation(self) -> int:
+        # Readers capture this before querying; a write in between makes their fill stale.
+        with self._lock:
+            return self._generation
+
+    def get(self, key: tuple[str, str], limit: int, after_id: int | None = None) -> list[tuple[int, str, str]] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                messages = entry["messages"]
+                if after_id is not None:
+                    covers_gap = not messages or messages[0][0] <= after_id
+                    messages = [message for message in messages if message[0] > after_id]
+                else:
+                    covers_gap = False
+                if len(messages) >= limit or entry["complete"] or covers_gap:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return messages[-limit:]
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple[str, str], messages: list[tuple[int, str, str]], complete: bool, generation: int) -> None:
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._store(key, {"messages": list(messages[-self.window:]), "complete": complete})
+
+    def append(self, key: tuple[str, str], messages: list[tuple[int, str, str]]) -> None:
+        with self._lock:
+            self._generation += 1
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            # A reader may have filled the window after the writer committed; rows it
+            # already holds must not be appended twice.
+            last_id = entry["messages"][-1][0] if entry["messages"] else 0
+            combined = entry["messages"] + [message for message in messages if message[0] > last_id]
+            complete = entry["complete"] and len(combined) <= self.window
+            self._store(key, {"messages": combined[-self.window:], "complete": complete})
+
+    def invalidate(self, key: tuple[str, str]) -> None:
+        with self._lock:
+            self._generation += 1
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry["size"]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def _store(self, key: tuple[str, str], entry: dict) -> None:
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous["size"]
+        entry["size"] = self._size(entry["messages"])
+        if entry["size"] > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self._bytes += entry["size"]
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted["size"]
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,241 @@
+import asyncio
+import gzip
+import json
+import logging
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from service.config import settings
+from service.storage.db import SQLiteDB
+
+logger = logging.getLogger(__name__)
+
+# messages.created_at uses SQLite's CURRENT_TIMESTAMP format, bot_events uses ISO-8601.
+SQLITE_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+INCREMENTAL_AUTO_VACUUM = 2
+
+
+def _positive_or_none(value: object) -> float | None:
+    try:
+        parsed = float(value)
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed > 0 else None
+
+
+def _rule(raw: dict | None) -> dict:
+    raw = raw or {}
+    max_rows = _positive_or_none(raw.get("max_rows"))
+    return {
+        "max_age_days": _positive_or_none(raw.get("max_age_days")),
+        "max_rows": int(max_rows) if max_rows else None,
+    }
+
+
+class RetentionPolicy:
+    def __init__(
+        self,
+        messages: dict | None = None,
+        bot_events: dict | None = None,
+        client_overrides: dict[str, dict] | None = None,
+        bot_type_overrides: dict[str, dict] | None = None,
+    ):
+        self.messages = _rule(messages)
+        self.bot_events = _rule(bot_events)
+        self.client_overrides = {client_id: _rule(rule) for client_id, rule in (client_overrides or {}).items()}
+        self.bot_type_overrides = {bot_type: _rule(rule) for bot_type, rule in (bot_type_overrides or {}).items()}
+
+    @classmethod
+    def from_settings(cls) -> "RetentionPolicy":
+        overrides = json.loads(settings.RETENTION_OVERRIDES_JSON or "{}")
+        return cls(
+            messages={
+                "max_age_days": settings.RETENTION_MESSAGES_MAX_AGE_DAYS,
+                "max_rows": settings.RETENTION_MESSAGES_MAX_ROWS_PER_CLIENT,
+            },
+            bot_events={
+                "max_age_days": settings.RETENTION_BOT_EVENTS_MAX_AGE_DAYS,
+                "max_rows": settings.RETENTION_BOT_EVENTS_MAX_ROWS_PER_BOT,
+            },
+            client_overrides=overrides.get("clients"),
+            bot_type_overrides=overrides.get("bot_types"),
+        )
+
+    def is_enabled(self) -> bool:
+        rules = [self.messages, self.bot_events, *self.client_overrides.values(), *self.bot_type_overrides.values()]
+        return any(rule["max_age_days"] or rule["max_rows"] for rule in rules)
+
+    def for_client(self, client_id: str | None) -> dict:
+        return self.client_overrides.get(client_id or "", self.messages)
+
+    def for_bot_type(self, bot_type: str) -> dict:
+        return self.bot_type_overrides.get(bot_type, self.bot_events)
+
+
+class StorageMaintenance:
+    def __init__(
+        self,
+        db: SQLiteDB,
+        policy: RetentionPolicy,
+        *,
+        batch_size: int = 500,
+        archive_dir: str | None = None,
+        vacuum_pages: int = 1000,
+        pause_seconds: float = 0.0,
+        on_messages_pruned: Callable[[], None] | None = None,
+    ):
+        self.db = db
+        self.policy = policy
+        self.batch_size = max(1, batch_size)
+        self.archive_dir = Path(archive_dir) if archive_dir else None
+        self.vacuum_pages = vacuum_pages
+        self.pause_seconds = pause_seconds
+        self.on_messages_pruned = on_messages_pruned
+
+    @classmethod
+    def from_settings(cls, db: SQLiteDB, on_messages_pruned: Callable[[], None] | None = None) -> "StorageMaintenance":
+        return cls(
+            db,
+            RetentionPolicy.from_settings(),
+            batch_size=settings.RETENTION_BATCH_SIZE,
+            archive_dir=settings.RETENTION_ARCHIVE_DIR or None,
+            vacuum_pages=settings.RETENTION_VACUUM_PAGES,
+            pause_seconds=settings.RETENTION_BATCH_PAUSE_MS / 1000,
+            on_messages_pruned=on_messages_pruned,
+        )
+
+    def run_once(self, now: datetime | None = None) -> dict:
+        now = now or datetime.now(timezone.utc)
+        pruned_messages = self.prune_messages(now)
+        pruned_events = self.prune_bot_events(now)
+        if pruned_messages and self.on_messages_pruned is not None:
+            self.on_messages_pruned()
+        vacuumed = self.incremental_vacuum() if pruned_messages or pruned_events else 0
+        return {"messages": pruned_messages, "bot_events": pruned_events, "vacuumed_pages": vacuumed}
+
+    async def run_forever(self, interval_seconds: float) -> None:
+        while True:
+            try:
+                result = await asyncio.to_thread(self.run_once)
+                if result["messages"] or result["bot_events"]:
+                    logger.info("Storage maintenance pruned %s", result)
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # noqa: BLE001
+                logger.exception("Storage maintenance cycle failed")
+            await asyncio.sleep(interval_seconds)
+
+    def prune_messages(self, now: datetime) -> int:
+        with self.db.connect() as conn:
+            client_ids = [row[0] for row in conn.execute("SELECT DISTINCT client_id FROM messages").fetchall()]
+
+        pruned = 0
+        for client_id in client_ids:
+            rule = self.policy.for_client(client_id)
+            if rule["max_age_days"]:
+                cutoff = (now - timedelta(days=rule["max_age_days"])).strftime(SQLITE_TIMESTAMP_FORMAT)
+                pruned += self._prune("messages", "client_id IS ? AND created_at < ?", (client_id, cutoff))
+            if rule["max_rows"]:
+                with self.db.connect() as conn:
+                    row = conn.execute(
+                        "SELECT id FROM messages WHERE client_id IS ? ORDER BY id DESC LIMIT 1 OFFSET ?",
+                        (client_id, rule["max_rows"]),
+                    ).fetchone()
+                if row:
+                    pruned += self._prune("messages", "client_id IS ? AND id <= ?", (client_id, row[0]))
+        return pruned
+
+    def prune_bot_events(self, now: datetime) -> int:
+        with self.db.connect() as conn:
+            bots = conn.execute("SELECT bot_id, bot_type FROM bots").fetchall()
+
+        pruned = 0
+        for bot_id, bot_type in bots:
+            rule = self.policy.for_bot_type(bot_type)
+            if rule["max_age_days"]:
+                cutoff = (now - timedelta(days=rule["max_age_days"])).isoformat()
+                pruned += self._prune("bot_events", "bot_id = ? AND created_at < ?", (bot_id, cutoff))
+            if rule["max_rows"]:
+                with self.db.connect() as conn:
+                    row = conn.execute(
+                        """
+                        SELECT seq FROM bot_events
+                        WHERE bot_id = ?
+                        ORDER BY seq DESC
+                        LIMIT 1 OFFSET ?
+                        """,
+                        (bot_id, rule["max_rows"]),
+                    ).fetchone()
+                if row:
+                    pruned += self._prune("bot_events", "bot_id = ? AND seq <= ?", (bot_id, row[0]))
+        return pruned
+
+    def _prune(self, table: str, where: str, params: tuple) -> int:
+        pruned = 0
+        while True:
+            # One short transaction per batch keeps the WAL write lock brief.
+            with self.db.connect() as conn:
+                rows = conn.execute(
+                    f"SELECT rowid AS _rowid, * FROM {table} WHERE {where} ORDER BY rowid LIMIT ?",
+                    (*params, self.batch_size),
+                ).fetchall()
+                if not rows:
+                    return pruned
+                if self.archive_dir is not None:
+                    self._archive(table, rows)
+                conn.executemany(f"DELETE FROM {table} WHERE rowid = ?", [(row["_rowid"],) for row in rows])
+            pruned += len(rows)
+            if len(rows) < self.batch_size:
+                return pruned
+            if self.pause_seconds:
+                time.sleep(self.pause_seconds)
+
+    def _archive(self, table: str, rows: list) -> None:
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        day = datetime.now(timezone.utc).strftime("%Y%m%d")
+        path = self.archive_dir / f"{table}-{day}.ndjson.gz"
+        lines = []
+        for row in rows:
+            record = dict(row)
+            record.pop("_rowid", None)
+            lines.append(json.dumps(record, sort_keys=True))
+        # Each append is a separate gzip member; readers see one continuous stream.
+        with gzip.open(path, "at", encoding="utf-8") as handle:
+            handle.write("\n".join(lines) + "\n")
+
+    def enable_incremental_vacuum(self) -> bool:
+        # Explicit, one-off conversion of a database created before incremental mode:
+        # a full VACUUM that rewrites the file under the write lock. Never run by the
+        # scheduled retention job.
+        with self.db.connect() as conn:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == INCREMENTAL_AUTO_VACUUM:
+                return False
+            conn.execute(f"PRAGMA auto_vacuum = {INCREMENTAL_AUTO_VACUUM}")
+            conn.commit()
+            conn.execute("VACUUM")
+            return True
+
+    def incremental_vacuum(self) -> int:
+        with self.db.connect() as conn:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != INCREMENTAL_AUTO_VACUUM:
+                return 0
+            free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if not free_pages:
+                return 0
+            pages = min(free_pages, self.vacuum_pages) if self.vacuum_pages > 0 else free_pages
+            # sqlite3 only steps row-less statements once; executescript runs the pragma to completion.
+            conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+            # Pages released by the vacuum only leave the file once the WAL is checkpointed.
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+            return pages
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] != ["enable-incremental-vacuum"]:
+        sys.exit("Usage: python -m service.storage.maintenance enable-incremental-vacuum")
+    converted = StorageMaintenance.from_settings(SQLiteDB()).enable_incremental_vacuum()
+    print("converted to incremental auto-vacuum" if converted else "already in incremental auto-vacuum mode")
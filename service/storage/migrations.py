@@ -0,0 +1,259 @@
+import sqlite3
+from collections.abc import Callable
+
+Migration = tuple[int, str, Callable[[sqlite3.Connection], None]]
+
+
+def _column_names(conn: sqlite3.Connection, table: str) -> set[str]:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+
+
+def _initial_schema(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_id TEXT,
+            conversation_id TEXT NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    # Databases created before versioned migrations may predate these columns.
+    if "client_id" not in _column_names(conn, "messages"):
+        conn.execute("ALTER TABLE messages ADD COLUMN client_id TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_conversation_id_id ON messages (conversation_id, id)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_messages_client_conversation_id_id ON messages (client_id, conversation_id, id)"
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS clients (
+            client_id TEXT PRIMARY KEY,
+            name TEXT,
+            token_hash TEXT NOT NULL,
+            preferences_json TEXT NOT NULL DEFAULT '{}',
+            is_primary INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL,
+            last_seen_at TEXT
+        )
+        """
+    )
+    client_columns = _column_names(conn, "clients")
+    if "preferences_json" not in client_columns:
+        conn.execute("ALTER TABLE clients ADD COLUMN preferences_json TEXT NOT NULL DEFAULT '{}'")
+    if "is_primary" not in client_columns:
+        conn.execute("ALTER TABLE clients ADD COLUMN is_primary INTEGER NOT NULL DEFAULT 0")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_clients_is_primary ON clients(is_primary) WHERE is_primary = 1")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS bots (
+            bot_id TEXT PRIMARY KEY,
+            owner_client_id TEXT NOT NULL,
+            bot_type TEXT NOT NULL,
+            config_json TEXT NOT NULL,
+            status TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            FOREIGN KEY(owner_client_id) REFERENCES clients(client_id)
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS bot_events (
+            event_id TEXT PRIMARY KEY,
+            bot_id TEXT NOT NULL,
+            owner_client_id TEXT NOT NULL,
+            event_type TEXT NOT NULL,
+            message TEXT,
+            created_at TEXT NOT NULL,
+            payload_json TEXT,
+            FOREIGN KEY(bot_id) REFERENCES bots(bot_id),
+            FOREIGN KEY(owner_client_id) REFERENCES clients(client_id)
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bots_owner_client_id ON bots (owner_client_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bot_events_bot_id_created_at ON bot_events (bot_id, created_at)")
+
+
+def _retention_indexes(conn: sqlite3.Connection) -> None:
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_client_id_id ON messages (client_id, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_created_at ON messages (created_at)")
+
+
+def _bot_events_sequence(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE bot_events_v3 (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_id TEXT NOT NULL UNIQUE,
+            bot_id TEXT NOT NULL,
+            owner_client_id TEXT NOT NULL,
+            event_type TEXT NOT NULL,
+            message TEXT,
+            created_at TEXT NOT NULL,
+            payload_json TEXT,
+            FOREIGN KEY(bot_id) REFERENCES bots(bot_id),
+            FOREIGN KEY(owner_client_id) REFERENCES clients(client_id)
+        )
+        """
+    )
+    conn.execute(
+        """
+        INSERT INTO bot_events_v3 (event_id, bot_id, owner_client_id, event_type, message, created_at, payload_json)
+        SELECT event_id, bot_id, owner_client_id, event_type, message, created_at, payload_json
+        FROM bot_events
+        ORDER BY created_at, rowid
+        """
+    )
+    conn.execute("DROP TABLE bot_events")
+    conn.execute("ALTER TABLE bot_events_v3 RENAME TO bot_events")
+    conn.execute("CREATE INDEX idx_bot_events_bot_id_seq ON bot_events (bot_id, seq)")
+    conn.execute("CREATE INDEX idx_bot_events_bot_id_event_type_seq ON bot_events (bot_id, event_type, seq)")
+    conn.execute("CREATE INDEX idx_bot_events_bot_id_created_at ON bot_events (bot_id, created_at)")
+
+
+def _messages_full_text_search(conn: sqlite3.Connection) -> None:
+    # client_scope folds client_id into a single FTS token so searches intersect
+    # posting lists per client instead of ranking every client's matches.
+    conn.execute(
+        """
+        CREATE VIEW messages_fts_source AS
+        SELECT id, content, 'c' || replace(coalesce(client_id, ''), '-', '') AS client_scope
+        FROM messages
+        """
+    )
+    conn.execute(
+        """
+        CREATE VIRTUAL TABLE messages_fts USING fts5(
+            content,
+            client_scope,
+            content='messages_fts_source',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER messages_fts_after_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts (rowid, content, client_scope)
+            VALUES (new.id, new.content, 'c' || replace(coalesce(new.client_id, ''), '-', ''));
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER messages_fts_after_delete AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, content, client_scope)
+            VALUES ('delete', old.id, old.content, 'c' || replace(coalesce(old.client_id, ''), '-', ''));
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER messages_fts_after_update AFTER UPDATE OF content, client_id ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, content, client_scope)
+            VALUES ('delete', old.id, old.content, 'c' || replace(coalesce(old.client_id, ''), '-', ''));
+            INSERT INTO messages_fts (rowid, content, client_scope)
+            VALUES (new.id, new.content, 'c' || replace(coalesce(new.client_id, ''), '-', ''));
+        END
+        """
+    )
+    # Backfill the index from rows written before this migration.
+    conn.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+
+
+def _messages_token_estimate(conn: sqlite3.Connection) -> None:
+    conn.execute("ALTER TABLE messages ADD COLUMN token_estimate INTEGER")
+    # Same heuristic as service.memory.estimate_tokens (~4 characters per token).
+    conn.execute("UPDATE messages SET token_estimate = MAX(1, (length(content) + 3) / 4)")
+
+
+def _conversation_summaries(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE conversation_summaries (
+            client_id TEXT NOT NULL DEFAULT '',
+            conversation_id TEXT NOT NULL,
+            summary TEXT NOT NULL,
+            high_water_message_id INTEGER NOT NULL,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (client_id, conversation_id)
+        )
+        """
+    )
+
+
+def _response_cache(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE response_cache (
+            cache_key TEXT PRIMARY KEY,
+            provider TEXT NOT NULL,
+            model TEXT,
+            reply TEXT NOT NULL,
+            size_bytes INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            last_hit_at REAL NOT NULL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX idx_response_cache_expires_at ON response_cache(expires_at)")
+    conn.execute("CREATE INDEX idx_response_cache_last_hit_at ON response_cache(last_hit_at)")
+
+
+def _github_cache(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE github_cache (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            body TEXT NOT NULL,
+            validated_at REAL NOT NULL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX idx_github_cache_validated_at ON github_cache(validated_at)")
+
+
+# Append new steps with the next version number; never edit a released step.
+MIGRATIONS: list[Migration] = [
+    (1, "initial schema", _initial_schema),
+    (2, "retention indexes", _retention_indexes),
+    (3, "bot event sequence", _bot_events_sequence),
+    (4, "messages full-text search", _messages_full_text_search),
+    (5, "messages token estimate", _messages_token_estimate),
+    (6, "conversation summaries", _conversation_summaries),
+    (7, "response cache", _response_cache),
+    (8, "github cache", _github_cache),
+]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection, migrations: list[Migration] | None = None) -> list[int]:
+    applied: list[int] = []
+    for version, _, step in sorted(migrations or MIGRATIONS, key=lambda migration: migration[0]):
+        if version <= schema_version(conn):
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have applied the step while we waited for the lock.
+            if version > schema_version(conn):
+                step(conn)
+                conn.execute(f"PRAGMA user_version = {int(version)}")
+                applied.append(version)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    return applied
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import os
+import re
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from service.embeddings import Embedder
+
+ID_DTYPE = np.dtype("<i8")
+VECTOR_DTYPE = np.dtype("<f4")
+
+
+class VectorIndex:
+    # Each client gets an append-only `<key>.<embedder>-<dims>.f32` file of normalized
+    # float32 rows plus a matching `.ids` file of ascending message ids; the last id is
+    # the indexing high-water mark.
+    def __init__(self, directory: str | os.PathLike, embedder: Embedder):
+        self.directory = Path(directory)
+        self.embedder = embedder
+        self._lock = threading.Lock()
+        self._client_locks: dict[str, threading.RLock] = {}
+
+    def client_lock(self, client_id: str | None) -> threading.RLock:
+        # Serializes high-water read, embedding and append for one client's files.
+        with self._lock:
+            return self._client_locks.setdefault(client_id or "", threading.RLock())
+
+    def _paths(self, client_id: str | None) -> tuple[Path, Path]:
+        key = re.sub(r"[^A-Za-z0-9_-]", "_", client_id or "anonymous")
+        stem = f"{key}.{self.embedder.name}-{self.embedder.ensure_dimensions()}"
+        return self.directory / f"{stem}.f32", self.directory / f"{stem}.ids"
+
+    def _row_count(self, vectors_path: Path, ids_path: Path) -> int:
+        if not vectors_path.exists() or not ids_path.exists():
+            return 0
+        row_bytes = self.embedder.dimensions * VECTOR_DTYPE.itemsize
+        rows = min(vectors_path.stat().st_size // row_bytes, ids_path.stat().st_size // ID_DTYPE.itemsize)
+        # A crash between the two appends leaves one file longer; trim it back.
+        if vectors_path.stat().st_size != rows * row_bytes:
+            os.truncate(vectors_path, rows * row_bytes)
+        if ids_path.stat().st_size != rows * ID_DTYPE.itemsize:
+            os.truncate(ids_path, rows * ID_DTYPE.itemsize)
+        return rows
+
+    def high_water(self, client_id: str | None) -> int:
+        vectors_path, ids_path = self._paths(client_id)
+        with self._lock:
+            rows = self._row_count(vectors_path, ids_path)
+            if not rows:
+                return 0
+            with ids_path.open("rb") as handle:
+                handle.seek((rows - 1) * ID_DTYPE.itemsize)
+                return int(np.frombuffer(handle.read(ID_DTYPE.itemsize), dtype=ID_DTYPE)[0])
+
+    def add(self, client_id: str | None, message_ids: list[int], texts: list[str]) -> int:
+        with self.client_lock(client_id):
+            # Ids must stay strictly ascending; anything at or below the mark is already indexed.
+            high_water = self.high_water(client_id)
+            fresh_ids, fresh_texts = [], []
+            for message_id, text in zip(message_ids, texts):
+                if message_id > high_water:
+                    fresh_ids.append(message_id)
+                    fresh_texts.append(text)
+                    high_water = message_id
+            if not fresh_ids:
+                return 0
+            vectors = np.ascontiguousarray(self.embedder.embed(fresh_texts), dtype=VECTOR_DTYPE)
+            vectors_path, ids_path = self._paths(client_id)
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with self._lock:
+                self._row_count(vectors_path, ids_path)
+                with vectors_path.open("ab") as handle:
+                    handle.write(vectors.tobytes())
+                with ids_path.open("ab") as handle:
+                    handle.write(np.asarray(fresh_ids, dtype=ID_DTYPE).tobytes())
+            return len(fresh_ids)
+
+    def search(self, client_id: str | None, query_vector: np.ndarray, k: int) -> list[tuple[int, float]]:
+        vectors_path, ids_path = self._paths(client_id)
+        with self._lock:
+            rows = self._row_count(vectors_path, ids_path)
+        if not rows or k <= 0:
+            return []
+        dims = self.embedder.dimensions
+        matrix = np.memmap(vectors_path, dtype=VECTOR_DTYPE, mode="r", shape=(rows, dims))
+        ids = np.memmap(ids_path, dtype=ID_DTYPE, mode="r", shape=(rows,))
+        # Vectors are stored L2-normalized, so the dot product is the cosine similarity.
+        scores = matrix @ query_vector
+        k = min(k, rows)
+        top = np.argpartition(scores, rows - k)[rows - k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(int(ids[index]), float(scores[index])) for index in top]
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from functools import partial
+
+from service.config import settings
+from service.provider_chain import is_provider_error
+from service.storage.async_repos import AsyncMemoryStore
+
+logger = logging.getLogger(__name__)
+
+SummarizeFn = Callable[[str], Awaitable[str]]
+SUMMARY_PROMPT = (
+    "Update the running summary of this conversation. Keep facts, decisions, names, "
+    "preferences and open questions; drop small talk. Reply with the summary only, "
+    "in at most 200 words.\n\n"
+    "Current summary:\n{summary}\n\n"
+    "New messages:\n{transcript}"
+)
+SUMMARY_MESSAGE_PREFIX = "Summary of the earlier conversation:\n"
+
+
+def summary_history_message(summary: str) -> dict[str, str]:
+    return {"role": "system", "content": SUMMARY_MESSAGE_PREFIX + summary}
+
+
+class ConversationSummarizer:
+    def __init__(
+        self,
+        memory_store: AsyncMemoryStore,
+        summarize: SummarizeFn,
+        *,
+        enabled: bool = True,
+        trigger_messages: int = 24,
+        keep_recent_messages: int = 8,
+        max_input_chars: int = 12000,
+    ):
+        self.memory_store = memory_store
+        self.summarize = summarize
+        self.enabled = enabled
+        self.trigger_messages = max(1, trigger_messages)
+        self.keep_recent_messages = max(0, keep_recent_messages)
+        self.max_input_chars = max(1, max_input_chars)
+        self._tasks: dict[tuple[str, str], asyncio.Task] = {}
+        self._rerun: set[tuple[str, str]] = set()
+
+    @classmethod
+    def from_settings(cls, memory_store: AsyncMemoryStore, summarize: SummarizeFn) -> "ConversationSummarizer":
+        return cls(
+            memory_store,
+            summarize,
+            enabled=settings.SUMMARY_ENABLED,
+            trigger_messages=settings.SUMMARY_TRIGGER_MESSAGES,
+            keep_recent_messages=settings.SUMMARY_KEEP_RECENT_MESSAGES,
+            max_input_chars=settings.SUMMARY_MAX_INPUT_CHARS,
+        )
+
+    def schedule(self, conversation_id: str, client_id: str | None = None) -> asyncio.Task | None:
+        if not self.enabled:
+            return None
+        key = (client_id or "", conversation_id)
+        running = self._tasks.get(key)
+        if running is not None and not running.done():
+            # One pass per conversation at a time; new turns trigger a follow-up pass.
+            self._rerun.add(key)
+            return running
+        task = asyncio.create_task(self._run(key, conversation_id, client_id), name=f"summarize-{conversation_id}")
+        self._tasks[key] = task
+        task.add_done_callback(partial(self._forget, key))
+        return task
+
+    def _forget(self, key: tuple[str, str], task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+    async def _run(self, key: tuple[str, str], conversation_id: str, client_id: str | None) -> None:
+        while True:
+            self._rerun.discard(key)
+            try:
+                progressed = await self.summarize_once(conversation_id, client_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Summarizing conversation %s failed", conversation_id)
+                return
+            # Keep folding while a backlog remains or new turns arrived meanwhile.
+            if not progressed and key not in self._rerun:
+                return
+
+    async def summarize_once(self, conversation_id: str, client_id: str | None = None) -> bool:
+        current = await self.memory_store.get_summary(conversation_id, client_id=client_id)
+        high_water = current["high_water_message_id"] if current else 0
+        pending = await self.memory_store.get_unsummarized_messages(
+            conversation_id,
+            client_id=client_id,
+            after_id=high_water,
+            limit=self.trigger_messages + self.keep_recent_messages,
+        )
+        if len(pending) < self.trigger_messages + self.keep_recent_messages:
+            return False
+
+        fold = pending[: len(pending) - self.keep_recent_messages]
+        lines: list[str] = []
+        used = 0
+        for message in fold:
+            line = f"{message['role']}: {message['content']}"
+            if lines and used + len(line) > self.max_input_chars:
+                break
+            line = line[: self.max_input_chars]
+            lines.append(line)
+            used += len(line)
+            high_water = message["id"]
+
+        prompt = SUMMARY_PROMPT.format(
+            summary=current["summary"] if current else "(none)",
+            transcript="\n".join(lines),
+        )
+        summary = (await self.summarize(prompt)).strip()
+        if not summary:
+            return False
+        if is_provider_error(summary):
+            # Keep the old high-water mark; the turns are folded on a later pass.
+            logger.warning("Summarizing conversation %s failed: %s", conversation_id, summary)
+            return False
+        await self.memory_store.save_summary(conversation_id, summary, high_water, client_id=client_id)
+        return True
+
+    async def close(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._rerun.clear()
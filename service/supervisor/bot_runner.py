@@ -5,31 +5,48 @@ from fastapi import HTTPException
 from service.config import settings
 from service.memory import MemoryStore
 from service.storage.bots_repo import BotsRepository
+from service.storage.executor import DBExecutor
 from service.supervisor.bot_registry import BotRegistry
 from service.supervisor.bot_types import run_automation_extensions_bot, run_code_review_bot, run_codey_bot, run_heartbeat_bot
 from service.supervisor.events import BotEventWriter
 
 
 class BotRunner:
-    def __init__(self, registry: BotRegistry, bots_repo: BotsRepository, event_writer: BotEventWriter, memory_store: MemoryStore):
+    def __init__(
+        self,
+        registry: BotRegistry,
+        bots_repo: BotsRepository,
+        event_writer: BotEventWriter,
+        memory_store: MemoryStore,
+        db_executor: DBExecutor,
+    ):
         self.registry = registry
         self.bots_repo = bots_repo
+        self.db_executor = db_executor
         self.event_writer = event_writer
         self.memory_store = memory_store
         self.tasks: dict[str, asyncio.Task] = {}
 
     async def start_bot(self, bot_id: str) -> dict:
-        bot = self.registry.get_bot(bot_id)
+        # Registry and repository calls hit SQLite, so they run on the DB executor's
+        # pools rather than the event loop.
+        bot = await self.db_executor.read(self.registry.get_bot, bot_id)
         if bot_id in self.tasks and not self.tasks[bot_id].done():
             raise HTTPException(status_code=409, detail="Bot is already running")
         if len([task for task in self.tasks.values() if not task.done()]) >= settings.BOT_RUNNER_MAX_BOTS:
             raise HTTPException(status_code=409, detail="Bot runner capacity reached")
 
         task = self._build_task(bot)
-
-        self.registry.transition(bot_id, "running", "STARTED")
+        # Claimed before awaiting the transition so a concurrent start sees it running.
         self.tasks[bot_id] = task
-        return self.registry.get_bot(bot_id)
+        try:
+            await self.db_executor.write(self.registry.transition, bot_id, "running", "STARTED")
+        except BaseException:
+            task.cancel()
+            if self.tasks.get(bot_id) is task:
+                del self.tasks[bot_id]
+            raise
+        return await self.db_executor.read(self.registry.get_bot, bot_id)
 
     def _build_task(self, bot: dict) -> asyncio.Task:
         if bot["bot_type"] == "heartbeat":
@@ -76,43 +93,43 @@ class BotRunner:
         except asyncio.CancelledError:
             return
         except Exception as exc:  # noqa: BLE001
-            self.bots_repo.update_status(bot_id, "error")
+            await self.db_executor.write(self.bots_repo.update_status, bot_id, "error")
             self.event_writer.emit(bot_id, owner_client_id, "ERROR", message=str(exc))
 
     async def _run_code_review(self, bot_id: str, owner_client_id: str, config: dict) -> None:
         try:
             await run_code_review_bot(bot_id, owner_client_id, config, self.memory_store, self.event_writer)
-            self.bots_repo.update_status(bot_id, "stopped")
+            await self.db_executor.write(self.bots_repo.update_status, bot_id, "stopped")
         except asyncio.CancelledError:
             return
         except Exception as exc:  # noqa: BLE001
-            self.bots_repo.update_status(bot_id, "error")
+            await self.db_executor.write(self.bots_repo.update_status, bot_id, "error")
             self.event_writer.emit(bot_id, owner_client_id, "ERROR", message=str(exc))
 
 
     async def _run_automation_extensions(self, bot_id: str, owner_client_id: str, config: dict) -> None:
         try:
             await run_automation_extensions_bot(bot_id, owner_client_id, config, self.memory_store, self.event_writer)
-            self.bots_repo.update_status(bot_id, "stopped")
+            await self.db_executor.write(self.bots_repo.update_status, bot_id, "stopped")
         except asyncio.CancelledError:
             return
         except Exception as exc:  # noqa: BLE001
-            self.bots_repo.update_status(bot_id, "error")
+            await self.db_executor.write(self.bots_repo.update_status, bot_id, "error")
             self.event_writer.emit(bot_id, owner_client_id, "ERROR", message=str(exc))
 
 
     async def _run_codey(self, bot_id: str, owner_client_id: str, config: dict) -> None:
         try:
             await run_codey_bot(bot_id, owner_client_id, config, self.memory_store, self.event_writer)
-            self.bots_repo.update_status(bot_id, "stopped")
+            await self.db_executor.write(self.bots_repo.update_status, bot_id, "stopped")
         except asyncio.CancelledError:
             return
         except Exception as exc:  # noqa: BLE001
-            self.bots_repo.update_status(bot_id, "error")
+            await self.db_executor.write(self.bots_repo.update_status, bot_id, "error")
             self.event_writer.emit(bot_id, owner_client_id, "ERROR", message=str(exc))
 
     async def stop_bot(self, bot_id: str, paused: bool = False) -> dict:
-        bot = self.registry.get_bot(bot_id)
+        bot = await self.db_executor.read(self.registry.get_bot, bot_id)
         status = "paused" if paused else "stopped"
         event = "PAUSED" if paused else "STOPPED"
 
@@ -122,5 +139,5 @@ class BotRunner:
             await asyncio.gather(task, return_exceptions=True)
 
         if bot["status"] != status:
-            self.registry.transition(bot_id, status, event)
-        return self.registry.get_bot(bot_id)
+            await self.db_executor.write(self.registry.transition, bot_id, status, event)
+        return await self.db_executor.read(self.registry.get_bot, bot_id)
@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+
+class BotEventSubscription:
+    def __init__(self, bot_id: str, loop: asyncio.AbstractEventLoop, buffer_size: int):
+        self.bot_id = bot_id
+        self.loop = loop
+        self.queue: asyncio.Queue[dict | None] = asyncio.Queue(maxsize=buffer_size + 1)
+        self.buffer_size = buffer_size
+        self.dropped = False
+
+    def _deliver(self, event: dict) -> None:
+        if self.dropped:
+            return
+        if self.queue.qsize() >= self.buffer_size:
+            # Slow consumer: discard its backlog and signal it to reconnect with Last-Event-ID.
+            self.dropped = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+            return
+        self.queue.put_nowait(event)
+
+    async def get(self) -> dict | None:
+        return await self.queue.get()
+
+
+class BotEventBus:
+    def __init__(self, buffer_size: int = 256):
+        self.buffer_size = max(1, buffer_size)
+        self._subscriptions: dict[str, set[BotEventSubscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, bot_id: str) -> BotEventSubscription:
+        subscription = BotEventSubscription(bot_id, asyncio.get_running_loop(), self.buffer_size)
+        with self._lock:
+            self._subscriptions.setdefault(bot_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: BotEventSubscription) -> None:
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.bot_id)
+            if subscriptions is None:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.bot_id]
+
+    def subscriber_count(self, bot_id: str) -> int:
+        with self._lock:
+            return len(self._subscriptions.get(bot_id, ()))
+
+    def publish(self, events: list[dict]) -> None:
+        # Called from whichever thread flushed the events; hop onto each subscriber's loop.
+        for event in events:
+            with self._lock:
+                subscriptions = list(self._subscriptions.get(event["bot_id"], ()))
+            for subscription in subscriptions:
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription._deliver, event)
+                except RuntimeError:
+                    self.unsubscribe(subscription)
@@ -1,9 +1,27 @@
+from service.config import settings
 from service.storage.bot_events_repo import BotEventsRepository
+from service.storage.event_buffer import GroupCommitEventBuffer
+from service.supervisor.event_bus import BotEventBus
 
 
 class BotEventWriter:
-    def __init__(self, events_repo: BotEventsRepository):
+    def __init__(
+        self,
+        events_repo: BotEventsRepository,
+        buffer: GroupCommitEventBuffer | None = None,
+        bus: BotEventBus | None = None,
+    ):
         self.events_repo = events_repo
+        self.buffer = buffer or GroupCommitEventBuffer(
+            events_repo,
+            max_pending=settings.BOT_EVENT_BUFFER_MAX_PENDING,
+            batch_size=settings.BOT_EVENT_FLUSH_BATCH_SIZE,
+            flush_interval_seconds=settings.BOT_EVENT_FLUSH_INTERVAL_MS / 1000,
+        )
+        self.bus = bus
+        if bus is not None:
+            # Subscribers see events once they are committed and carry their seq.
+            self.buffer.add_listener(bus.publish)
 
     def emit(
         self,
@@ -13,4 +31,12 @@ class BotEventWriter:
         message: str | None = None,
         payload: dict | None = None,
     ) -> dict:
-        return self.events_repo.add_event(bot_id, owner_client_id, event_type, message, payload)
+        event = self.events_repo.new_event(bot_id, owner_client_id, event_type, message, payload)
+        self.buffer.submit(event)
+        return event
+
+    def flush(self) -> int:
+        return self.buffer.flush()
+
+    def close(self) -> None:
+        self.buffer.close()
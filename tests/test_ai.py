@@ -1,9 +1,30 @@
 import asyncio
+import contextlib
+import io
+import json
+import os
+import tarfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 import httpx
-
+import pytest
+
+from service.admission import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    AdmissionControl,
+    ConcurrencyLimiter,
+    ProviderOverloaded,
+)
 from service.ai import AIService
 from service.config import settings
+from service.github_cache import GitHubCache
+from service.github_snapshots import RepoSnapshotCache, SnapshotTooLarge
+from service.http_clients import UpstreamClients
+from service.response_cache import ResponseCache
+from service.storage.db import SQLiteDB
 
 
 def test_generate_uses_ollama_provider(monkeypatch):
@@ -80,6 +101,124 @@ def test_generate_executes_sync_custom_tool(monkeypatch):
     assert result == "sync:hello"
 
 
+def test_blocking_tools_run_on_the_tool_pool_without_stalling_the_loop():
+    service = AIService()
+
+    def slow_tool(tool_input):
+        time.sleep(0.2)
+        return threading.current_thread().name
+
+    async def async_tool(tool_input):
+        return threading.current_thread().name
+
+    service.register_tool("slow", slow_tool)
+    service.register_tool("quick", async_tool)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticking = asyncio.create_task(ticker())
+        slow = await service.generate("/tool slow")
+        ticking.cancel()
+        quick = await service.generate("/tool quick")
+        await service.aclose()
+        return slow, quick, ticks
+
+    slow, quick, ticks = asyncio.run(scenario())
+
+    assert slow.startswith("orty-tool")
+    assert quick == "MainThread"
+    assert ticks >= 5
+    stats = service.tool_stats()
+    assert stats["slow"]["blocking"] is True
+    assert stats["quick"]["blocking"] is False
+    assert stats["fs_read"]["blocking"] is True
+    assert stats["gh_repo"]["blocking"] is False
+    assert stats["slow"]["calls"] == 1
+    assert stats["slow"]["max_ms"] >= 200
+
+
+def test_tools_time_out_and_count_errors(monkeypatch):
+    monkeypatch.setattr(settings, "TOOL_TIMEOUTS_JSON", '{"hang": 0.05}')
+    service = AIService()
+
+    async def hang(tool_input):
+        await asyncio.sleep(5)
+
+    def stuck(tool_input):
+        time.sleep(0.3)
+        return "late"
+
+    def broken(tool_input):
+        raise RuntimeError("boom")
+
+    service.register_tool("hang", hang)
+    service.register_tool("stuck", stuck, timeout=0.05)
+    service.register_tool("broken", broken)
+
+    async def scenario():
+        results = [
+            await service.generate("/tool hang"),
+            await service.generate("/tool stuck"),
+            await service.generate("/tool broken"),
+        ]
+        await service.aclose()
+        return results
+
+    hung, stuck_result, failed = asyncio.run(scenario())
+
+    assert hung == "Tool 'hang' timed out after 0.05s."
+    assert stuck_result == "Tool 'stuck' timed out after 0.05s."
+    assert failed == "Tool 'broken' failed: boom"
+    stats = service.tool_stats()
+    assert stats["hang"]["timeouts"] == 1
+    assert stats["stuck"]["timeouts"] == 1
+    assert stats["broken"]["errors"] == 1
+    assert stats["echo"]["timeout_seconds"] == settings.TOOL_TIMEOUT_SECONDS
+
+
+def test_timed_out_blocking_tools_are_reported_until_their_thread_returns(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "TOOL_MAX_THREADS", 1)
+    monkeypatch.setattr(settings, "FS_READ_ROOT", str(tmp_path))
+    os.mkfifo(tmp_path / "pipe")
+    service = AIService()
+    release = threading.Event()
+
+    def stuck(tool_input):
+        release.wait(5)
+        return "late"
+
+    service.register_tool("stuck", stuck, timeout=0.05)
+
+    async def scenario():
+        timed_out = await service.generate("/tool stuck")
+        while_stuck = service.tool_stats()["stuck"]["abandoned_threads"]
+        queued = await service.generate("/tool stuck")
+        release.set()
+        for _ in range(100):
+            if not service.tool_stats()["stuck"]["abandoned_threads"]:
+                break
+            await asyncio.sleep(0.01)
+        pipe = await service.generate("/tool fs_read pipe")
+        await service.aclose()
+        return timed_out, while_stuck, queued, pipe
+
+    timed_out, while_stuck, queued, pipe = asyncio.run(scenario())
+
+    assert timed_out == "Tool 'stuck' timed out after 0.05s."
+    assert while_stuck == 1
+    # The second call never got a thread: it was cancelled in the queue, not abandoned.
+    assert queued == "Tool 'stuck' timed out after 0.05s."
+    assert service.tool_stats()["stuck"]["abandoned_threads"] == 0
+    assert pipe.startswith("Path is not a regular file")
+
+
 def test_generate_executes_echo_tool_before_provider(monkeypatch):
     service = AIService()
     monkeypatch.setattr(settings, "LLM_PROVIDER", "openai")
@@ -183,6 +322,47 @@ def test_generate_rejects_fs_read_path_traversal(tmp_path, monkeypatch):
     assert "Access denied" in result
 
 
+def test_fs_read_supports_line_and_byte_ranges(tmp_path, monkeypatch):
+    service = AIService()
+    monkeypatch.setattr(settings, "FS_READ_ROOT", str(tmp_path))
+    (tmp_path / "lines.txt").write_text("".join(f"line {n}\n" for n in range(1, 301)), encoding="utf-8")
+
+    lines = asyncio.run(service.generate("/tool fs_read lines.txt 100:102"))
+    tail = asyncio.run(service.generate("/tool fs_read lines.txt 299:"))
+    raw = asyncio.run(service.generate("/tool fs_read lines.txt bytes=7:13"))
+    invalid = asyncio.run(service.generate("/tool fs_read lines.txt 5:2"))
+    empty = asyncio.run(service.generate("/tool fs_read lines.txt 400:500"))
+
+    assert lines == "line 100\nline 101\nline 102\n"
+    assert tail == "line 299\nline 300\n"
+    assert raw == "line 2"
+    assert invalid == "Invalid range: 5:2 (end before start)."
+    assert empty.startswith("(empty range 400:500)")
+
+
+def test_fs_read_excerpts_large_files_and_detects_binary(tmp_path, monkeypatch):
+    service = AIService()
+    monkeypatch.setattr(settings, "FS_READ_ROOT", str(tmp_path))
+    monkeypatch.setattr(settings, "FS_READ_MAX_BYTES", 200)
+    monkeypatch.setattr(settings, "FS_READ_MMAP_MIN_BYTES", 1024)
+    (tmp_path / "big.txt").write_text("".join(f"row {n:05d} é\n" for n in range(10000)), encoding="utf-8")
+    (tmp_path / "blob.bin").write_bytes(b"PK\x03\x04\x00\x00" + bytes(range(256)) * 100)
+    (tmp_path / "latin1.txt").write_bytes("caf\xe9\n".encode("latin-1"))
+
+    excerpt = asyncio.run(service.generate("/tool fs_read big.txt"))
+    ranged = asyncio.run(service.generate("/tool fs_read big.txt 5001:5001"))
+    binary = asyncio.run(service.generate("/tool fs_read blob.bin"))
+    latin1 = asyncio.run(service.generate("/tool fs_read latin1.txt"))
+
+    assert excerpt.startswith("row 00000 é\n")
+    assert excerpt.endswith("row 09999 é\n")
+    assert "bytes omitted" in excerpt
+    assert len(excerpt.encode("utf-8")) < 400
+    assert ranged == "row 05000 é\n"
+    assert binary.startswith("File appears to be binary")
+    assert latin1.startswith("File is not UTF-8 text")
+
+
 def test_generate_returns_recoverable_message_when_ollama_is_unreachable(monkeypatch):
     service = AIService()
     monkeypatch.setattr(settings, "LLM_PROVIDER", "ollama")
@@ -208,6 +388,7 @@ def test_generate_executes_gh_repo_tool(monkeypatch):
 
     class FakeResponse:
         status_code = 200
+        headers = {}
 
         @staticmethod
         def json():
@@ -239,6 +420,7 @@ def test_generate_executes_gh_tree_tool(monkeypatch):
 
     class FakeResponse:
         status_code = 200
+        headers = {}
 
         @staticmethod
         def json():
@@ -265,6 +447,7 @@ def test_generate_executes_gh_file_tool(monkeypatch):
 
     class FakeResponse:
         status_code = 200
+        headers = {}
 
         @staticmethod
         def json():
@@ -302,3 +485,818 @@ def test_generate_validates_gh_repo_contract(monkeypatch):
     result = asyncio.run(service.generate("/tool gh_repo invalid/repo/name"))
 
     assert result == "Usage: /tool gh_repo <owner/repo>"
+
+
+def test_upstream_clients_are_reused_per_loop_and_closed(monkeypatch):
+    monkeypatch.setattr(settings, "HTTP_CONNECT_TIMEOUT_SECONDS", 2.5)
+    clients = UpstreamClients({"ollama": 90})
+
+    async def first_loop():
+        ollama = clients.get("ollama")
+        assert clients.get("ollama") is ollama
+        assert clients.get("github") is not ollama
+        assert ollama.timeout.read == 90
+        assert ollama.timeout.connect == 2.5
+        return ollama
+
+    previous = asyncio.run(first_loop())
+
+    async def second_loop():
+        current = clients.get("ollama")
+        assert current is not previous
+        await clients.aclose()
+        return current
+
+    assert asyncio.run(second_loop()).is_closed
+
+
+def test_register_provider_accepts_streaming_generators(monkeypatch):
+    service = AIService()
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "streamy")
+
+    async def streamy(message, history):
+        for word in ("a", "b", "c"):
+            yield word
+
+    service.register_provider("streamy", streamy)
+
+    async def collect():
+        return [chunk async for chunk in service.generate_stream("hi")]
+
+    assert asyncio.run(collect()) == ["a", "b", "c"]
+    assert asyncio.run(service.generate("hi")) == "abc"
+
+
+def test_generate_stream_falls_back_to_single_chunk_for_plain_providers(monkeypatch):
+    service = AIService()
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "ollama")
+
+    async def fake_ollama(message, history):
+        return "whole reply"
+
+    service.register_provider("ollama", fake_ollama)
+
+    async def collect():
+        return [chunk async for chunk in service.generate_stream("hi")]
+
+    assert asyncio.run(collect()) == ["whole reply"]
+
+
+def test_ollama_stream_yields_tokens_from_ndjson(monkeypatch):
+    service = AIService()
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "ollama")
+    body = "\n".join([
+        '{"message": {"role": "assistant", "content": "Hel"}, "done": false}',
+        '{"message": {"role": "assistant", "content": "lo"}, "done": false}',
+        '{"message": {"role": "assistant", "content": ""}, "done": true}',
+    ])
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, text=body)
+
+    monkeypatch.setattr(service.http, "_build", lambda name: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    async def collect():
+        return [chunk async for chunk in service.generate_stream("hi")]
+
+    assert asyncio.run(collect()) == ["Hel", "lo"]
+    assert b'"stream":true' in requests[0].content.replace(b" ", b"")
+
+
+def test_response_cache_serves_repeated_prompts_and_honours_bypass(tmp_path, monkeypatch):
+    cache = ResponseCache(SQLiteDB(str(tmp_path / "cache.db")), memory_entries=1)
+    service = AIService(response_cache=cache)
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "mock")
+    calls = []
+
+    async def fake_mock(message, history):
+        calls.append(message)
+        return f"reply {len(calls)}"
+
+    service.register_provider("mock", fake_mock)
+    history = [{"role": "user", "content": "earlier"}]
+
+    assert asyncio.run(service.generate("hello", history)) == "reply 1"
+    assert asyncio.run(service.generate("hello", history)) == "reply 1"
+    assert asyncio.run(service.generate("other", history)) == "reply 2"
+    # "other" evicted "hello" from the one-entry memory tier; SQLite still has it.
+    assert asyncio.run(service.generate("hello", history)) == "reply 1"
+    assert asyncio.run(service.generate("hello", [])) == "reply 3"
+    assert asyncio.run(service.generate("hello", history, use_cache=False)) == "reply 4"
+
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 3)
+    assert stats["stores"] == 3
+
+
+def test_response_cache_skips_errors_and_tools_and_expires(tmp_path, monkeypatch):
+    cache = ResponseCache(SQLiteDB(str(tmp_path / "cache.db")), ttl_seconds=60)
+    service = AIService(response_cache=cache)
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "ollama")
+    replies = ["Ollama error: boom", "fine"]
+
+    async def fake_ollama(message, history):
+        return replies.pop(0)
+
+    service.register_provider("ollama", fake_ollama)
+
+    assert asyncio.run(service.generate("hi")) == "Ollama error: boom"
+    assert asyncio.run(service.generate("hi")) == "fine"
+    assert asyncio.run(service.generate("/tool echo hi")) == "hi"
+    assert cache.stats()["stores"] == 1
+
+    monkeypatch.setattr("service.response_cache.time.time", lambda: 10**12)
+    cache._memory.clear()
+    key = service._cache_key("hi", [])
+    assert cache.get(key) is None
+
+
+def test_response_cache_enforces_row_and_byte_caps(tmp_path):
+    db = SQLiteDB(str(tmp_path / "cache.db"))
+    cache = ResponseCache(db, memory_entries=0, max_rows=3, max_bytes=25)
+    for index in range(5):
+        cache.put(f"key-{index}", "mock", None, "x" * 10)
+
+    with db.connect() as conn:
+        keys = [row[0] for row in conn.execute("SELECT cache_key FROM response_cache ORDER BY cache_key")]
+    assert keys == ["key-3", "key-4"]
+
+
+def test_response_cache_lookups_are_read_only_and_hits_still_guide_eviction(tmp_path):
+    db = SQLiteDB(str(tmp_path / "cache.db"))
+    cache = ResponseCache(db, memory_entries=0, max_rows=2)
+    cache.put("old", "mock", None, "old reply")
+    cache.put("newer", "mock", None, "newer reply")
+    with db.connect() as conn:
+        before = conn.execute("SELECT last_hit_at FROM response_cache WHERE cache_key = 'old'").fetchone()[0]
+        changes = conn.total_changes
+
+    assert cache.get("old") == "old reply"
+    with db.connect() as conn:
+        assert conn.total_changes == changes
+        assert conn.execute("SELECT last_hit_at FROM response_cache WHERE cache_key = 'old'").fetchone()[0] == before
+
+    # The buffered hit is written before the next eviction pass, so "newer" goes first.
+    cache.put("newest", "mock", None, "newest reply")
+    with db.connect() as conn:
+        keys = sorted(row[0] for row in conn.execute("SELECT cache_key FROM response_cache"))
+    assert keys == ["newest", "old"]
+
+
+def test_streamed_reply_is_cached_only_when_complete(tmp_path, monkeypatch):
+    cache = ResponseCache(SQLiteDB(str(tmp_path / "cache.db")))
+    service = AIService(response_cache=cache)
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "streamy")
+    calls = []
+
+    async def streamy(message, history):
+        calls.append(message)
+        for word in ("a", "b", "c"):
+            yield word
+            await asyncio.sleep(0.01)
+
+    service.register_provider("streamy", streamy)
+
+    async def first_chunk():
+        stream = service.generate_stream("hi")
+        chunk = await stream.__anext__()
+        await stream.aclose()
+        return chunk
+
+    async def collect():
+        return [chunk async for chunk in service.generate_stream("hi")]
+
+    assert asyncio.run(first_chunk()) == "a"
+    assert cache.stats()["stores"] == 0
+    assert asyncio.run(collect()) == ["a", "b", "c"]
+    assert asyncio.run(collect()) == ["abc"]
+    assert len(calls) == 2
+
+
+def test_provider_chain_falls_back_and_reports_answering_provider(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "ollama")
+    monkeypatch.setattr(settings, "OLLAMA_MODEL", "local")
+    monkeypatch.setattr(settings, "LLM_FALLBACK_PROVIDERS", "backup:big-model")
+    service = AIService()
+    seen_models = []
+
+    async def failing_ollama(message, history):
+        return "Ollama is not reachable. Expected server at nowhere."
+
+    async def backup(message, history):
+        seen_models.append(message)
+        return "backup-reply"
+
+    service.register_provider("ollama", failing_ollama)
+    service.register_provider("backup", backup)
+
+    result = asyncio.run(service.generate_reply("hello"))
+
+    assert result == {
+        "reply": "backup-reply",
+        "provider": "backup",
+        "model": "big-model",
+        "cached": False,
+        "queue_wait_ms": 0.0,
+    }
+    assert service.health.stats()["fallbacks"] == 1
+    assert service.health.breaker("ollama:local").consecutive_failures == 1
+
+
+def test_provider_chain_returns_primary_error_when_every_provider_fails(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "ollama")
+    monkeypatch.setattr(settings, "OLLAMA_MODEL", "local")
+    monkeypatch.setattr(settings, "LLM_FALLBACK_PROVIDERS", "backup")
+    service = AIService()
+
+    async def failing_ollama(message, history):
+        return "Ollama error: boom"
+
+    async def failing_backup(message, history):
+        raise RuntimeError("backup down")
+
+    service.register_provider("ollama", failing_ollama)
+    service.register_provider("backup", failing_backup)
+
+    assert asyncio.run(service.generate("hello")) == "Ollama error: boom"
+
+
+def test_circuit_breaker_skips_failing_provider_until_reset(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "ollama")
+    monkeypatch.setattr(settings, "OLLAMA_MODEL", "local")
+    monkeypatch.setattr(settings, "LLM_FALLBACK_PROVIDERS", "backup")
+    monkeypatch.setattr(settings, "LLM_CIRCUIT_FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr(settings, "LLM_CIRCUIT_RESET_SECONDS", 60)
+    service = AIService()
+    ollama_calls = []
+
+    async def failing_ollama(message, history):
+        ollama_calls.append(message)
+        return "Ollama error: boom"
+
+    async def backup(message, history):
+        return "backup-reply"
+
+    service.register_provider("ollama", failing_ollama)
+    service.register_provider("backup", backup)
+
+    for _ in range(4):
+        assert asyncio.run(service.generate("hello")) == "backup-reply"
+
+    assert len(ollama_calls) == 2
+    assert service.health.breaker("ollama:local").state == "open"
+
+    service.health.breaker("ollama:local").opened_at -= 60
+    asyncio.run(service.generate("hello"))
+    assert len(ollama_calls) == 3
+    assert service.health.breaker("ollama:local").state == "open"
+
+
+def test_circuit_open_on_every_provider_fails_fast(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "ollama")
+    monkeypatch.setattr(settings, "OLLAMA_MODEL", "local")
+    monkeypatch.setattr(settings, "LLM_CIRCUIT_FAILURE_THRESHOLD", 1)
+    service = AIService()
+
+    async def failing_ollama(message, history):
+        return "Ollama error: boom"
+
+    service.register_provider("ollama", failing_ollama)
+
+    assert asyncio.run(service.generate("hello")) == "Ollama error: boom"
+    assert asyncio.run(service.generate("hello")).startswith("LLM providers unavailable: circuit open for ollama:local.")
+
+
+def test_slow_primary_is_hedged_with_fallback_stream(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "ollama")
+    monkeypatch.setattr(settings, "LLM_FALLBACK_PROVIDERS", "backup")
+    monkeypatch.setattr(settings, "LLM_HEDGE_DELAY_SECONDS", 0.05)
+    service = AIService()
+    cancelled = []
+
+    async def slow_ollama(message, history):
+        try:
+            await asyncio.sleep(5)
+            yield "too late"
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def backup(message, history):
+        yield "fast "
+        yield "answer"
+
+    service.register_provider("ollama", slow_ollama)
+    service.register_provider("backup", backup)
+    meta = {}
+
+    async def collect():
+        chunks = [chunk async for chunk in service.generate_stream("hi", meta=meta)]
+        await asyncio.sleep(0)
+        return chunks
+
+    assert asyncio.run(collect()) == ["fast ", "answer"]
+    assert meta["provider"] == "backup"
+    assert cancelled == [True]
+    assert service.health.hedges == 1
+    assert service.health.breaker("ollama:qwen3:4b").consecutive_failures == 0
+
+
+def test_chain_entry_model_reaches_builtin_provider(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "ollama")
+    monkeypatch.setattr(settings, "OLLAMA_MODEL", "small")
+    monkeypatch.setattr(settings, "LLM_FALLBACK_PROVIDERS", "ollama:large")
+    service = AIService()
+    models = []
+
+    def handler(request):
+        model = json.loads(request.content)["model"]
+        models.append(model)
+        if model == "small":
+            return httpx.Response(500, text="overloaded")
+        return httpx.Response(200, json={"message": {"role": "assistant", "content": "from large"}})
+
+    monkeypatch.setattr(service.http, "_build", lambda name: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    result = asyncio.run(service.generate_reply("hi"))
+
+    assert models == ["small", "large"]
+    assert (result["reply"], result["model"]) == ("from large", "large")
+
+
+def test_concurrent_identical_generations_share_one_upstream_call(monkeypatch):
+    service = AIService()
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "mock")
+    calls = []
+
+    async def slow_mock(message, history):
+        calls.append(message)
+        await asyncio.sleep(0.05)
+        return f"reply to {message}"
+
+    service.register_provider("mock", slow_mock)
+
+    async def run():
+        return await asyncio.gather(
+            service.generate("same"),
+            service.generate("same"),
+            service.generate("different"),
+            service.generate("same", history=[{"role": "user", "content": "x"}]),
+        )
+
+    assert asyncio.run(run()) == ["reply to same", "reply to same", "reply to different", "reply to same"]
+    assert sorted(calls) == ["different", "same", "same"]
+    assert service.single_flight_stats() == {"in_flight": 0, "coalesced": 1}
+
+
+def test_late_stream_waiter_replays_shared_chunks_and_errors_reach_everyone(monkeypatch):
+    service = AIService()
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "streamy")
+    calls = []
+
+    async def streamy(message, history):
+        calls.append(message)
+        for word in ("one ", "two ", "three"):
+            yield word
+            await asyncio.sleep(0.02)
+        if message == "boom":
+            raise RuntimeError("upstream broke")
+
+    service.register_provider("streamy", streamy)
+
+    async def collect(message, delay=0):
+        await asyncio.sleep(delay)
+        return [chunk async for chunk in service.generate_stream(message)]
+
+    async def run():
+        return await asyncio.gather(collect("hi"), collect("hi", delay=0.03))
+
+    first, late = asyncio.run(run())
+    assert first == late == ["one ", "two ", "three"]
+    assert calls == ["hi"]
+
+    async def run_failing():
+        return await asyncio.gather(collect("boom"), collect("boom"), return_exceptions=True)
+
+    results = asyncio.run(run_failing())
+    assert [str(result) for result in results] == ["upstream broke", "upstream broke"]
+
+
+def test_streaming_and_plain_callers_share_one_generation(monkeypatch):
+    service = AIService()
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "streamy")
+    calls = []
+
+    async def streamy(message, history):
+        calls.append(message)
+        for word in ("one ", "two ", "three"):
+            yield word
+            await asyncio.sleep(0.02)
+
+    service.register_provider("streamy", streamy)
+
+    async def collect():
+        return [chunk async for chunk in service.generate_stream("hi")]
+
+    async def run():
+        return await asyncio.gather(collect(), service.generate("hi"))
+
+    assert asyncio.run(run()) == [["one ", "two ", "three"], "one two three"]
+    assert calls == ["hi"]
+    assert service.single_flight_stats() == {"in_flight": 0, "coalesced": 1}
+
+
+def test_joining_caller_raises_the_shared_generation_priority(monkeypatch):
+    service = AIService()
+    service.admission = AdmissionControl({"mock": 1}, max_queue=4)
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "mock")
+    calls = []
+
+    async def mock(message, history):
+        calls.append(message)
+        return message
+
+    service.register_provider("mock", mock)
+
+    async def run():
+        limiter = service.admission.limiter("mock")
+        await limiter.acquire(PRIORITY_INTERACTIVE)
+        other = asyncio.create_task(service.generate("other", priority=PRIORITY_BACKGROUND))
+        await asyncio.sleep(0.01)
+        shared = asyncio.create_task(service.generate("shared", priority=PRIORITY_BACKGROUND))
+        await asyncio.sleep(0.01)
+        # An interactive caller joins the queued background generation and pulls it forward.
+        urgent = asyncio.create_task(service.generate("shared", priority=PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0.01)
+        limiter.release(0.01)
+        return await asyncio.gather(other, shared, urgent)
+
+    assert asyncio.run(run()) == ["other", "shared", "shared"]
+    assert calls == ["shared", "other"]
+    assert service.admission.limiter("mock").stats()["queued"] == 0
+
+
+def test_shared_generation_is_cancelled_only_when_last_waiter_leaves(monkeypatch):
+    service = AIService()
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "streamy")
+    cancelled = []
+
+    async def streamy(message, history):
+        try:
+            for index in range(50):
+                yield f"{index} "
+                await asyncio.sleep(0.01)
+        except asyncio.CancelledError:
+            cancelled.append(message)
+            raise
+
+    service.register_provider("streamy", streamy)
+
+    async def run():
+        longer = service.generate_stream("hi")
+        shorter = service.generate_stream("hi")
+        chunks = [await longer.__anext__()]
+        assert await shorter.__anext__() == "0 "
+        await shorter.aclose()
+        await asyncio.sleep(0.03)
+        assert not cancelled
+        chunks += [await longer.__anext__() for _ in range(3)]
+        await longer.aclose()
+        await asyncio.sleep(0.01)
+        return chunks
+
+    assert asyncio.run(run()) == ["0 ", "1 ", "2 ", "3 "]
+    assert cancelled == ["hi"]
+    assert service.single_flight_stats() == {"in_flight": 0, "coalesced": 1}
+
+
+def test_concurrency_limiter_admits_by_priority_and_sheds_background_first():
+    limiter = ConcurrencyLimiter("ollama", max_concurrency=1, max_queue=2)
+    order = []
+
+    async def call(name, priority):
+        await limiter.acquire(priority)
+        order.append(name)
+        await asyncio.sleep(0.01)
+        limiter.release(0.01)
+
+    async def run():
+        await limiter.acquire(PRIORITY_INTERACTIVE)
+        background = asyncio.create_task(call("background", PRIORITY_BACKGROUND))
+        await asyncio.sleep(0)
+        later_background = asyncio.create_task(call("later-background", PRIORITY_BACKGROUND))
+        await asyncio.sleep(0)
+        # Queue is full: the interactive call displaces the newest background waiter.
+        interactive = asyncio.create_task(call("interactive", PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0)
+        assert limiter.would_shed(PRIORITY_BACKGROUND)
+        limiter.release(0.01)
+        return await asyncio.gather(background, later_background, interactive, return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert isinstance(results[1], ProviderOverloaded)
+    assert results[1].retry_after >= 1
+    assert order == ["interactive", "background"]
+    assert limiter.stats()["shed"] == 1
+    assert limiter.active == 0
+
+
+def test_concurrency_limiter_passes_slot_on_when_waiter_is_cancelled():
+    limiter = ConcurrencyLimiter("ollama", max_concurrency=1, max_queue=4)
+
+    async def run():
+        await limiter.acquire(PRIORITY_INTERACTIVE)
+        gone = asyncio.create_task(limiter.acquire(PRIORITY_INTERACTIVE))
+        waiting = asyncio.create_task(limiter.acquire(PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0)
+        limiter.release(0.01)
+        gone.cancel()
+        await asyncio.sleep(0)
+        await asyncio.wait_for(waiting, 1)
+        assert gone.cancelled()
+        limiter.release(0.01)
+
+    asyncio.run(run())
+
+    assert limiter.active == 0
+    assert limiter.stats()["queued"] == 0
+
+
+def test_concurrency_limiter_skips_cancelled_waiters_when_shedding():
+    limiter = ConcurrencyLimiter("ollama", max_concurrency=1, max_queue=1)
+
+    async def run():
+        await limiter.acquire(PRIORITY_INTERACTIVE)
+        gone = asyncio.create_task(limiter.acquire(PRIORITY_BACKGROUND))
+        await asyncio.sleep(0)
+        gone.cancel()
+        # The cancelled waiter has not run its cleanup yet when the next call arrives.
+        asyncio.get_running_loop().call_later(0.01, limiter.release, 0.01)
+        waited = await limiter.acquire(PRIORITY_INTERACTIVE)
+        await asyncio.gather(gone, return_exceptions=True)
+        limiter.release(0.01)
+        return waited
+
+    waited = asyncio.run(run())
+
+    assert waited > 0
+    assert limiter.active == 0
+    assert limiter.stats()["queued"] == 0
+    assert limiter.stats()["shed"] == 0
+
+
+def test_generate_reports_queue_wait_under_provider_concurrency_limit(monkeypatch):
+    service = AIService()
+    service.admission = AdmissionControl({"mock": 1}, max_queue=4)
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "mock")
+    running = []
+
+    async def slow_mock(message, history):
+        running.append(message)
+        assert len(running) == 1
+        await asyncio.sleep(0.05)
+        running.remove(message)
+        return message
+
+    service.register_provider("mock", slow_mock)
+
+    async def run():
+        return await asyncio.gather(service.generate_reply("first"), service.generate_reply("second"))
+
+    first, second = asyncio.run(run())
+
+    assert first["queue_wait_ms"] == 0.0
+    assert second["queue_wait_ms"] >= 40
+    assert service.admission.stats()["mock"]["admitted"] == 2
+
+
+def test_github_cache_revalidates_with_etag_and_serves_stale_when_rate_limited(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "GITHUB_TOKEN", "ghp_test")
+    cache = GitHubCache(SQLiteDB(str(tmp_path / "gh.db")), fresh_seconds=0)
+    service = AIService(github_cache=cache)
+    repo = {"full_name": "octocat/Hello-World", "default_branch": "main"}
+    seen = []
+    reset_at = str(int(time.time()) + 600)
+
+    def handler(request):
+        seen.append(request)
+        if request.url.path.endswith("/Spoon-Knife"):
+            return httpx.Response(
+                403,
+                text="rate limit exceeded",
+                headers={"x-ratelimit-remaining": "0", "x-ratelimit-reset": reset_at},
+            )
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304, headers={"x-ratelimit-remaining": "41", "x-ratelimit-reset": reset_at})
+        return httpx.Response(
+            200,
+            json=repo,
+            headers={"etag": '"v1"', "x-ratelimit-remaining": "42", "x-ratelimit-reset": reset_at},
+        )
+
+    monkeypatch.setattr(service.http, "_build", lambda name: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    first = asyncio.run(service.generate("/tool gh_repo octocat/Hello-World"))
+    second = asyncio.run(service.generate("/tool gh_repo octocat/Hello-World"))
+
+    assert first == second
+    assert "default_branch: main" in second
+    assert seen[0].headers["authorization"] == "Bearer ghp_test"
+    assert "if-none-match" not in seen[0].headers
+    assert seen[1].headers["if-none-match"] == '"v1"'
+    assert service.github_rate_limit.remaining == 41
+
+    limited = asyncio.run(service.generate("/tool gh_repo octocat/Spoon-Knife"))
+    assert limited.startswith("GitHub API rate limit exhausted until")
+    assert service.github_rate_limit.exhausted()
+
+    # With the quota spent, the cached entry is served without another request.
+    requests_before = len(seen)
+    assert asyncio.run(service.generate("/tool gh_repo octocat/Hello-World")) == first
+    assert len(seen) == requests_before
+    assert cache.stats() == {"fresh_hits": 0, "revalidated": 1, "stale_served": 1, "misses": 1}
+
+
+def test_github_cache_serves_fresh_entries_without_a_request(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "GITHUB_TOKEN", None)
+    cache = GitHubCache(SQLiteDB(str(tmp_path / "gh.db")), fresh_seconds=60)
+    service = AIService(github_cache=cache)
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        assert "authorization" not in request.headers
+        return httpx.Response(200, json=[{"name": "README.md", "type": "file"}])
+
+    monkeypatch.setattr(service.http, "_build", lambda name: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    for _ in range(3):
+        assert asyncio.run(service.generate("/tool gh_tree octocat/Hello-World")) == "README.md"
+
+    assert len(calls) == 1
+    assert cache.stats()["fresh_hits"] == 2
+
+
+def _repo_tarball(sha, files):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        top = tarfile.TarInfo(f"octocat-Hello-World-{sha[:7]}")
+        top.type = tarfile.DIRTYPE
+        archive.addfile(top)
+        for name, content in files.items():
+            info = tarfile.TarInfo(f"octocat-Hello-World-{sha[:7]}/{name}")
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+        link = tarfile.TarInfo(f"octocat-Hello-World-{sha[:7]}/escape")
+        link.type = tarfile.SYMTYPE
+        link.linkname = "/etc/passwd"
+        archive.addfile(link)
+    return buffer.getvalue()
+
+
+@contextlib.contextmanager
+def _github_stand_in(tarballs, default_sha):
+    seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body=b"", content_type="application/json", headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            seen.append(self.path)
+            if self.path == "/repos/octocat/Hello-World":
+                self._send(200, json.dumps({"default_branch": "main"}).encode())
+            elif self.path == "/repos/octocat/Hello-World/commits/main":
+                self._send(200, json.dumps({"sha": default_sha}).encode())
+            elif self.path.startswith("/repos/octocat/Hello-World/tarball/"):
+                sha = self.path.rsplit("/", 1)[1]
+                self._send(302, headers={"Location": f"/codeload/{sha}"})
+            elif self.path.startswith("/codeload/") and self.path.rsplit("/", 1)[1] in tarballs:
+                self._send(200, tarballs[self.path.rsplit("/", 1)[1]], "application/x-gzip")
+            else:
+                self._send(404, b'{"message": "Not Found"}')
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}", seen
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_github_tools_serve_tree_and_files_from_one_tarball_snapshot(tmp_path, monkeypatch):
+    sha = "a" * 40
+    tarballs = {
+        sha: _repo_tarball(sha, {
+            "README.md": b"hello snapshot",
+            "service/app.py": b"print('hi')",
+            "service/nested/deep.txt": b"deep",
+            "logo.bin": b"\xff\xfe\x00",
+        })
+    }
+    snapshots = RepoSnapshotCache(tmp_path / "snapshots", max_bytes=1024 * 1024, max_tarball_bytes=1024 * 1024)
+    service = AIService(github_snapshots=snapshots)
+
+    with _github_stand_in(tarballs, sha) as (base_url, seen):
+        monkeypatch.setattr(settings, "GITHUB_API_BASE_URL", base_url)
+        root = asyncio.run(service.generate("/tool gh_tree octocat/Hello-World"))
+        nested = asyncio.run(service.generate("/tool gh_tree octocat/Hello-World service"))
+        recursive = asyncio.run(service.generate("/tool gh_tree octocat/Hello-World --recursive"))
+        readme = asyncio.run(service.generate("/tool gh_file octocat/Hello-World README.md"))
+        pinned = asyncio.run(service.generate(f"/tool gh_file octocat/Hello-World service/app.py {sha}"))
+        binary = asyncio.run(service.generate("/tool gh_file octocat/Hello-World logo.bin"))
+        outside = asyncio.run(service.generate("/tool gh_file octocat/Hello-World ../../etc/passwd"))
+
+    assert root == "logo.bin\nREADME.md\nservice/"
+    assert nested == "app.py\nnested/"
+    assert recursive == "logo.bin\nREADME.md\nservice/\nservice/app.py\nservice/nested/\nservice/nested/deep.txt"
+    assert readme == "hello snapshot"
+    assert pinned == "print('hi')"
+    assert binary == "GitHub file is not valid UTF-8 text."
+    assert outside == "Path not found: ../../etc/passwd"
+    assert not (snapshots.directory / sha / "escape").exists()
+    assert [path for path in seen if path.startswith("/codeload/")] == [f"/codeload/{sha}"]
+    assert not any("/contents" in path for path in seen)
+    assert snapshots.stats()["downloads"] == 1
+
+
+def test_github_snapshot_cache_evicts_least_recently_used_by_size(tmp_path, monkeypatch):
+    first, second = "1" * 40, "2" * 40
+    tarballs = {
+        first: _repo_tarball(first, {"README.md": b"x" * 600}),
+        second: _repo_tarball(second, {"README.md": b"y" * 600}),
+    }
+    snapshots = RepoSnapshotCache(tmp_path / "snapshots", max_bytes=1000, max_tarball_bytes=1024 * 1024)
+    service = AIService(github_snapshots=snapshots)
+
+    with _github_stand_in(tarballs, first) as (base_url, seen):
+        monkeypatch.setattr(settings, "GITHUB_API_BASE_URL", base_url)
+        assert asyncio.run(service.generate(f"/tool gh_file octocat/Hello-World README.md {first}")) == "x" * 600
+        assert asyncio.run(service.generate(f"/tool gh_file octocat/Hello-World README.md {second}")) == "y" * 600
+
+    assert snapshots.stats()["snapshots"] == 1
+    assert snapshots.stats()["evictions"] == 1
+    assert not (snapshots.directory / first).exists()
+    assert (snapshots.directory / second / "README.md").exists()
+
+
+def test_github_snapshot_remembers_failed_tarballs_and_resolved_refs(tmp_path, monkeypatch):
+    sha = "c" * 40
+    tarballs = {sha: _repo_tarball(sha, {"README.md": b"x" * 4000})}
+    snapshots = RepoSnapshotCache(tmp_path / "snapshots", max_bytes=1024 * 1024, max_tarball_bytes=100)
+    service = AIService(github_snapshots=snapshots)
+
+    with _github_stand_in(tarballs, sha) as (base_url, seen):
+        monkeypatch.setattr(settings, "GITHUB_API_BASE_URL", base_url)
+        for _ in range(3):
+            asyncio.run(service.generate("/tool gh_file octocat/Hello-World README.md"))
+
+    assert [path for path in seen if path.startswith("/codeload/")] == [f"/codeload/{sha}"]
+    assert seen.count("/repos/octocat/Hello-World") == 1
+    assert seen.count("/repos/octocat/Hello-World/commits/main") == 1
+    assert sum("/contents/" in path for path in seen) == 3
+    assert snapshots.stats()["negative_hits"] == 2
+
+
+def test_github_snapshot_file_reads_are_capped(tmp_path, monkeypatch):
+    monkeypatch.setattr("service.ai.GH_FILE_MAX_BYTES", 8)
+    (tmp_path / "small.txt").write_bytes(b"short")
+    (tmp_path / "large.txt").write_bytes("abcdefg\u00e9 and a lot more".encode())
+    service = AIService()
+
+    assert service._snapshot_file(tmp_path, "small.txt") == "short"
+    assert service._snapshot_file(tmp_path, "large.txt") == (
+        "abcdefg\n[... truncated: large.txt is 24 bytes, showing the first 8 ...]"
+    )
+
+
+def test_github_snapshot_unpack_aborts_past_the_extracted_size_and_member_caps(tmp_path):
+    sha = "b" * 40
+    tarball = tmp_path / "repo.tar.gz"
+    tarball.write_bytes(_repo_tarball(sha, {f"file{n}.txt": b"z" * 400 for n in range(5)}))
+
+    too_big = RepoSnapshotCache(tmp_path / "big", max_bytes=1 << 20, max_tarball_bytes=1 << 20, max_unpacked_bytes=1000)
+    too_big.directory.mkdir()
+    with pytest.raises(SnapshotTooLarge):
+        too_big._unpack(str(tarball), "octocat/Hello-World", sha)
+    assert list(too_big.directory.iterdir()) == []
+
+    too_many = RepoSnapshotCache(tmp_path / "many", max_bytes=1 << 20, max_tarball_bytes=1 << 20, max_members=3)
+    too_many.directory.mkdir()
+    with pytest.raises(SnapshotTooLarge):
+        too_many._unpack(str(tarball), "octocat/Hello-World", sha)
+    assert list(too_many.directory.iterdir()) == []
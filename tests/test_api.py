@@ -1,3 +1,6 @@
+import json
+from uuid import uuid4
+
 from fastapi.testclient import TestClient
 
 from service.api import app
@@ -134,6 +137,30 @@ def test_chat_applies_history_limit(monkeypatch):
     assert limited.json()["used_history"] == 1
 
 
+def test_chat_applies_history_token_budget(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "openai")
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", None)
+    headers = {"x-orty-secret": settings.ORTY_SHARED_SECRET}
+
+    seed = client.post("/chat", json={"message": "x" * 400}, headers=headers)
+    conv_id = seed.json()["conversation_id"]
+
+    budgeted = client.post(
+        "/chat",
+        json={"message": "next", "conversation_id": conv_id, "history_token_budget": 20, "history_limit": 1},
+        headers=headers,
+    )
+    roomy = client.post(
+        "/chat",
+        json={"message": "again", "conversation_id": conv_id, "history_token_budget": 4000},
+        headers=headers,
+    )
+
+    assert budgeted.status_code == 200
+    assert budgeted.json()["used_history"] == 1
+    assert roomy.json()["used_history"] == 4
+
+
 def test_ui_home_page_is_available():
     response = client.get("/ui")
 
@@ -171,3 +198,254 @@ def test_ui_chat_uses_primary_client_auth_without_secret(monkeypatch):
     response = client.post("/ui/chat", json={"message": "hello root"})
     assert response.status_code == 200
     assert response.json()["conversation_id"]
+
+
+def test_memory_search_is_scoped_to_requesting_client(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "openai")
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", None)
+    admin = {"x-orty-secret": settings.ORTY_SHARED_SECRET}
+    registered = client.post("/v1/clients", json={"name": "Searcher"}, headers=admin).json()
+    registered_headers = {
+        "x-orty-client-id": registered["client_id"],
+        "x-orty-client-token": registered["client_token"],
+    }
+
+    client.post("/chat", json={"message": "remember the quokka migration plan"}, headers=registered_headers)
+
+    found = client.get("/v1/memory/search", params={"q": "quokka"}, headers=registered_headers)
+    hidden = client.get("/v1/memory/search", params={"q": "quokka"}, headers=admin)
+
+    assert found.status_code == 200
+    assert found.json()[0]["role"] == "user"
+    assert "[quokka]" in found.json()[0]["snippet"]
+    assert hidden.status_code == 200
+    assert all("quokka" not in result["snippet"] for result in hidden.json())
+
+
+def test_chat_sends_stored_summary_with_recent_tail(monkeypatch):
+    from service.api import deps
+
+    seen = []
+
+    async def recording_provider(message, history):
+        seen.append(history)
+        return "ok"
+
+    deps.ai_service.register_provider("recording", recording_provider)
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "recording")
+    monkeypatch.setattr(deps.conversation_summarizer, "enabled", True)
+    monkeypatch.setattr(deps.conversation_summarizer, "trigger_messages", 1000)
+    headers = {"x-orty-secret": settings.ORTY_SHARED_SECRET}
+
+    first = client.post("/chat", json={"message": "old question"}, headers=headers)
+    conv_id = first.json()["conversation_id"]
+    primary = deps.ensure_primary_client()
+    old_ids = [row["id"] for row in deps.memory_store.get_unsummarized_messages(conv_id, primary["client_id"])]
+    deps.memory_store.save_summary(conv_id, "user asked an old question", old_ids[-1], client_id=primary["client_id"])
+    client.post("/chat", json={"message": "newer", "conversation_id": conv_id}, headers=headers)
+
+    response = client.post("/chat", json={"message": "latest", "conversation_id": conv_id}, headers=headers)
+
+    assert response.json()["used_history"] == 3
+    assert seen[-1][0]["role"] == "system"
+    assert seen[-1][0]["content"].endswith("user asked an old question")
+    assert (response.json()["provider"], response.json()["cached"]) == ("recording", False)
+    assert [message["content"] for message in seen[-1][1:]] == ["newer", "ok"]
+
+
+def test_chat_blends_recalled_messages_from_other_conversations(monkeypatch):
+    from service.api import deps
+
+    seen = []
+
+    async def recording_provider(message, history):
+        seen.append(history)
+        return "noted"
+
+    deps.ai_service.register_provider("recording", recording_provider)
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "recording")
+    headers = {"x-orty-secret": settings.ORTY_SHARED_SECRET}
+
+    client.post("/chat", json={"message": "My favourite tea is smoked lapsang souchong"}, headers=headers)
+    response = client.post(
+        "/chat",
+        json={"message": "Which lapsang souchong tea do I like?", "recall_k": 2},
+        headers=headers,
+    )
+
+    assert response.status_code == 200
+    assert seen[-1][0]["role"] == "system"
+    assert "smoked lapsang souchong" in seen[-1][0]["content"]
+    assert response.json()["used_history"] == 1
+
+
+def test_files_endpoint_streams_files_within_fs_read_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "FS_READ_ROOT", str(tmp_path))
+    (tmp_path / "data.bin").write_bytes(bytes(range(256)) * 1000)
+    headers = {"x-orty-secret": settings.ORTY_SHARED_SECRET}
+
+    unauthorized = client.get("/v1/files", params={"path": "data.bin"}, headers={"x-orty-secret": "wrong"})
+    response = client.get("/v1/files", params={"path": "data.bin"}, headers=headers)
+    partial = client.get("/v1/files", params={"path": "data.bin"}, headers={**headers, "Range": "bytes=256-511"})
+    missing = client.get("/v1/files", params={"path": "nope.bin"}, headers=headers)
+    escaped = client.get("/v1/files", params={"path": "../outside.bin"}, headers=headers)
+
+    assert unauthorized.status_code == 401
+    assert response.status_code == 200
+    assert response.content == bytes(range(256)) * 1000
+    assert 'filename="data.bin"' in response.headers["content-disposition"]
+    assert partial.status_code == 206
+    assert partial.content == bytes(range(256))
+    assert missing.status_code == 404
+    assert escaped.status_code == 403
+
+
+def test_files_endpoint_is_admin_only_and_never_serves_database_or_dotfiles(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "FS_READ_ROOT", str(tmp_path))
+    monkeypatch.setattr(settings, "SQLITE_PATH", str(tmp_path / "data" / "orty.db"))
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "orty.db").write_bytes(b"SQLite format 3\0")
+    (tmp_path / "backup.db-wal").write_bytes(b"wal")
+    (tmp_path / ".env").write_text("ORTY_SHARED_SECRET=x", encoding="utf-8")
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".git" / "config").write_text("[core]", encoding="utf-8")
+    (tmp_path / "notes.txt").write_text("ok", encoding="utf-8")
+    created = client.post("/v1/clients", json={"name": "downloader"}, headers={"x-orty-secret": settings.ORTY_SHARED_SECRET})
+    client_headers = {
+        "x-orty-client-id": created.json()["client_id"],
+        "x-orty-client-token": created.json()["client_token"],
+    }
+    headers = {"x-orty-secret": settings.ORTY_SHARED_SECRET}
+
+    assert client.get("/v1/files", params={"path": "notes.txt"}, headers=client_headers).status_code == 422
+    assert client.get("/v1/files", params={"path": "notes.txt"}, headers=headers).status_code == 200
+    for path in ("data/orty.db", "backup.db-wal", ".env", ".git/config", "data"):
+        assert client.get("/v1/files", params={"path": path}, headers=headers).status_code == 403
+
+
+def test_app_lifespan_can_run_twice_in_one_process():
+    headers = {"x-orty-secret": settings.ORTY_SHARED_SECRET}
+
+    for _ in range(2):
+        with TestClient(app) as lifespan_client:
+            response = lifespan_client.get("/v1/memory/search", params={"q": "anything"}, headers=headers)
+
+            assert response.status_code == 200
+
+
+def test_metrics_require_shared_secret_and_report_history_cache():
+    assert client.get("/v1/metrics", headers={"x-orty-secret": "wrong"}).status_code == 401
+
+    response = client.get("/v1/metrics", headers={"x-orty-secret": settings.ORTY_SHARED_SECRET})
+
+    assert response.status_code == 200
+    assert {"hits", "misses", "bytes", "max_bytes"} <= response.json()["history_cache"].keys()
+    assert "response_cache" in response.json()
+    assert {"calls", "errors", "timeouts", "avg_ms"} <= response.json()["tools"]["fs_read"].keys()
+
+
+def _sse_events(text):
+    events = []
+    for frame in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_chat_stream_emits_tokens_and_persists_reply(monkeypatch):
+    from service.api import deps
+
+    async def streaming_provider(message, history):
+        for chunk in ("Hello", ", ", "world"):
+            yield chunk
+
+    deps.ai_service.register_provider("streaming", streaming_provider)
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "streaming")
+    headers = {"x-orty-secret": settings.ORTY_SHARED_SECRET}
+
+    response = client.post("/chat/stream", json={"message": "greet me"}, headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _sse_events(response.text)
+    assert [name for name, _ in events] == ["start", "token", "token", "token", "done"]
+    assert events[-1][1]["reply"] == "Hello, world"
+    conv_id = events[0][1]["conversation_id"]
+
+    follow_up = client.post("/chat", json={"message": "again", "conversation_id": conv_id}, headers=headers)
+    assert follow_up.json()["used_history"] == 2
+    assert client.post("/chat/stream", json={"message": "x"}).status_code == 401
+
+
+def test_ui_chat_stream_uses_primary_client(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "openai")
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", None)
+
+    response = client.post("/ui/chat/stream", json={"message": "hello root"})
+
+    events = _sse_events(response.text)
+    assert events[1] == ("token", {"delta": "OPENAI_API_KEY not configured."})
+    assert events[-1][0] == "done"
+
+
+def test_chat_stream_persists_partial_reply_when_client_disconnects(monkeypatch):
+    import asyncio
+
+    from service.api import deps
+    from service.api.routes import chat as chat_routes
+    from service.models.schemas import ChatRequest
+
+    async def slow_provider(message, history):
+        yield "partial"
+        await asyncio.sleep(10)
+        yield "never"
+
+    # Registered on copies of the provider tables so "slow" is gone after the test.
+    monkeypatch.setattr(deps.ai_service, "_providers", dict(deps.ai_service._providers))
+    monkeypatch.setattr(deps.ai_service, "_stream_providers", dict(deps.ai_service._stream_providers))
+    deps.ai_service.register_provider("slow", slow_provider)
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "slow")
+    request = ChatRequest(message="cut me off")
+    # The app database outlives test runs; a fresh id keeps the history assertion exact.
+    conversation_id = f"conv-cancelled-{uuid4()}"
+
+    async def run():
+        stream = chat_routes.stream_chat_reply(request, conversation_id, "client-x", [])
+        await stream.__anext__()
+        await stream.__anext__()
+        await stream.aclose()
+        await asyncio.gather(*chat_routes._detached_persists)
+
+    asyncio.run(run())
+
+    assert deps.memory_store.get_recent_messages(conversation_id, client_id="client-x") == [
+        {"role": "user", "content": "cut me off"},
+        {"role": "assistant", "content": "partial"},
+    ]
+
+
+def test_chat_sheds_load_with_503_and_retry_after_when_provider_queue_is_full(monkeypatch):
+    from service.admission import AdmissionControl
+    from service.api import deps
+
+    async def mock_provider(message, history):
+        return "ok"
+
+    deps.ai_service.register_provider("mock", mock_provider)
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "mock")
+    admission = AdmissionControl({"mock": 1}, max_queue=0)
+    admission.limiter("mock").active = 1
+    monkeypatch.setattr(deps.ai_service, "admission", admission)
+    headers = {"x-orty-secret": settings.ORTY_SHARED_SECRET}
+
+    response = client.post("/chat", json={"message": "hello"}, headers=headers)
+    stream_response = client.post("/chat/stream", json={"message": "hello"}, headers=headers)
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert stream_response.status_code == 503
+
+    admission.limiter("mock").active = 0
+    response = client.post("/chat", json={"message": "hello"}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["queue_wait_ms"] == 0.0
@@ -0,0 +1,92 @@
+import asyncio
+import json
+import threading
+
+from fastapi.testclient import TestClient
+
+from service.api import app
+from service.api import deps
+from service.api.routes.v1_bots import stream_bot_events
+from service.config import settings
+from service.supervisor.event_bus import BotEventBus
+
+
+client = TestClient(app)
+
+
+def _event(bot_id: str, seq: int) -> dict:
+    return {"bot_id": bot_id, "seq": seq, "event_type": "HEARTBEAT"}
+
+
+def test_event_bus_delivers_events_published_from_other_threads():
+    bus = BotEventBus(buffer_size=8)
+
+    async def scenario():
+        subscription = bus.subscribe("bot-1")
+        other = bus.subscribe("bot-2")
+        publisher = threading.Thread(target=bus.publish, args=([_event("bot-1", 1), _event("bot-1", 2)],))
+        publisher.start()
+        publisher.join()
+        received = [await asyncio.wait_for(subscription.get(), timeout=1) for _ in range(2)]
+        bus.unsubscribe(subscription)
+        return received, other.queue.qsize()
+
+    received, other_pending = asyncio.run(scenario())
+
+    assert [event["seq"] for event in received] == [1, 2]
+    assert other_pending == 0
+    assert bus.subscriber_count("bot-1") == 0
+
+
+def test_event_bus_drops_slow_consumers():
+    bus = BotEventBus(buffer_size=2)
+
+    async def scenario():
+        subscription = bus.subscribe("bot-1")
+        bus.publish([_event("bot-1", seq) for seq in range(1, 6)])
+        await asyncio.sleep(0)
+        return subscription, await asyncio.wait_for(subscription.get(), timeout=1)
+
+    subscription, first = asyncio.run(scenario())
+
+    assert subscription.dropped
+    assert first is None
+
+
+def test_stream_resumes_from_last_event_id_then_follows_live_events():
+    owner = deps.clients_repo.create_client("Stream Owner")["client_id"]
+    bot_id = deps.bots_repo.create_bot(owner, "heartbeat", {})["bot_id"]
+    emitted = [deps.event_writer.emit(bot_id, owner, "HEARTBEAT", message=str(idx)) for idx in range(3)]
+    deps.event_writer.flush()
+
+    async def scenario():
+        stream = stream_bot_events(bot_id, last_event_id=emitted[0]["seq"])
+        chunks = [await asyncio.wait_for(stream.__anext__(), timeout=2) for _ in range(2)]
+        live = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.05)
+        deps.event_writer.emit(bot_id, owner, "HEARTBEAT", message="live")
+        chunks.append(await asyncio.wait_for(live, timeout=2))
+        await stream.aclose()
+        return chunks
+
+    chunks = asyncio.run(scenario())
+
+    messages = [json.loads(chunk.split("data: ", 1)[1])["message"] for chunk in chunks]
+    assert messages == ["1", "2", "live"]
+    assert chunks[0].startswith(f"id: {emitted[1]['seq']}\n")
+    assert deps.event_bus.subscriber_count(bot_id) == 0
+
+
+def test_stream_endpoint_enforces_bot_ownership():
+    owner = client.post('/v1/clients', json={'name': 'Owner'}, headers={'x-orty-secret': settings.ORTY_SHARED_SECRET}).json()
+    intruder = client.post('/v1/clients', json={'name': 'Intruder'}, headers={'x-orty-secret': settings.ORTY_SHARED_SECRET}).json()
+    bot_id = deps.bots_repo.create_bot(owner['client_id'], 'heartbeat', {})['bot_id']
+
+    forbidden = client.get(
+        f'/v1/bots/{bot_id}/events/stream',
+        headers={'x-orty-client-id': intruder['client_id'], 'x-orty-client-token': intruder['client_token']},
+    )
+    missing = client.get('/v1/bots/missing/events/stream', headers={'x-orty-secret': settings.ORTY_SHARED_SECRET})
+
+    assert forbidden.status_code == 403
+    assert missing.status_code == 404
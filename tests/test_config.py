@@ -1,5 +1,7 @@
 from importlib import reload
 
+import pytest
+
 
 def test_llm_provider_defaults_to_ollama_when_unset(monkeypatch):
     monkeypatch.delenv("LLM_PROVIDER", raising=False)
@@ -24,3 +26,15 @@ def test_runtime_env_takes_precedence_over_dotenv(monkeypatch, tmp_path):
     reload(config)
 
     assert config.settings.LLM_PROVIDER == "openai"
+
+
+def test_malformed_history_token_budgets_fail_at_startup(monkeypatch):
+    import service.config as config
+
+    monkeypatch.setenv("HISTORY_TOKEN_BUDGETS_JSON", '{"ollama": 2000, "ollama:qwen3:4b": 3000}')
+    assert config.Settings().HISTORY_TOKEN_BUDGETS == {"ollama": 2000, "ollama:qwen3:4b": 3000}
+
+    for raw in ('{"ollama": 2000', '[2000]', '{"ollama": "2000"}', '{"ollama": 0}'):
+        monkeypatch.setenv("HISTORY_TOKEN_BUDGETS_JSON", raw)
+        with pytest.raises(ValueError, match="HISTORY_TOKEN_BUDGETS_JSON"):
+            config.Settings()
@@ -1,6 +1,16 @@
+import asyncio
 import sqlite3
+import threading
 
-from service.memory import MemoryStore
+import numpy as np
+import pytest
+
+from service.config import settings
+from service.embeddings import HashingEmbedder
+from service.memory import MemoryStore, resolve_history_token_budget
+from service.storage.async_repos import AsyncMemoryStore
+from service.storage.executor import DBExecutor
+from service.storage.history_cache import HistoryWindowCache
 
 
 def test_memory_store_generates_and_reuses_conversation_id(tmp_path):
@@ -39,3 +49,240 @@ def test_memory_store_initializes_sqlite_index(tmp_path):
 
     index_names = {row[1] for row in indexes}
     assert "idx_messages_conversation_id_id" in index_names
+
+
+def test_memory_store_search_ranks_matches_and_scopes_to_client(tmp_path):
+    store = MemoryStore(str(tmp_path / "orty.db"))
+    store.append_message("conv-1", "user", "How do I rotate the sqlite wal file?", client_id="client-a")
+    store.append_message("conv-1", "assistant", "Checkpoint the WAL, then the wal file shrinks. WAL WAL.", client_id="client-a")
+    store.append_message("conv-2", "user", "Unrelated gardening question", client_id="client-a")
+    store.append_message("conv-3", "user", "my wal secrets", client_id="client-b")
+
+    results = store.search("client-a", "wal")
+
+    assert [result["conversation_id"] for result in results] == ["conv-1", "conv-1"]
+    assert results[0]["role"] == "assistant"
+    assert "[WAL]" in results[0]["snippet"]
+    assert store.search("client-b", "wal")[0]["conversation_id"] == "conv-3"
+    assert len(store.search("client-a", 'wal*"(')) == 2
+    assert store.search("client-a", "   ") == []
+
+
+def test_memory_store_search_backfills_existing_messages(tmp_path):
+    db_path = tmp_path / "legacy.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            "CREATE TABLE messages (id INTEGER PRIMARY KEY AUTOINCREMENT, client_id TEXT, conversation_id TEXT NOT NULL, "
+            "role TEXT NOT NULL, content TEXT NOT NULL, created_at DATETIME DEFAULT CURRENT_TIMESTAMP)"
+        )
+        conn.execute("INSERT INTO messages (client_id, conversation_id, role, content) VALUES ('c', 'old', 'user', 'archived zebra note')")
+
+    store = MemoryStore(str(db_path))
+
+    assert [result["conversation_id"] for result in store.search("c", "zebra")] == ["old"]
+
+
+def test_memory_store_selects_history_within_token_budget(tmp_path):
+    store = MemoryStore(str(tmp_path / "orty.db"))
+    store.append_message("conv-1", "user", "a" * 40, client_id="c")
+    store.append_message("conv-1", "assistant", "b" * 40, client_id="c")
+    store.append_message("conv-1", "user", "c" * 40, client_id="c")
+
+    history = store.get_messages_within_token_budget("conv-1", token_budget=25, client_id="c")
+
+    assert [message["content"][0] for message in history] == ["b", "c"]
+
+
+def test_memory_store_truncates_oversized_messages_in_budgeted_history(tmp_path):
+    store = MemoryStore(str(tmp_path / "orty.db"))
+    store.append_message("conv-1", "user", "short question", client_id="c")
+    store.append_message("conv-1", "assistant", "x" * 100_000, client_id="c")
+
+    history = store.get_messages_within_token_budget("conv-1", token_budget=200, client_id="c", max_message_tokens=50)
+
+    assert history[0] == {"role": "user", "content": "short question"}
+    assert history[1]["content"].startswith("x" * 200)
+    assert "[truncated 24950 tokens]" in history[1]["content"]
+    assert len(history[1]["content"]) < 300
+
+
+def test_resolve_history_token_budget_prefers_model_then_provider(monkeypatch):
+    monkeypatch.setattr(settings, "HISTORY_TOKEN_BUDGET", 4000)
+    monkeypatch.setattr(settings, "HISTORY_TOKEN_BUDGETS", {"ollama": 2000, "ollama:qwen3:4b": 3000})
+
+    assert resolve_history_token_budget("ollama", "qwen3:4b") == 3000
+    assert resolve_history_token_budget("ollama", "llama3") == 2000
+    assert resolve_history_token_budget("openai", "gpt-4o-mini") == 4000
+    assert resolve_history_token_budget("ollama", "llama3", requested=500) == 500
+
+
+def test_memory_store_recall_ranks_related_messages_from_other_conversations(tmp_path):
+    store = MemoryStore(str(tmp_path / "orty.db"), embedder=HashingEmbedder(128))
+    store.append_message("trip", "user", "Book a train ticket to Lisbon for the conference", client_id="c1")
+    store.append_message("cooking", "user", "How long should I roast the vegetables", client_id="c1")
+    store.append_message("other", "user", "train ticket to Lisbon please", client_id="c2")
+    store.append_message("current", "user", "train ticket Lisbon again", client_id="c1")
+
+    recalled = store.recall("c1", "what about my Lisbon train ticket?", k=3, exclude_conversation_id="current")
+
+    assert [item["conversation_id"] for item in recalled] == ["trip"]
+    assert recalled[0]["score"] > 0.2
+    assert list((tmp_path / "vectors").glob("c1.hashing-128.*"))
+
+
+def test_vector_index_indexes_lazily_from_high_water_mark(tmp_path):
+    store = MemoryStore(str(tmp_path / "orty.db"), embedder=HashingEmbedder(64))
+    store.append_message("a", "user", "first note", client_id="c1")
+
+    assert store.index_pending_messages("c1") == 1
+    assert store.index_pending_messages("c1") == 0
+
+    store.append_message("a", "user", "second note", client_id="c1")
+    assert store.index_pending_messages("c1") == 1
+
+    vectors_path = next((tmp_path / "vectors").glob("c1.*.f32"))
+    with vectors_path.open("ab") as handle:
+        handle.write(b"\0" * 10)
+    high_water = store.vector_index.high_water("c1")
+    assert high_water == store.get_unsummarized_messages("a", "c1")[-1]["id"]
+    assert vectors_path.stat().st_size == 2 * 64 * 4
+
+
+def test_memory_store_append_turn_writes_exchange_atomically(tmp_path):
+    store = MemoryStore(str(tmp_path / "orty.db"))
+
+    store.append_turn("conv", "c1", [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}])
+    with pytest.raises(sqlite3.IntegrityError):
+        store.append_turn("conv", "c1", [{"role": "user", "content": "lost"}, {"role": None, "content": "broken"}])
+
+    assert store.get_recent_messages("conv", client_id="c1") == [
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "hello"},
+    ]
+
+
+def test_memory_store_history_cache_is_write_through(tmp_path):
+    store = MemoryStore(str(tmp_path / "orty.db"), history_cache=HistoryWindowCache(max_bytes=1 << 20, window=3))
+    store.append_turn("conv", "c1", [{"role": "user", "content": "one"}, {"role": "assistant", "content": "two"}])
+
+    assert store.get_recent_messages("conv", limit=2, client_id="c1") == [
+        {"role": "user", "content": "one"},
+        {"role": "assistant", "content": "two"},
+    ]
+    store.append_turn("conv", "c1", [{"role": "user", "content": "three"}, {"role": "assistant", "content": "four"}])
+    history = store.get_recent_messages("conv", limit=3, client_id="c1")
+
+    assert [message["content"] for message in history] == ["two", "three", "four"]
+    assert store.history_cache.stats()["hits"] == 1
+    assert store.history_cache.stats()["misses"] == 1
+
+    store.invalidate_conversation("conv", "c1")
+    store.get_recent_messages("conv", limit=3, client_id="c1")
+    assert store.history_cache.stats()["misses"] == 2
+
+
+def test_history_window_cache_respects_byte_bound_and_stale_fills():
+    cache = HistoryWindowCache(max_bytes=250, window=10)
+    cache.put(("c1", "a"), [(1, "user", "x" * 50)], True, cache.generation())
+    cache.put(("c1", "b"), [(2, "user", "y" * 50)], True, cache.generation())
+
+    assert cache.get(("c1", "a"), 5) == [(1, "user", "x" * 50)]
+    cache.put(("c1", "c"), [(3, "user", "z" * 50)], True, cache.generation())
+    assert cache.get(("c1", "b"), 5) is None
+    assert cache.stats()["evictions"] == 1
+
+    generation = cache.generation()
+    cache.append(("c1", "d"), [(4, "user", "new")])
+    cache.put(("c1", "d"), [], True, generation)
+    assert cache.get(("c1", "d"), 5) is None
+
+
+def test_history_window_cache_append_skips_rows_a_reader_already_cached():
+    cache = HistoryWindowCache(max_bytes=1 << 20, window=10)
+    key = ("c1", "conv")
+    # The writer committed rows 2-3, then a reader filled the window before append ran.
+    cache.put(key, [(1, "user", "hi"), (2, "user", "q"), (3, "assistant", "a")], True, cache.generation())
+
+    cache.append(key, [(2, "user", "q"), (3, "assistant", "a")])
+    cache.append(key, [(4, "user", "next")])
+
+    assert [message[0] for message in cache.get(key, 10)] == [1, 2, 3, 4]
+
+
+def test_concurrent_indexing_appends_each_message_once(tmp_path):
+    store = MemoryStore(str(tmp_path / "orty.db"), embedder=HashingEmbedder(32))
+    store.append_messages(
+        [{"conversation_id": "a", "role": "user", "content": f"note {n}", "client_id": "c1"} for n in range(600)]
+    )
+
+    threads = [threading.Thread(target=store.index_pending_messages, args=("c1",)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ids = np.fromfile(next((tmp_path / "vectors").glob("c1.*.ids")), dtype="<i8")
+    assert len(ids) == 600
+    assert (np.diff(ids) > 0).all()
+    # Ids at or below the high-water mark are dropped instead of appended again.
+    assert store.vector_index.add("c1", [int(ids[5]), int(ids[-1])], ["again", "again"]) == 0
+
+
+def test_async_recall_indexes_a_few_messages_inline_and_backfills_the_rest(tmp_path):
+    store = MemoryStore(str(tmp_path / "orty.db"), embedder=HashingEmbedder(64))
+    store.append_messages(
+        [{"conversation_id": "old", "role": "user", "content": f"filler {n}", "client_id": "c1"} for n in range(300)]
+        + [{"conversation_id": "old", "role": "user", "content": "the wifi password is on the fridge", "client_id": "c1"}]
+    )
+    async_store = AsyncMemoryStore(store, DBExecutor(reader_threads=1))
+    index_calls = []
+    index_pending_messages = store.index_pending_messages
+
+    def recording_index(client_id, max_messages=None):
+        indexed = index_pending_messages(client_id, max_messages)
+        index_calls.append((max_messages, indexed))
+        return indexed
+
+    store.index_pending_messages = recording_index
+
+    async def scenario():
+        first = await async_store.recall("c1", "where is the wifi password?", k=2)
+        await asyncio.gather(*async_store._backfills.values())
+        second = await async_store.recall("c1", "where is the wifi password?", k=2)
+        await async_store.close()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    # The first recall only indexes a few messages inline; the background backfill
+    # (which may race the first search) indexes the rest.
+    assert index_calls[:2] == [(32, 32), (None, 269)]
+    assert second[0]["content"] == "the wifi password is on the fridge"
+    assert len({item["message_id"] for item in second}) == len(second)
+    assert store.vector_index.high_water("c1") == second[0]["message_id"]
+
+
+def test_async_recall_never_embeds_on_the_db_reader_pool(tmp_path):
+    threads = []
+
+    class RecordingEmbedder(HashingEmbedder):
+        def embed(self, texts):
+            threads.append(threading.current_thread().name)
+            return super().embed(texts)
+
+    store = MemoryStore(str(tmp_path / "orty.db"), embedder=RecordingEmbedder(64))
+    store.append_message("old", "user", "my locker code is 4512", client_id="c1")
+    executor = DBExecutor(reader_threads=1)
+    async_store = AsyncMemoryStore(store, executor)
+
+    async def scenario():
+        recalled = await async_store.recall("c1", "what is my locker code?", k=1)
+        await async_store.close()
+        return recalled
+
+    recalled = asyncio.run(scenario())
+    executor.shutdown()
+
+    assert recalled[0]["content"] == "my locker code is 4512"
+    assert len(threads) == 2
+    assert not any(name.startswith("orty-db-read") for name in threads)
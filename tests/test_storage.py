@@ -0,0 +1,393 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from service.memory import MemoryStore
+from service.storage.async_repos import AsyncMemoryStore
+from service.storage.bot_events_repo import BotEventsRepository
+from service.storage.bots_repo import BotsRepository
+from service.storage.client_auth import ClientAuthCache, LastSeenBuffer
+from service.storage.clients_repo import ClientsRepository
+from service.storage import db as db_module
+from service.storage.db import SQLiteConnectionPool, SQLiteDB, get_pool
+from service.storage.event_buffer import GroupCommitEventBuffer
+from service.storage.executor import DBExecutor
+from service.storage.migrations import MIGRATIONS, migrate, schema_version
+from service.supervisor.events import BotEventWriter
+
+
+def _pool(tmp_path, max_connections: int = 2) -> SQLiteConnectionPool:
+    return SQLiteConnectionPool(
+        str(tmp_path / "pool.db"),
+        max_connections=max_connections,
+        timeout_seconds=0.2,
+        statement_cache_size=64,
+        mmap_size_bytes=1024 * 1024,
+        cache_size_kib=2048,
+    )
+
+
+def test_sqlite_db_instances_share_one_pool_per_path(tmp_path):
+    db_path = str(tmp_path / "orty.db")
+    first = SQLiteDB(db_path)
+    second = SQLiteDB(db_path)
+
+    assert first.pool is second.pool
+    assert get_pool(db_path) is first.pool
+
+    opened_before = first.pool.connections_opened
+    for _ in range(20):
+        with second.connect() as conn:
+            conn.execute("SELECT 1").fetchone()
+    assert first.pool.connections_opened == opened_before
+
+
+def test_pool_applies_connection_tuning_once(tmp_path):
+    pool = _pool(tmp_path)
+
+    with pool.connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] == -2048
+
+    assert pool.connections_opened == 1
+
+
+def test_pool_nested_use_joins_outer_transaction(tmp_path):
+    pool = _pool(tmp_path)
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE items (value TEXT)")
+
+    with pytest.raises(RuntimeError):
+        with pool.connection() as outer:
+            outer.execute("INSERT INTO items VALUES ('a')")
+            with pool.connection() as inner:
+                assert inner is outer
+                inner.execute("INSERT INTO items VALUES ('b')")
+            raise RuntimeError("abort")
+
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0
+
+
+def test_pool_is_bounded_and_times_out_when_exhausted(tmp_path):
+    pool = _pool(tmp_path, max_connections=1)
+    acquired = threading.Event()
+    release = threading.Event()
+
+    def hold_connection():
+        with pool.connection():
+            acquired.set()
+            release.wait(timeout=2)
+
+    holder = threading.Thread(target=hold_connection)
+    holder.start()
+    acquired.wait(timeout=2)
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            with pool.connection():
+                pass
+    finally:
+        release.set()
+        holder.join()
+
+    with pool.connection() as conn:
+        assert conn.execute("SELECT 1").fetchone()[0] == 1
+    assert pool.connections_opened == 1
+
+
+class SlowDiskMemoryStore(MemoryStore):
+    def append_message(self, conversation_id, role, content, client_id=None):
+        time.sleep(0.02)
+        super().append_message(conversation_id, role, content, client_id=client_id)
+
+
+def test_async_memory_store_keeps_event_loop_responsive_under_write_load(tmp_path):
+    executor = DBExecutor(reader_threads=2)
+    store = AsyncMemoryStore(SlowDiskMemoryStore(str(tmp_path / "orty.db")), executor)
+
+    async def scenario():
+        lags: list[float] = []
+        done = asyncio.Event()
+
+        async def monitor():
+            loop = asyncio.get_running_loop()
+            while not done.is_set():
+                started = loop.time()
+                await asyncio.sleep(0.005)
+                lags.append(loop.time() - started - 0.005)
+
+        async def load():
+            writes = [store.append_message("conv-load", "user", f"message {idx}") for idx in range(25)]
+            reads = [store.get_recent_messages("conv-load", limit=5) for _ in range(25)]
+            await asyncio.gather(*writes, *reads)
+            done.set()
+
+        await asyncio.gather(monitor(), load())
+        return lags, await store.get_recent_messages("conv-load", limit=50)
+
+    try:
+        lags, history = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+
+    assert len(history) == 25
+    assert len(lags) > 10
+    assert max(lags) < 0.05
+
+
+def test_db_executor_serializes_writes_on_a_single_thread():
+    executor = DBExecutor(reader_threads=3)
+
+    async def scenario():
+        writers = await asyncio.gather(*(executor.write(threading.current_thread) for _ in range(10)))
+        readers = await asyncio.gather(*(executor.read(threading.current_thread) for _ in range(10)))
+        return writers, readers
+
+    try:
+        writers, readers = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+
+    assert len({thread.name for thread in writers}) == 1
+    assert all(thread.name.startswith("orty-db-read") for thread in readers)
+
+
+def _events_buffer(tmp_path, **kwargs):
+    db = SQLiteDB(str(tmp_path / "events.db"))
+    clients = ClientsRepository(db)
+    owner = clients.create_client("owner")["client_id"]
+    bot = BotsRepository(db).create_bot(owner, "heartbeat", {})
+    repo = BotEventsRepository(db)
+    return repo, GroupCommitEventBuffer(repo, **kwargs), bot["bot_id"], owner
+
+
+def test_event_writer_returns_immediately_and_group_commits(tmp_path):
+    repo, buffer, bot_id, owner = _events_buffer(tmp_path, batch_size=1000, flush_interval_seconds=60)
+    writer = BotEventWriter(repo, buffer)
+
+    emitted = [writer.emit(bot_id, owner, "HEARTBEAT", message=f"beat {idx}") for idx in range(50)]
+
+    assert emitted[0]["event_id"] and emitted[0]["created_at"]
+    assert buffer.flush_count == 0
+    assert buffer.pending_count() == 50
+
+    events = repo.list_events(bot_id, limit=100)
+
+    assert [event["event_id"] for event in events] == [event["event_id"] for event in emitted]
+    assert buffer.flush_count == 1
+    writer.close()
+
+
+def test_event_buffer_flushes_on_interval_in_background(tmp_path):
+    repo, buffer, bot_id, owner = _events_buffer(tmp_path, batch_size=1000, flush_interval_seconds=0.05)
+    flushed: list[int] = []
+    buffer.add_listener(lambda batch: flushed.append(len(batch)))
+
+    for _ in range(5):
+        buffer.submit(repo.new_event(bot_id, owner, "HEARTBEAT"))
+
+    for _ in range(100):
+        if flushed:
+            break
+        time.sleep(0.01)
+
+    assert flushed == [5]
+    assert buffer.pending_count() == 0
+    buffer.close()
+
+
+def test_event_buffer_applies_backpressure_and_flushes_on_close(tmp_path):
+    repo, buffer, bot_id, owner = _events_buffer(tmp_path, max_pending=10, batch_size=1000, flush_interval_seconds=60)
+
+    for _ in range(10):
+        buffer.submit(repo.new_event(bot_id, owner, "HEARTBEAT"))
+    assert buffer.pending_count() == 0
+    assert buffer.flushed_events == 10
+
+    buffer.submit(repo.new_event(bot_id, owner, "STOPPED"))
+    buffer.close()
+
+    repo.write_buffer = None
+    assert len(repo.list_events(bot_id, limit=100)) == 11
+
+
+def test_event_buffer_drops_rows_that_fail_permanently(tmp_path):
+    repo, buffer, bot_id, owner = _events_buffer(tmp_path, max_pending=3, batch_size=1000, flush_interval_seconds=60)
+
+    # An event for a bot that no longer exists violates the foreign key.
+    buffer.submit(repo.new_event(bot_id, owner, "HEARTBEAT"))
+    buffer.submit(repo.new_event("deleted-bot", owner, "HEARTBEAT"))
+    buffer.submit(repo.new_event(bot_id, owner, "HEARTBEAT"))
+    for _ in range(3):
+        buffer.submit(repo.new_event(bot_id, owner, "STOPPED"))
+
+    assert buffer.pending_count() == 0
+    assert buffer.dropped_events == 1
+    assert buffer.flushed_events == 5
+    buffer.close()
+
+    repo.write_buffer = None
+    assert len(repo.list_events(bot_id, limit=100)) == 5
+
+
+def test_schema_migrations_set_user_version_and_run_once_per_process(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "migrated.db")
+    first = SQLiteDB(db_path)
+
+    with first.connect() as conn:
+        assert schema_version(conn) == MIGRATIONS[-1][0]
+
+    calls: list[str] = []
+    monkeypatch.setattr(db_module, "migrate", lambda conn: calls.append("migrate"))
+    SQLiteDB(db_path)
+    SQLiteDB(db_path)
+
+    assert calls == []
+
+
+def test_schema_migrations_upgrade_legacy_database(tmp_path):
+    db_path = tmp_path / "legacy.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            "CREATE TABLE messages (id INTEGER PRIMARY KEY AUTOINCREMENT, conversation_id TEXT NOT NULL, "
+            "role TEXT NOT NULL, content TEXT NOT NULL, created_at DATETIME DEFAULT CURRENT_TIMESTAMP)"
+        )
+        conn.execute("INSERT INTO messages (conversation_id, role, content) VALUES ('conv', 'user', 'kept')")
+
+    store = MemoryStore(str(db_path))
+
+    assert store.get_recent_messages("conv") == [{"role": "user", "content": "kept"}]
+    with store.db.connect() as conn:
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(messages)").fetchall()}
+    assert "client_id" in columns
+
+
+def test_migrate_applies_only_pending_steps_in_order(tmp_path):
+    applied_steps: list[str] = []
+    steps = [
+        (2, "add index", lambda conn: applied_steps.append("two")),
+        (1, "create table", lambda conn: applied_steps.append("one")),
+    ]
+    conn = sqlite3.connect(tmp_path / "steps.db")
+    try:
+        assert migrate(conn, steps) == [1, 2]
+        assert migrate(conn, steps + [(3, "add column", lambda conn: applied_steps.append("three"))]) == [3]
+        assert schema_version(conn) == 3
+    finally:
+        conn.close()
+
+    assert applied_steps == ["one", "two", "three"]
+
+
+def test_bot_events_keyset_pagination_and_filters(tmp_path):
+    repo, buffer, bot_id, owner = _events_buffer(tmp_path)
+    for idx in range(10):
+        event_type = "HEARTBEAT" if idx % 2 else "REVIEW_PROPOSAL"
+        repo.add_event(bot_id, owner, event_type, message=str(idx))
+    buffer.close()
+
+    newest = repo.list_events(bot_id, limit=3)
+    assert [event["message"] for event in newest] == ["7", "8", "9"]
+    seqs = [event["seq"] for event in newest]
+    assert seqs == sorted(seqs)
+
+    older = repo.list_events(bot_id, limit=3, before=newest[0]["seq"])
+    assert [event["message"] for event in older] == ["4", "5", "6"]
+
+    first_page = repo.list_events(bot_id, limit=4, after=0)
+    second_page = repo.list_events(bot_id, limit=4, after=first_page[-1]["seq"])
+    assert [event["message"] for event in first_page + second_page] == [str(idx) for idx in range(8)]
+
+    heartbeats = repo.list_events(bot_id, limit=100, event_type="HEARTBEAT")
+    assert [event["message"] for event in heartbeats] == ["1", "3", "5", "7", "9"]
+
+    window = repo.list_events(bot_id, since=newest[0]["created_at"], until=newest[-1]["created_at"])
+    assert [event["message"] for event in window] == ["7", "8"]
+
+
+def test_buffered_events_receive_sequence_after_flush(tmp_path):
+    repo, buffer, bot_id, owner = _events_buffer(tmp_path, flush_interval_seconds=60)
+    writer = BotEventWriter(repo, buffer)
+
+    emitted = [writer.emit(bot_id, owner, "HEARTBEAT") for _ in range(3)]
+    assert "seq" not in emitted[0]
+
+    writer.flush()
+    assert [event["seq"] for event in emitted] == [event["seq"] for event in repo.list_events(bot_id)]
+    assert emitted[1]["seq"] == emitted[0]["seq"] + 1
+    writer.close()
+
+
+def test_client_authentication_is_cached_and_invalidated_on_preference_update(tmp_path):
+    repo = ClientsRepository(SQLiteDB(str(tmp_path / "auth.db")), auth_cache=ClientAuthCache(ttl_seconds=60))
+    created = repo.create_client("cached", preferences={"theme": "dark"})
+
+    first = repo.authenticate_client(created["client_id"], created["client_token"])
+    second = repo.authenticate_client(created["client_id"], created["client_token"])
+    assert first["preferences"] == second["preferences"] == {"theme": "dark"}
+    assert repo.auth_cache.stats()["hits"] == 1
+    assert repo.authenticate_client(created["client_id"], "wrong-token") is None
+
+    repo.update_preferences(created["client_id"], {"theme": "light"})
+    refreshed = repo.authenticate_client(created["client_id"], created["client_token"])
+    assert refreshed["preferences"] == {"theme": "light"}
+
+
+def test_last_seen_updates_are_coalesced_into_one_batched_write(tmp_path):
+    repo = ClientsRepository(SQLiteDB(str(tmp_path / "seen.db")))
+    buffer = LastSeenBuffer(repo, flush_interval_seconds=60)
+    clients = [repo.create_client(f"client-{index}") for index in range(3)]
+
+    for _ in range(5):
+        for created in clients:
+            assert repo.verify_client_token(created["client_id"], created["client_token"])
+
+    assert buffer.pending_count() == 3
+    assert all(repo.get_client(created["client_id"])["last_seen_at"] is None for created in clients)
+    buffer.close()
+    assert buffer.flush_count == 1
+    assert all(repo.get_client(created["client_id"])["last_seen_at"] for created in clients)
+
+
+def test_primary_client_is_cached_until_it_changes(tmp_path):
+    db = SQLiteDB(str(tmp_path / "primary.db"))
+    repo = ClientsRepository(db)
+    original = repo.create_client("root", preferences={"role": "root"}, is_primary=True)
+
+    assert repo.get_primary_client()["client_id"] == original["client_id"]
+    with db.connect() as conn:
+        conn.execute("UPDATE clients SET preferences_json = '{\"stale\": true}'")
+    assert repo.get_primary_client()["preferences"] == {"role": "root"}
+
+    repo.update_preferences(original["client_id"], {"role": "root", "ui_default": True})
+    assert repo.cached_primary_client() is None
+    assert repo.get_primary_client()["preferences"] == {"role": "root", "ui_default": True}
+
+    replacement = repo.create_client("new root", is_primary=True)
+    assert repo.get_primary_client()["client_id"] == replacement["client_id"]
+
+
+
+def test_preference_update_during_primary_read_is_not_cached_stale(tmp_path, monkeypatch):
+    from service.storage import clients_repo as clients_repo_module
+
+    repo = ClientsRepository(SQLiteDB(str(tmp_path / "primary.db")))
+    primary = repo.create_client("root", preferences={"role": "root"}, is_primary=True)
+    payload = clients_repo_module._client_payload
+
+    def update_while_reading(row):
+        # The update commits after the read fetched its row but before it is cached.
+        monkeypatch.setattr(clients_repo_module, "_client_payload", payload)
+        repo.update_preferences(primary["client_id"], {"role": "root", "theme": "dark"})
+        return payload(row)
+
+    monkeypatch.setattr(clients_repo_module, "_client_payload", update_while_reading)
+
+    assert repo.get_primary_client()["preferences"] == {"role": "root"}
+    assert repo.cached_primary_client() is None
+    assert repo.get_primary_client()["preferences"] == {"role": "root", "theme": "dark"}
\ No newline at end of file
@@ -0,0 +1,136 @@
+import gzip
+import json
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+from service.memory import MemoryStore
+from service.storage.bot_events_repo import BotEventsRepository
+from service.storage.bots_repo import BotsRepository
+from service.storage.clients_repo import ClientsRepository
+from service.storage.db import SQLiteDB
+from service.storage.maintenance import RetentionPolicy, StorageMaintenance
+
+
+NOW = datetime(2026, 6, 1, tzinfo=timezone.utc)
+
+
+def _seed_messages(db: SQLiteDB, client_id: str | None, count: int, age_days: float) -> None:
+    created_at = (NOW - timedelta(days=age_days)).strftime("%Y-%m-%d %H:%M:%S")
+    with db.connect() as conn:
+        conn.executemany(
+            "INSERT INTO messages (client_id, conversation_id, role, content, created_at) VALUES (?, 'conv', 'user', ?, ?)",
+            [(client_id, f"message {idx}", created_at) for idx in range(count)],
+        )
+
+
+def _message_count(db: SQLiteDB, client_id: str | None) -> int:
+    with db.connect() as conn:
+        return conn.execute("SELECT COUNT(*) FROM messages WHERE client_id IS ?", (client_id,)).fetchone()[0]
+
+
+def test_messages_retention_prunes_by_age_with_client_override_and_archives(tmp_path):
+    db = SQLiteDB(str(tmp_path / "orty.db"))
+    _seed_messages(db, "client-a", 7, age_days=40)
+    _seed_messages(db, "client-a", 3, age_days=1)
+    _seed_messages(db, "client-b", 4, age_days=40)
+    _seed_messages(db, None, 2, age_days=40)
+
+    policy = RetentionPolicy(messages={"max_age_days": 30}, client_overrides={"client-b": {"max_age_days": 90}})
+    maintenance = StorageMaintenance(db, policy, batch_size=2, archive_dir=str(tmp_path / "archive"))
+
+    result = maintenance.run_once(now=NOW)
+
+    assert result["messages"] == 9
+    assert _message_count(db, "client-a") == 3
+    assert _message_count(db, "client-b") == 4
+    assert _message_count(db, None) == 0
+
+    archives = list((tmp_path / "archive").glob("messages-*.ndjson.gz"))
+    assert len(archives) == 1
+    with gzip.open(archives[0], "rt", encoding="utf-8") as handle:
+        archived = [json.loads(line) for line in handle]
+    assert len(archived) == 9
+    assert {record["client_id"] for record in archived} == {"client-a", None}
+
+
+def test_messages_retention_caps_rows_per_client(tmp_path):
+    store = MemoryStore(str(tmp_path / "orty.db"))
+    for idx in range(12):
+        store.append_message("conv", "user", f"message {idx}", client_id="client-a")
+
+    maintenance = StorageMaintenance(store.db, RetentionPolicy(messages={"max_rows": 5}), batch_size=3)
+    maintenance.run_once(now=NOW)
+
+    history = store.get_recent_messages("conv", limit=50, client_id="client-a")
+    assert [message["content"] for message in history] == [f"message {idx}" for idx in range(7, 12)]
+
+
+def test_bot_events_retention_uses_bot_type_overrides(tmp_path):
+    db = SQLiteDB(str(tmp_path / "orty.db"))
+    owner = ClientsRepository(db).create_client("owner")["client_id"]
+    bots = BotsRepository(db)
+    heartbeat = bots.create_bot(owner, "heartbeat", {})["bot_id"]
+    review = bots.create_bot(owner, "code_review", {})["bot_id"]
+    events = BotEventsRepository(db)
+    for idx in range(10):
+        events.add_event(heartbeat, owner, "HEARTBEAT", message=str(idx))
+        events.add_event(review, owner, "REVIEW_PROPOSAL", message=str(idx))
+
+    policy = RetentionPolicy(bot_events={"max_rows": 8}, bot_type_overrides={"heartbeat": {"max_rows": 3}})
+    result = StorageMaintenance(db, policy, batch_size=4).run_once(now=NOW)
+
+    assert result["bot_events"] == 9
+    assert [event["message"] for event in events.list_events(heartbeat)] == ["7", "8", "9"]
+    assert len(events.list_events(review)) == 8
+
+
+def test_incremental_vacuum_shrinks_database_file(tmp_path):
+    db_path = tmp_path / "orty.db"
+    db = SQLiteDB(str(db_path))
+    maintenance = StorageMaintenance(db, RetentionPolicy(messages={"max_age_days": 1}), vacuum_pages=0)
+
+    with db.connect() as conn:
+        conn.executemany(
+            "INSERT INTO messages (client_id, conversation_id, role, content, created_at) VALUES ('c', 'conv', 'user', ?, ?)",
+            [("x" * 2000, "2020-01-01 00:00:00") for _ in range(500)],
+        )
+        conn.commit()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    size_before = os.path.getsize(db_path)
+
+    result = maintenance.run_once(now=NOW)
+
+    assert result["messages"] == 500
+    assert result["vacuumed_pages"] > 0
+    assert os.path.getsize(db_path) < size_before / 2
+
+
+def test_existing_databases_are_only_converted_to_incremental_vacuum_on_request(tmp_path):
+    db_path = tmp_path / "legacy.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("CREATE TABLE legacy (id INTEGER PRIMARY KEY)")
+    db = SQLiteDB(str(db_path))
+    maintenance = StorageMaintenance(db, RetentionPolicy(messages={"max_age_days": 1}))
+
+    with db.connect() as conn:
+        conn.executemany(
+            "INSERT INTO messages (client_id, conversation_id, role, content, created_at) VALUES ('c', 'conv', 'user', 'x', ?)",
+            [("2020-01-01 00:00:00",) for _ in range(10)],
+        )
+
+    # The scheduled job prunes but never rewrites the whole file.
+    assert maintenance.run_once(now=NOW) == {"messages": 10, "bot_events": 0, "vacuumed_pages": 0}
+    with db.connect() as conn:
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+
+    assert maintenance.enable_incremental_vacuum() is True
+    assert maintenance.enable_incremental_vacuum() is False
+    with db.connect() as conn:
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+
+def test_retention_policy_is_disabled_by_default():
+    assert not RetentionPolicy().is_enabled()
+    assert RetentionPolicy(bot_type_overrides={"heartbeat": {"max_age_days": 1}}).is_enabled()
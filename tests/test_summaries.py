@@ -0,0 +1,93 @@
+import asyncio
+
+from service.memory import MemoryStore
+from service.storage.async_repos import AsyncMemoryStore
+from service.storage.executor import DBExecutor
+from service.summaries import ConversationSummarizer
+
+
+def _summarizer(tmp_path, prompts, **kwargs):
+    store = MemoryStore(str(tmp_path / "orty.db"))
+    executor = DBExecutor(2)
+
+    async def summarize(prompt):
+        prompts.append(prompt)
+        return f"summary #{len(prompts)}"
+
+    return store, executor, ConversationSummarizer(AsyncMemoryStore(store, executor), summarize, **kwargs)
+
+
+def test_summarizer_folds_older_turns_and_advances_high_water(tmp_path):
+    prompts = []
+    store, executor, summarizer = _summarizer(tmp_path, prompts, trigger_messages=4, keep_recent_messages=2)
+    for index in range(5):
+        store.append_message("conv", "user", f"message {index}", client_id="c1")
+
+    assert asyncio.run(summarizer.summarize_once("conv", "c1")) is False
+
+    store.append_message("conv", "assistant", "message 5", client_id="c1")
+    assert asyncio.run(summarizer.summarize_once("conv", "c1")) is True
+    executor.shutdown()
+
+    summary = store.get_summary("conv", client_id="c1")
+    tail = store.get_recent_messages("conv", client_id="c1", after_id=summary["high_water_message_id"])
+    assert summary["summary"] == "summary #1"
+    assert "user: message 3" in prompts[0] and "message 4" not in prompts[0]
+    assert [message["content"] for message in tail] == ["message 4", "message 5"]
+    assert store.get_summary("conv", client_id="other") is None
+
+
+def test_summarizer_keeps_high_water_when_provider_replies_with_an_error(tmp_path):
+    store = MemoryStore(str(tmp_path / "orty.db"))
+    executor = DBExecutor(2)
+    replies = ["Ollama is not reachable. Start Ollama and try again.", "summary after recovery"]
+
+    async def summarize(prompt):
+        return replies.pop(0)
+
+    summarizer = ConversationSummarizer(
+        AsyncMemoryStore(store, executor), summarize, trigger_messages=2, keep_recent_messages=1
+    )
+    for index in range(3):
+        store.append_message("conv", "user", f"message {index}", client_id="c1")
+
+    assert asyncio.run(summarizer.summarize_once("conv", "c1")) is False
+    assert store.get_summary("conv", client_id="c1") is None
+
+    assert asyncio.run(summarizer.summarize_once("conv", "c1")) is True
+    executor.shutdown()
+    assert store.get_summary("conv", client_id="c1")["summary"] == "summary after recovery"
+
+
+def test_summarizer_schedule_runs_in_background_until_caught_up(tmp_path):
+    prompts = []
+    store, executor, summarizer = _summarizer(tmp_path, prompts, trigger_messages=2, keep_recent_messages=1)
+    for index in range(7):
+        store.append_message("conv", "user", f"message {index}")
+
+    async def run():
+        task = summarizer.schedule("conv")
+        assert summarizer.schedule("conv") is task
+        await task
+        await summarizer.close()
+
+    asyncio.run(run())
+    executor.shutdown()
+
+    summary = store.get_summary("conv")
+    assert len(prompts) == 3
+    assert "Current summary:\nsummary #2" in prompts[2]
+    assert store.get_recent_messages("conv", after_id=summary["high_water_message_id"]) == [
+        {"role": "user", "content": "message 6"}
+    ]
+
+
+def test_summarizer_is_a_no_op_when_disabled(tmp_path):
+    prompts = []
+    _, executor, summarizer = _summarizer(tmp_path, prompts, enabled=False)
+
+    async def run():
+        return summarizer.schedule("conv")
+
+    assert asyncio.run(run()) is None
+    executor.shutdown()
@@ -1,4 +1,5 @@
 import tempfile
+import threading
 import time
 
 from fastapi.testclient import TestClient
@@ -74,6 +75,24 @@ def test_bot_lifecycle_start_heartbeat_stop_and_events():
     assert 'STOPPED' in after_stop_types
 
 
+def test_bot_events_support_cursor_pagination_and_type_filter():
+    created_client = create_client('Cursor Owner')
+    headers = client_headers(created_client)
+
+    bot_id = client.post('/v1/bots', json={'bot_type': 'codey', 'config': {}}, headers=headers).json()['bot_id']
+    assert client.post(f'/v1/bots/{bot_id}/start', headers=headers).status_code == 200
+
+    all_events = client.get(f'/v1/bots/{bot_id}/events?limit=20', headers=headers).json()
+    assert all(event['seq'] for event in all_events)
+
+    first = client.get(f'/v1/bots/{bot_id}/events?limit=1&after=0', headers=headers).json()
+    rest = client.get(f"/v1/bots/{bot_id}/events?limit=20&after={first[0]['seq']}", headers=headers).json()
+    assert [event['event_id'] for event in first + rest] == [event['event_id'] for event in all_events]
+
+    completed = client.get(f'/v1/bots/{bot_id}/events?event_type=CODEY_COMPLETED', headers=headers).json()
+    assert [event['event_type'] for event in completed] == ['CODEY_COMPLETED']
+
+
 def test_client_auth_scoping_blocks_cross_client_access():
     client_a = create_client('Client A')
     client_b = create_client('Client B')
@@ -301,3 +320,30 @@ def test_codey_bot_emits_architecture_events(monkeypatch):
     assert 'CODEY_PLANNING_STARTED' in event_types
     assert 'CODEY_ARCHITECTURE_DRAFTED' in event_types
     assert 'CODEY_COMPLETED' in event_types
+
+
+def test_bot_runner_keeps_registry_calls_off_the_event_loop(monkeypatch):
+    from service.api import deps
+
+    threads = []
+    get_bot = deps.bot_registry.get_bot
+    transition = deps.bot_registry.transition
+
+    def recording_get_bot(bot_id):
+        threads.append(threading.current_thread().name)
+        return get_bot(bot_id)
+
+    def recording_transition(bot_id, to_status, event_type):
+        threads.append(threading.current_thread().name)
+        return transition(bot_id, to_status, event_type)
+
+    monkeypatch.setattr(deps.bot_registry, 'get_bot', recording_get_bot)
+    monkeypatch.setattr(deps.bot_registry, 'transition', recording_transition)
+
+    headers = client_headers(create_client('Threaded Bot Owner'))
+    bot_id = client.post('/v1/bots', json={'bot_type': 'heartbeat', 'config': {'interval_seconds': 60}}, headers=headers).json()['bot_id']
+    assert client.post(f'/v1/bots/{bot_id}/start', headers=headers).status_code == 200
+    assert client.post(f'/v1/bots/{bot_id}/stop', headers=headers).json()['status'] == 'stopped'
+
+    assert threads
+    assert all(name.startswith('orty-db-') for name in threads)